@@ -0,0 +1,123 @@
+"""BHHH optimizer for likelihoods that are sums over individuals.
+
+The BHHH algorithm of Berndt, Hall, Hall and Hausman approximates the hessian
+of the log likelihood by the outer product of the per-individual scores. The
+scores are needed anyways to calculate the gradient, such that each iteration
+gets a good approximation of the curvature without extra evaluations. Close to
+the optimum, this usually needs far fewer iterations than quasi-Newton
+methods that have to learn the curvature from the sequence of gradients.
+
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+from statsmodels.tools.numdiff import approx_fprime
+
+
+def bhhh(loglikeobs, x0, bounds=None, weights=None, maxiter=1000,
+         tolerance=1e-8, max_step_halvings=30, callback=None):
+    """Maximize a log likelihood with the BHHH algorithm.
+
+    Steps that would leave the bounds are projected onto them. If a step does
+    not increase the log likelihood, it is halved until it does.
+
+    Args:
+        loglikeobs (function): takes a params vector and returns the log
+            likelihood contribution of each individual.
+        x0 (np.ndarray): start values.
+        bounds (list): list of (lower, upper) tuples. None means unbounded.
+        weights (np.ndarray): frequency weights with which loglikeobs already
+            multiplies the contributions. They are needed to calculate the
+            outer product of the scores correctly.
+        maxiter (int): maximal number of iterations.
+        tolerance (float): the algorithm has converged if the increase of the
+            log likelihood predicted by the BHHH step is smaller.
+        max_step_halvings (int): maximal number of step halvings per
+            iteration.
+        callback (function): optional. Is called in each iteration with the
+            current params vector, its log likelihood and its gradient.
+
+    Returns:
+        res (OptimizeResult): with the attributes x, fun (the negative log
+            likelihood at x), success, nit, nfev, message and score_obs, the
+            per-individual scores at x divided by the square root of the
+            weights, such that their outer product is the BHHH approximation
+            of the information matrix.
+
+    """
+    x = np.array(x0, dtype=float)
+    lower, upper = bounds_arrays(bounds, len(x))
+    x = np.clip(x, lower, upper)
+    nfev = 1
+    fun = loglikeobs(x).sum()
+    success = False
+    message = 'Maximum number of iterations reached.'
+    nit = 0
+
+    for nit in range(1, maxiter + 1):
+        scores = _scaled_scores(loglikeobs, x, weights)
+        nfev += 2 * len(x)
+        gradient = _gradient(scores, weights)
+        if callback is not None:
+            callback(x, fun, gradient)
+        direction = np.linalg.lstsq(
+            np.dot(scores.T, scores), gradient, rcond=None)[0]
+        if np.dot(gradient, direction) < tolerance:
+            success = True
+            message = 'The predicted improvement is below the tolerance.'
+            break
+
+        step = 1.0
+        for _ in range(max_step_halvings):
+            candidate = np.clip(x + step * direction, lower, upper)
+            nfev += 1
+            candidate_fun = loglikeobs(candidate).sum()
+            if candidate_fun > fun:
+                break
+            step /= 2
+        else:
+            message = 'No step that increases the log likelihood was found.'
+            break
+        x, fun = candidate, candidate_fun
+    else:
+        scores = _scaled_scores(loglikeobs, x, weights)
+        nfev += 2 * len(x)
+
+    return OptimizeResult(
+        x=x, fun=-fun, success=success, nit=nit, nfev=nfev, message=message,
+        score_obs=scores)
+
+
+def bounds_arrays(bounds, nparams):
+    """Arrays with lower and upper bounds. None is converted to infinity."""
+    if bounds is None:
+        return np.full(nparams, -np.inf), np.full(nparams, np.inf)
+    lower = np.array([-np.inf if b[0] is None else b[0] for b in bounds],
+                     dtype=float)
+    upper = np.array([np.inf if b[1] is None else b[1] for b in bounds],
+                     dtype=float)
+    return lower, upper
+
+
+def _scaled_scores(loglikeobs, x, weights):
+    """Per-individual scores divided by the square root of the weights.
+
+    A frequency weight of w means that an individual is contained w times in
+    the sample. Its contribution to the outer product of the scores is
+    therefore w times the outer product of its unweighted score. loglikeobs
+    returns w times its contribution, which is corrected here.
+
+    """
+    scores = approx_fprime(x, loglikeobs, centered=True)
+    if weights is not None:
+        scale = np.zeros(len(weights))
+        positive = weights > 0
+        scale[positive] = 1 / np.sqrt(weights[positive])
+        scores = scores * scale.reshape(-1, 1)
+    return scores
+
+
+def _gradient(scaled_scores, weights):
+    """Gradient of the log likelihood from the scaled scores."""
+    if weights is None:
+        return scaled_scores.sum(axis=0)
+    return np.dot(np.sqrt(weights), scaled_scores)
@@ -0,0 +1,99 @@
+"""Memoize evaluations of the likelihood and its derivatives.
+
+The optimizer, the numerical derivatives and statsmodels often evaluate the
+likelihood, the scores or the hessian repeatedly at the same params vector.
+:class:`EvaluationCache` stores the most recently used results and returns
+them without evaluating the function again.
+
+A cached result is only valid as long as the model does not change. If model
+attributes are changed after some evaluations, the cache has to be cleared.
+
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def array_digest(arr):
+    """Return a short hash of the content of a numpy array."""
+    arr = np.ascontiguousarray(arr, dtype=float)
+    return hashlib.sha1(arr.tobytes()).hexdigest()
+
+
+class EvaluationCache:
+    """Thread safe least recently used cache keyed by params vectors.
+
+    Args:
+        maxsize (int): maximal number of stored results. 0 disables the
+            cache.
+
+    Attributes:
+        hits (int): number of lookups that were answered from the cache.
+        misses (int): number of lookups that evaluated the function.
+
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key, params, func):
+        """Return the cached result for key and params or evaluate func.
+
+        Args:
+            key (tuple): everything except params the result depends on,
+                e.g. the name of the function and the params_type.
+            params (np.ndarray): the params vector.
+            func (function): is called without arguments if the result is
+                not cached.
+
+        """
+        params = np.ascontiguousarray(params, dtype=float)
+        full_key = key + (params.tobytes(), )
+        with self._lock:
+            if full_key in self._results:
+                self.hits += 1
+                self._results.move_to_end(full_key)
+                return _copy(self._results[full_key])
+            self.misses += 1
+
+        result = func()
+        self._insert(full_key, result)
+        return result
+
+    def store(self, key, params, result):
+        """Store a result that was calculated elsewhere."""
+        params = np.ascontiguousarray(params, dtype=float)
+        self._insert(key + (params.tobytes(), ), result)
+
+    def _insert(self, full_key, result):
+        if self.maxsize > 0:
+            with self._lock:
+                self._results[full_key] = _copy(result)
+                self._results.move_to_end(full_key)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+
+    def clear(self):
+        """Remove all results and reset the counters."""
+        with self._lock:
+            self._results = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return a dict with hits, misses, maxsize and currsize."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'maxsize': self.maxsize, 'currsize': len(self._results)}
+
+
+def _copy(result):
+    """Copy arrays, such that callers can't change cached results."""
+    if isinstance(result, np.ndarray):
+        return result.copy()
+    return result
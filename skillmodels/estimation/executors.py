@@ -0,0 +1,121 @@
+"""Executors for the parallel parts of skillmodels.
+
+All parallel work (bootstrap replications and likelihood evaluations for
+numerical derivatives) is distributed with a
+:class:`concurrent.futures.Executor`.
+Users can pass their own executor, e.g. one that distributes the work on a
+cluster, or choose one of the built-in process and thread pools.
+
+The workers of the built-in pools limit the number of threads that BLAS and
+numba may use. Without this limit each worker would start as many threads as
+there are cores and the machine would be oversubscribed.
+
+"""
+import os
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor, as_completed
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+thread_environment_variables = [
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS']
+
+
+def limit_threads(nthreads):
+    """Limit the number of threads of BLAS and numba in the current process.
+
+    The environment variables are only respected by libraries that are not
+    loaded yet. Libraries that are already loaded are limited with
+    threadpoolctl if it is installed.
+
+    Args:
+        nthreads (int): maximal number of threads. None means no limit.
+
+    """
+    if nthreads is None:
+        return
+    for var in thread_environment_variables:
+        os.environ[var] = str(nthreads)
+    if threadpool_limits is not None:
+        threadpool_limits(limits=nthreads)
+    _set_numba_threads(nthreads)
+
+
+def _set_numba_threads(nthreads):
+    import numba
+    if hasattr(numba, 'set_num_threads'):
+        numba.set_num_threads(min(nthreads, numba.config.NUMBA_NUM_THREADS))
+
+
+@contextmanager
+def _limited_threads(nthreads):
+    """Limit BLAS and numba threads while the context is active."""
+    if nthreads is None:
+        yield
+    elif threadpool_limits is not None:
+        with threadpool_limits(limits=nthreads):
+            yield
+    else:
+        yield
+
+
+@contextmanager
+def executor_context(executor='process', max_workers=None,
+                     threads_per_worker=1):
+    """Context manager that yields a concurrent.futures.Executor.
+
+    Args:
+        executor (str or Executor): 'process', 'thread' or an instance of a
+            subclass of concurrent.futures.Executor. Executors that are passed
+            in are used as they are and not shut down when the context is
+            left.
+        max_workers (int): number of workers of the built-in executors. None
+            means one worker per core.
+        threads_per_worker (int): maximal number of BLAS and numba threads
+            per worker of the built-in executors. None means no limit.
+
+    """
+    if isinstance(executor, Executor):
+        yield executor
+    elif executor == 'process':
+        with ProcessPoolExecutor(
+                max_workers, initializer=limit_threads,
+                initargs=(threads_per_worker,)) as ex:
+            yield ex
+    elif executor == 'thread':
+        # the threads of a thread pool share the limits of the process
+        with _limited_threads(threads_per_worker):
+            with ThreadPoolExecutor(max_workers) as ex:
+                yield ex
+    else:
+        raise NotImplementedError(
+            'executor has to be "process", "thread" or a '
+            'concurrent.futures.Executor, not {}'.format(executor))
+
+
+def shares_memory(executor):
+    """Return True if the workers of executor run in the current process.
+
+    Threads share the memory of the process. The model and its data can be
+    passed to them as they are, without copies or memory mapped files.
+
+    """
+    return executor == 'thread' or isinstance(executor, ThreadPoolExecutor)
+
+
+def map_unordered(executor, func, iterable):
+    """Apply func to all items of iterable and yield results as they finish.
+
+    This is the equivalent of multiprocessing.Pool.imap_unordered for
+    concurrent.futures.Executors.
+
+    """
+    futures = [executor.submit(func, item) for item in iterable]
+    for future in as_completed(futures):
+        yield future.result()
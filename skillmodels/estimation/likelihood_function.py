@@ -1,5 +1,7 @@
 from skillmodels.estimation.parse_params import parse_params
 from skillmodels.estimation.parse_params import restore_unestimated_quantities
+from skillmodels.estimation.evaluation_cache import array_digest
+import time
 import numpy as np
 from skillmodels.fast_routines.kalman_filters import normal_unscented_predict
 from skillmodels.fast_routines.kalman_filters import sqrt_unscented_predict
@@ -10,10 +12,81 @@ from skillmodels.fast_routines.kalman_filters import sqrt_probit_update
 from skillmodels.fast_routines.sigma_points import calculate_sigma_points
 
 
-def log_likelihood_per_individual(
-        params, like_vec, parse_params_args, stagemap, nmeas_list, anchoring,
-        square_root_filters, update_types, update_args, predict_args,
-        calculate_sigma_points_args, restore_args):
+class LikelihoodState:
+    """All arguments of the likelihood function in one compact object.
+
+    The object is constructed once from the likelihood arguments generated
+    in SkillModel and holds references to all buffers that are updated in
+    place during an evaluation of the likelihood. Everything that does not
+    depend on the params vector is resolved during construction, such that
+    the evaluation of the likelihood does not have to marshal arguments:
+
+        * the update and predict functions are selected once
+        * the arguments of each Kalman update are stored in a tuple
+        * the updates of each period are stored as a range of positions
+
+    Args:
+        See the entries of SkillModel.likelihood_arguments_dict.
+
+    """
+
+    __slots__ = [
+        'like_vec', 'parse_params_args', 'subtract_controls_args',
+        'restore_args', 'calculate_sigma_points_args', 'predict_args',
+        'predict_func', 'stagemap', 'nperiods', 'update_funcs',
+        'update_args', 'update_bounds', 'anchoring', 'unique_inverse',
+        'checkpoint_args', 'weights', 'filter_weights', 'weights_key',
+        'params_type', 'profiler']
+
+    def __init__(self, like_vec, parse_params_args, subtract_controls_args,
+                 stagemap, nmeas_list, anchoring, square_root_filters,
+                 update_types, update_args, predict_args,
+                 calculate_sigma_points_args, restore_args,
+                 unique_inverse=None, checkpoint_args=None, weights=None,
+                 params_type=None, profiler=None):
+        self.like_vec = like_vec
+        self.parse_params_args = parse_params_args
+        self.subtract_controls_args = subtract_controls_args
+        self.restore_args = restore_args
+        self.calculate_sigma_points_args = calculate_sigma_points_args
+        self.predict_args = predict_args
+        self.predict_func = predict_function(square_root_filters)
+        self.stagemap = [int(stage) for stage in stagemap]
+        self.nperiods = len(stagemap)
+        self.update_funcs = tuple(
+            update_function(square_root_filters, update_type)
+            for update_type in update_types)
+        self.update_args = tuple(tuple(u_args) for u_args in update_args)
+        # the updates of period t are update_bounds[t]: update_bounds[t + 1]
+        self.update_bounds = [int(b) for b in np.cumsum([0] + nmeas_list)]
+        self.anchoring = anchoring
+        self.unique_inverse = unique_inverse
+        self.checkpoint_args = checkpoint_args
+        self.params_type = params_type
+        self.profiler = profiler
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """Set the weights of the individuals.
+
+        The buffers of the state do not depend on the weights. A state can
+        therefore be reused with other weights, e.g. in the next bootstrap
+        replication.
+
+        """
+        self.weights = weights
+        # identifies the weights in the keys of the EvaluationCache
+        self.weights_key = None if weights is None else array_digest(weights)
+        # weights of the rows on which the filter runs
+        if self.unique_inverse is None:
+            self.filter_weights = weights
+        else:
+            self.filter_weights = np.bincount(
+                self.unique_inverse, weights=weights,
+                minlength=len(self.like_vec))
+
+
+def log_likelihood_per_individual(params, state):
     """Return the log likelihood for each individual in the sample.
 
     Users do not have to call this function directly and do not have to bother
@@ -22,7 +95,8 @@ def log_likelihood_per_individual(
     problem of the model into many smaller problems.
 
     First the params vector is parsed into the many quantities that depend on
-    it. See :ref:`params_and_quants` for details.
+    it. See :ref:`params_and_quants` for details. Then the contribution of the
+    control variables is subtracted from all measurements.
 
     Then, for each period of the model first all Kalman updates for the
     measurement equations are done. Each Kalman update updates the following
@@ -42,31 +116,202 @@ def log_likelihood_per_individual(
     In the last period an additional update is done to incorporate the
     anchoring equation into the likelihood.
 
+    If individuals with identical histories were collapsed into unique rows
+    (see :ref:`model_specs`), the filter only runs on these rows and
+    unique_inverse is used to expand the result to one value per individual.
+
+    If the state has weights, the contribution of each individual is
+    multiplied with its weight. Integer weights are frequency weights, e.g.
+    the number of times an individual was drawn in a bootstrap replication.
+
+    If the state has checkpoint_args, the filtered quantities are stored at
+    the start of each period. A later evaluation that only differs in
+    parameters that influence the filter from some period onward, e.g. the
+    evaluations of a numerical gradient, restarts from the stored quantities
+    of that period. See :func:`checkpoint_plan`.
+
+    If the state has a profiler, the wall time of each stage of the
+    evaluation is recorded in it. See
+    :class:`skillmodels.estimation.profiling.LikelihoodProfiler`.
+
+    Args:
+        params (np.ndarray): the params vector
+        state (LikelihoodState): the arguments of the likelihood function.
+
     """
+    log_like_vec = _log_likelihood_of_filter_rows(params, state)
+    if state.unique_inverse is not None:
+        log_like_vec = log_like_vec[state.unique_inverse]
+    if state.weights is not None:
+        log_like_vec = log_like_vec * state.weights
+    return log_like_vec
+
+
+def log_likelihood(params, state):
+    """Return the (weighted) sum of the log likelihood of all individuals.
+
+    This is equal to the sum of :func:`log_likelihood_per_individual` but the
+    contributions are aggregated on the rows on which the filter runs, i.e.
+    without expanding collapsed individuals first.
+
+    """
+    log_like_vec = _log_likelihood_of_filter_rows(params, state)
+    if state.filter_weights is None:
+        return log_like_vec.sum()
+    else:
+        return np.dot(state.filter_weights, log_like_vec)
+
+
+def _log_likelihood_of_filter_rows(params, state):
+    """Run the Kalman filter and return the log likelihood of its rows."""
+    like_vec = state.like_vec
+    checkpoint_args = state.checkpoint_args
+    update_funcs = state.update_funcs
+    update_args = state.update_args
+    update_bounds = state.update_bounds
+    # the profiler is only called if it is not None; tic is the start of the
+    # stage that is currently running
+    profiler = state.profiler
+    if profiler is not None:
+        evaluation_start = tic = time.perf_counter()
+
     like_vec[:] = 1.0
-    restore_unestimated_quantities(**restore_args)
-    parse_params(params, **parse_params_args)
-    k = 0
-    for t, stage in enumerate(stagemap):
-        for j in range(nmeas_list[t]):
-            # measurement updates
-            update(square_root_filters, update_types[k], update_args[k])
-            k += 1
-        if t < len(stagemap) - 1:
-            calculate_sigma_points(**calculate_sigma_points_args)
-            predict(stage, square_root_filters, predict_args)
-    if anchoring is True:
-        j += 1
+    restore_unestimated_quantities(**state.restore_args)
+    if profiler is not None:
+        tic = profiler.stop('restore', tic)
+    parse_params(params, **state.parse_params_args)
+    if profiler is not None:
+        tic = profiler.stop('parse_params', tic)
+    subtract_controls(**state.subtract_controls_args)
+    if profiler is not None:
+        tic = profiler.stop('subtract_controls', tic)
+
+    start, save = 0, False
+    if checkpoint_args is not None:
+        start, save = checkpoint_plan(params, **checkpoint_args)
+        if save is True:
+            # invalidate the checkpoints until they are completely rewritten
+            checkpoint_args['base_params'][:] = np.nan
+        elif start > 0:
+            restore_checkpoint(start, **checkpoint_args)
+        if profiler is not None:
+            tic = profiler.stop('checkpoints', tic)
+
+    for t in range(start, state.nperiods):
+        if save is True:
+            save_checkpoint(t, **checkpoint_args)
+            if profiler is not None:
+                tic = profiler.stop('checkpoints', tic, t)
+        # measurement updates
+        for k in range(update_bounds[t], update_bounds[t + 1]):
+            update_funcs[k](*update_args[k])
+        if profiler is not None:
+            tic = profiler.stop('updates', tic, t)
+        if t < state.nperiods - 1:
+            calculate_sigma_points(**state.calculate_sigma_points_args)
+            if profiler is not None:
+                tic = profiler.stop('sigma_points', tic, t)
+            state.predict_func(state.stagemap[t], profiler=profiler,
+                               period=t, **state.predict_args)
+            if profiler is not None:
+                tic = time.perf_counter()
+    if state.anchoring is True:
         # anchoring update
-        update(square_root_filters, update_types[k], update_args[k])
+        k = update_bounds[-1]
+        update_funcs[k](*update_args[k])
+        if profiler is not None:
+            tic = profiler.stop('anchoring', tic, state.nperiods - 1)
+
+    if save is True:
+        checkpoint_args['base_params'][:] = params
 
     small = 1e-250
     like_vec[like_vec < small] = small
-    return np.log(like_vec)
+    log_like_vec = np.log(like_vec)
+    if profiler is not None:
+        profiler.stop('log_likelihood', tic)
+        profiler.stop_evaluation(evaluation_start)
+    return log_like_vec
+
+
+def subtract_controls(y_data, c_data, deltas, out):
+    """Subtract the contribution of the control variables from measurements.
+
+    The contribution of the controls is the same for all factor distributions
+    and for all Kalman updates in which a row of c_data is used. It is
+    therefore calculated for all updates of a period with one matrix product
+    instead of inside the update functions.
+
+    Args:
+        y_data (np.ndarray): numpy array of (nupdates, nind) with measurements.
+        c_data (list): list of numpy arrays of (nind, ncontrols_t + 1).
+        deltas (list): list of numpy arrays of (nupdates_t, ncontrols_t + 1).
+        out (np.ndarray): numpy array of (nupdates, nind).
+
+    """
+    k = 0
+    for c, delta in zip(c_data, deltas):
+        stop = k + len(delta)
+        np.dot(delta, c.T, out=out[k: stop])
+        np.subtract(y_data[k: stop], out[k: stop], out=out[k: stop])
+        k = stop
+
+
+def checkpoint_plan(params, first_periods, base_params, **kwargs):
+    """Return the first period that has to be filtered and if it is saved.
+
+    The checkpoints are valid for base_params. The filter has to run from
+    the first period that is influenced by an entry of params that differs
+    from base_params. If no entry differs, only the last period is run again.
 
+    Numerical derivatives evaluate the likelihood at params vectors that
+    differ from a common point in one or two entries. Such evaluations never
+    replace the checkpoints, even if they have to run the complete filter.
+    All other evaluations, e.g. at a new point of an optimizer, run the
+    complete filter and store new checkpoints.
 
-def update(square_root_filters, update_type, update_args):
-    """Select and call the correct update function.
+    Args:
+        params (np.ndarray): the current params vector.
+        first_periods (np.ndarray): integer array of the same length as params
+            with the first period that is influenced by each entry of params.
+        base_params (np.ndarray): the params vector of the last evaluation
+            that stored checkpoints. NaN if there are no valid checkpoints.
+
+    Returns:
+        start (int): the first period that has to be filtered.
+        save (bool): True if the evaluation stores new checkpoints.
+
+    """
+    changed = np.asarray(params) != base_params
+    if np.isnan(base_params).any() or changed.sum() > 2:
+        return 0, True
+    elif changed.any():
+        return first_periods[changed].min(), False
+    else:
+        return first_periods.max(), False
+
+
+def save_checkpoint(period, states, covs, weights, like_vec, stored_states,
+                    stored_covs, stored_weights, stored_like_vecs, **kwargs):
+    """Store the filtered quantities at the start of period."""
+    stored_states[period] = states
+    stored_covs[period] = covs
+    stored_weights[period] = weights
+    stored_like_vecs[period] = like_vec
+
+
+def restore_checkpoint(period, states, covs, weights, like_vec, stored_states,
+                       stored_covs, stored_weights, stored_like_vecs,
+                       **kwargs):
+    """Overwrite the filtered quantities with those stored for period."""
+    states[:] = stored_states[period]
+    covs[:] = stored_covs[period]
+    weights[:] = stored_weights[period]
+    like_vec[:] = stored_like_vecs[period]
+
+
+def update_function(square_root_filters, update_type):
+    """Select the correct update function.
 
     The actual update functions are implemented in several modules in
     :ref:`fast_routines`
@@ -74,27 +319,24 @@ def update(square_root_filters, update_type, update_args):
     """
     if square_root_filters is True:
         if update_type == 'linear':
-            sqrt_linear_update(*update_args)
+            return sqrt_linear_update
         else:
-            sqrt_probit_update(**update_args)
+            return sqrt_probit_update
     else:
         if update_type == 'linear':
-            normal_linear_update(*update_args)
+            return normal_linear_update
         else:
-            normal_probit_update(**update_args)
+            return normal_probit_update
 
 
-def predict(stage, square_root_filters, predict_args):
-    """Select and call the correct predict function.
+def predict_function(square_root_filters):
+    """Select the correct predict function.
 
     The actual predict functions are implemented in several modules in
     :ref:`fast_routines`
 
     """
     if square_root_filters is True:
-        sqrt_unscented_predict(stage, **predict_args)
+        return sqrt_unscented_predict
     else:
-        normal_unscented_predict(stage, **predict_args)
-
-
-
+        return normal_unscented_predict
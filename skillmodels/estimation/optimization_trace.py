@@ -0,0 +1,129 @@
+"""Buffered binary trace of all likelihood evaluations of an optimization.
+
+Each evaluation is stored as one fixed size record with the params vector,
+the log likelihood value, a timestamp and the kind of the evaluation. The
+records are collected in memory and appended to one binary file in batches,
+which is much cheaper than writing one small file per evaluation.
+
+The file starts with the number of parameters as 8 byte integer. It is
+followed by the records. Use :func:`read_optimization_trace` to read it.
+
+"""
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+KINDS = ['loglike', 'loglikeobs']
+
+
+def record_dtype(nparams):
+    """Numpy dtype of one record of the trace."""
+    return np.dtype([('params', np.float64, (nparams, )),
+                     ('log_lh_value', np.float64),
+                     ('time', np.float64),
+                     ('kind', np.uint8)])
+
+
+class OptimizationTrace:
+    """Append-only binary trace of likelihood evaluations.
+
+    The trace is a context manager. Records that are still in the buffer are
+    written when the context is left. Recording is thread safe.
+
+    Args:
+        path (str): path of the trace file.
+        nparams (int): length of the params vectors.
+        append (bool): if True and the file exists, new records are appended
+            to it. Otherwise the file is overwritten.
+        buffer_size (int): number of records that are written together.
+
+    """
+
+    def __init__(self, path, nparams, append=False, buffer_size=1000):
+        self.path = path
+        self.nparams = nparams
+        self.buffer = np.zeros(buffer_size, dtype=record_dtype(nparams))
+        self.nbuffered = 0
+        self._lock = threading.Lock()
+        if append is True and os.path.exists(path):
+            assert _read_nparams(path) == nparams, (
+                'The trace {} has params vectors of a different length.'
+                .format(path))
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(np.int64(nparams).tobytes())
+            # the header is needed to read a trace before the first batch
+            self._file.flush()
+
+    def record(self, params, log_lh_value, kind):
+        """Add one evaluation to the trace.
+
+        Args:
+            params (np.ndarray): the params vector.
+            log_lh_value (float): the log likelihood value.
+            kind (str): one of KINDS.
+
+        """
+        with self._lock:
+            i = self.nbuffered
+            self.buffer['params'][i] = params
+            self.buffer['log_lh_value'][i] = log_lh_value
+            self.buffer['time'][i] = time.time()
+            self.buffer['kind'][i] = KINDS.index(kind)
+            self.nbuffered += 1
+            if self.nbuffered == len(self.buffer):
+                self._flush()
+
+    def flush(self):
+        """Write all buffered records to the file."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._file.write(self.buffer[:self.nbuffered].tobytes())
+        self._file.flush()
+        self.nbuffered = 0
+
+    def close(self):
+        """Write the remaining records and close the file."""
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _read_nparams(path):
+    with open(path, 'rb') as f:
+        return int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+
+
+def read_optimization_trace(path, param_names=None):
+    """Read a trace written by :class:`OptimizationTrace`.
+
+    Args:
+        path (str): path of the trace file.
+        param_names (list): optional names of the parameters. The default
+            names are param_0, param_1, ...
+
+    Returns:
+        trace (DataFrame): one row per evaluation with the columns kind,
+        log_lh_value, time and one column per parameter.
+
+    """
+    nparams = _read_nparams(path)
+    records = np.fromfile(path, dtype=record_dtype(nparams), offset=8)
+    if param_names is None:
+        param_names = ['param_{}'.format(i) for i in range(nparams)]
+    trace = pd.DataFrame(records['params'], columns=param_names)
+    trace.insert(0, 'kind', np.array(KINDS)[records['kind']])
+    trace.insert(1, 'log_lh_value', records['log_lh_value'])
+    trace.insert(2, 'time', records['time'])
+    return trace
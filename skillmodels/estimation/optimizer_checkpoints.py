@@ -0,0 +1,83 @@
+"""Periodic checkpoints of the optimization of the chs estimator.
+
+Long estimations can be interrupted, e.g. if a job on a cluster is preempted.
+:class:`OptimizerCheckpoints` tracks the optimizer and regularly writes the
+current iterate, the best function value, the number of iterations and the
+number of function evaluations to a json file. An interrupted optimization
+can be resumed from this file.
+
+The L-BFGS-B implementation of scipy does not expose its internal memory of
+gradient differences and can not be started with one. A resumed optimization
+therefore starts with an empty memory, which costs only a few iterations.
+
+"""
+import json
+import os
+import numpy as np
+
+
+class OptimizerCheckpoints:
+    """Track an optimization and write checkpoints to a json file.
+
+    Args:
+        path (str): path of the json file. None means that no checkpoints
+            are written but the counters are still tracked.
+        interval (int): number of iterations between two checkpoints.
+        checkpoint (dict): a checkpoint from :func:`read_checkpoint` if an
+            optimization is resumed.
+
+    """
+
+    def __init__(self, path=None, interval=10, checkpoint=None):
+        self.path = path
+        self.interval = interval
+        if checkpoint is None:
+            checkpoint = {'x': None, 'best_x': None, 'best_fun': np.inf,
+                          'nit': 0, 'nfev': 0}
+        self.x = checkpoint['x']
+        self.best_x = checkpoint['best_x']
+        self.best_fun = checkpoint['best_fun']
+        self.nit = checkpoint['nit']
+        self.nfev = checkpoint['nfev']
+
+    def objective(self, func):
+        """Wrap func to count evaluations and track the best value."""
+        def wrapped(x, *args):
+            fun = func(x, *args)
+            self.nfev += 1
+            if fun < self.best_fun:
+                self.best_fun = float(fun)
+                self.best_x = np.array(x).tolist()
+            return fun
+        return wrapped
+
+    def callback(self, xk):
+        """Callback of the optimizer that is called after each iteration."""
+        self.nit += 1
+        self.x = np.array(xk).tolist()
+        if self.path is not None and self.nit % self.interval == 0:
+            self.save()
+
+    def save(self):
+        """Write the checkpoint.
+
+        The file is replaced atomically, such that an interruption while
+        writing does not destroy the previous checkpoint.
+
+        """
+        checkpoint = {'x': self.x, 'best_x': self.best_x,
+                      'best_fun': self.best_fun, 'nit': self.nit,
+                      'nfev': self.nfev}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as j:
+            json.dump(checkpoint, j)
+        os.replace(tmp_path, self.path)
+
+
+def read_checkpoint(path):
+    """Read a checkpoint written by :class:`OptimizerCheckpoints`."""
+    with open(path) as j:
+        checkpoint = json.load(j)
+    if checkpoint['x'] is None:
+        checkpoint['x'] = checkpoint['best_x']
+    return checkpoint
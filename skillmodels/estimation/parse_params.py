@@ -11,59 +11,79 @@ already been done in SkillModel.
 """
 import skillmodels.model_functions.transition_functions as tf
 import numpy as np
-from numpy.core.umath_tests import matrix_multiply
 from numpy.linalg import cholesky
 
 
-def _map_params_to_deltas(params, initial, params_slice, boo):
-    """Map paremeters from params to delta for each period."""
-    for t, delta in enumerate(initial):
-        delta[boo[t]] = params[params_slice[t]]
+def pool_arrays(arrays):
+    """Copy arrays into one contiguous buffer.
 
+    All quantities that are directly filled with entries of params are views
+    on one buffer. This makes it possible to scatter the params vector into
+    all of them with one vectorized index operation. See
+    :func:`_scatter_params`.
 
-def _map_params_to_psi(params, initial, params_slice, boo):
-    """Map parameters from params to psi."""
-    initial[boo] = params[params_slice]
+    Args:
+        arrays (list): list of numpy arrays of type float.
 
+    Returns:
+        buffer (np.ndarray): 1d array with the values of all arrays.
 
-def _map_params_to_H(params, initial, params_slice, boo, psi_bool_for_H=None,
-                     psi=None, arr1=None, arr2=None, endog_position=None,
-                     initial_copy=None):
-    """Map parameters from params to H."""
-    # the initial H has to be restored if endog_correction is True
-    if psi is not None:
-        initial[:] = initial_copy
+        views (list): views on buffer with the shapes of the arrays.
 
-    # fill H with the new parameters
-    initial[boo] = params[params_slice]
+        offsets (list): the position of the first element of each array
+            in buffer.
 
-    # make some transformations with psi in the case of endog correction
-    if psi is not None:
-        arr1[:] = initial[psi_bool_for_H, endog_position].reshape(arr1.shape)
-        initial[psi_bool_for_H, endog_position] = 0
-        initial[psi_bool_for_H] += np.multiply(arr1, psi, out=arr2)
+    """
+    sizes = [arr.size for arr in arrays]
+    offsets = list(np.cumsum([0] + sizes[:-1]))
+    buffer = np.zeros(sum(sizes))
+    views = []
+    for arr, offset, size in zip(arrays, offsets, sizes):
+        view = buffer[offset: offset + size].reshape(arr.shape)
+        view[:] = arr
+        views.append(view)
+    return buffer, views, offsets
+
+
+def _scatter_params(params, buffer, buffer_positions, params_positions):
+    """Write entries of params into all quantities that are views on buffer.
+
+    Args:
+        params (np.ndarray): the params vector
+        buffer (np.ndarray): see :func:`pool_arrays`
+        buffer_positions (np.ndarray): integer array with the positions in
+            buffer that are overwritten.
+        params_positions (np.ndarray): integer array of the same length with
+            the positions in params from where the values are taken.
 
+    """
+    buffer[buffer_positions] = np.take(params, params_positions)
 
-def _map_params_to_R(params, initial, params_slice, square_root_filters):
-    """Map parameters from params to R."""
-    if square_root_filters is False:
-        initial[:] = params[params_slice]
-    else:
-        initial[:] = np.sqrt(params[params_slice])
 
+def _transform_H_with_psi(initial, boo, psi_bool_for_H, psi, arr1, arr2,
+                          endog_position, initial_copy):
+    """Transform the rows of H that are affected by the endog correction."""
+    # the entries that are not filled from params are restored from the copy
+    np.copyto(initial, initial_copy, where=~boo)
+    arr1[:] = initial[psi_bool_for_H, endog_position].reshape(arr1.shape)
+    initial[psi_bool_for_H, endog_position] = 0
+    initial[psi_bool_for_H] += np.multiply(arr1, psi, out=arr2)
 
-def _map_params_to_Q(params, initial, params_slice, boo, replacements=None):
-    """Map parameters from params to Q."""
-    initial[boo] = params[params_slice]
-    if replacements is not None:
-        for put_position, take_from_position in replacements:
-            initial[put_position] = initial[take_from_position]
+
+def _transform_R(initial, square_root_filters):
+    """Take the square root of the measurement variances if necessary."""
+    if square_root_filters is True:
+        np.sqrt(initial, out=initial)
+
+
+def _replace_Q(initial, replacements):
+    """Copy the variances of stages without new transition parameters."""
+    for put_position, take_from_position in replacements:
+        initial[put_position] = initial[take_from_position]
 
 
-def _map_params_to_X_zero(
-        params, initial, filler, params_slice, replacements=None):
-    """Map parameters from params to X_zero."""
-    filler[:] = params[params_slice].reshape(filler.shape)
+def _X_zero_from_filler(initial, filler, replacements=None):
+    """Fill X_zero with the filler that contains its parameters."""
     if replacements is not None:
         for add_to_position, take_from_position in replacements:
             filler[add_to_position] += filler[take_from_position]
@@ -76,26 +96,24 @@ def _map_params_to_W_zero(params, initial, params_slice):
     initial[:] = params[params_slice]
 
 
-def _map_params_to_P_zero(params, params_type, initial, params_slice, filler,
-                          boo, cholesky_of_P_zero,
-                          square_root_filters):
-    """Map parameters from params to P_zero."""
-    # write params in filler
-    filler[:] = 0
-    filler[boo] = params[params_slice]
+def _symmetrize(filler):
+    """Fill the lower triangles of the upper triangular matrices in filler."""
+    return filler + np.transpose(np.triu(filler, k=1), axes=(0, 2, 1))
+
 
-    # transform the filler
+def _P_zero_from_filler(params_type, initial, filler, cholesky_of_P_zero,
+                        square_root_filters):
+    """Fill P_zero with the filler that contains its parameters."""
+    # the filler is not modified such that its lower triangles stay zero
     if params_type == 'short' or cholesky_of_P_zero is True:
         if square_root_filters is False:
             # make chol_t to not chol
-            filler = matrix_multiply(
-                np.transpose(filler, axes=(0, 2, 1)), filler)
+            filler = np.matmul(np.transpose(filler, axes=(0, 2, 1)), filler)
     else:
         # make not_chol to not_chol (as covariance matrices are symmetric,
         # only half of its off-diagonal elements have to be estimated. here the
         # lower triangle is filled with he transpose of the upper triangle.)
-        for i in range(len(filler)):
-            filler[i] += (filler[i] - np.diag(np.diagonal(filler[i]))).T
+        filler = _symmetrize(filler)
 
         if square_root_filters is True:
             # make not_chol to chol_t
@@ -107,6 +125,23 @@ def _map_params_to_P_zero(params, params_type, initial, params_slice, filler,
         initial[:, :, 1:, 1:] = filler
 
 
+def _transform_trans_coeffs(params, transformations):
+    """Fill the trans_coeffs that are transformed from the short params.
+
+    Args:
+        params (np.ndarray): the params vector
+        transformations (list): list of tuples with the transform function,
+            the params_slice, the included factors and a list of rows of
+            trans_coeffs. Each function is called once and the result is
+            written into all rows that share the params_slice.
+
+    """
+    for func, params_slice, included, rows in transformations:
+        func(params[params_slice], included, 'short_to_long', out=rows[0])
+        for row in rows[1:]:
+            row[:] = rows[0]
+
+
 def _map_params_to_trans_coeffs(params, initial, params_slice,
                                 transform_funcs=None, included_factors=None,
                                 direction='short_to_long'):
@@ -123,29 +158,33 @@ def _map_params_to_trans_coeffs(params, initial, params_slice,
                     direction, out=coeffs[s])
 
 
-def parse_params(params, deltas_args, H_args, R_args, Q_args, P_zero_args,
-                 trans_coeffs_args, X_zero_args=None, W_zero_args=None,
-                 psi_args=None):
+def parse_params(params, scatter_args, R_args, P_zero_args, trans_coeffs_args,
+                 H_args=None, Q_args=None, X_zero_args=None,
+                 W_zero_args=None):
     """Parse params into the quantities that depend on it.
 
-    All quantities are updated in place. The order is important in some cases.
-    For example, H has to be updated after psi (if psi is used at all).
+    All quantities are updated in place. First, all entries of params that
+    are used without transformation are written into deltas, psi, H, R, Q,
+    trans_coeffs and the fillers of X_zero and P_zero with one index
+    operation. Then the remaining transformations are applied. The order is
+    important in some cases. For example, H has to be transformed after psi
+    is filled (if psi is used at all).
 
     The arguments of this function are generated in the CHSModel class.
 
     """
-    _map_params_to_deltas(params, **deltas_args)
-    if psi_args is not None:
-        _map_params_to_psi(params, **psi_args)
-    _map_params_to_H(params, **H_args)
-    _map_params_to_R(params, **R_args)
-    _map_params_to_Q(params, **Q_args)
+    _scatter_params(params, **scatter_args)
+    if H_args is not None:
+        _transform_H_with_psi(**H_args)
+    _transform_R(**R_args)
+    if Q_args is not None:
+        _replace_Q(**Q_args)
     if X_zero_args is not None:
-        _map_params_to_X_zero(params, **X_zero_args)
+        _X_zero_from_filler(**X_zero_args)
     if W_zero_args is not None:
         _map_params_to_W_zero(params, **W_zero_args)
-    _map_params_to_P_zero(params, **P_zero_args)
-    _map_params_to_trans_coeffs(params, **trans_coeffs_args)
+    _P_zero_from_filler(**P_zero_args)
+    _transform_trans_coeffs(params, **trans_coeffs_args)
 
 
 def restore_unestimated_quantities(X_zero=None, X_zero_value=None,
@@ -181,14 +220,11 @@ def transform_params_for_P_zero(params_for_P_zero, filler, boo,
         return params_for_P_zero
     elif direction == 'short_to_long':
         filler[boo] = params_for_P_zero
-        filler = matrix_multiply(
-            np.transpose(filler, axes=(0, 2, 1)), filler)
+        filler = np.matmul(np.transpose(filler, axes=(0, 2, 1)), filler)
         return filler[boo]
     else:
         filler[boo] = params_for_P_zero
-        for i in range(len(filler)):
-            filler[i] += (filler[i] - np.diag(np.diagonal(filler[i]))).T
-        filler = np.transpose(cholesky(filler), axes=(0, 2, 1))
+        filler = np.transpose(cholesky(_symmetrize(filler)), axes=(0, 2, 1))
         return filler[boo]
 
 
@@ -0,0 +1,136 @@
+"""Built-in profiling of the likelihood function.
+
+External profilers can not look into compiled numba code and their overhead
+distorts the timings of the many short calls in the likelihood loop.
+:class:`LikelihoodProfiler` instead measures the wall time of each stage of
+an evaluation with time.perf_counter. The likelihood function only calls it
+if its LikelihoodState has a profiler. Without one, the evaluation only pays
+for a few comparisons with None.
+
+"""
+import threading
+import time
+from collections import defaultdict
+import pandas as pd
+
+
+STAGES = ['restore', 'parse_params', 'subtract_controls', 'checkpoints',
+          'updates', 'sigma_points', 'transition_functions',
+          'predict_covariances', 'anchoring', 'log_likelihood']
+
+# stages that are timed separately for each period
+PERIOD_STAGES = ['checkpoints', 'updates', 'sigma_points',
+                 'transition_functions', 'predict_covariances', 'anchoring']
+
+
+class LikelihoodProfiler:
+    """Collect wall times and call counts of the stages of the likelihood.
+
+    Timing is thread safe, such that one profiler can be shared by all
+    LikelihoodStates of a model.
+
+    Attributes:
+        times (dict): cumulative wall time in seconds per (stage, period).
+            period is None for stages that run once per evaluation.
+        calls (dict): number of calls per (stage, period).
+        nevaluations (int): number of profiled evaluations.
+        total_time (float): cumulative wall time of the profiled evaluations.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Remove all timings."""
+        with self._lock:
+            self.times = defaultdict(float)
+            self.calls = defaultdict(int)
+            self.nevaluations = 0
+            self.total_time = 0.0
+
+    def stop(self, stage, start, period=None):
+        """Add the time since start to stage and return the current time.
+
+        The return value is the start of the next stage.
+
+        """
+        now = time.perf_counter()
+        key = (stage, period)
+        with self._lock:
+            self.times[key] += now - start
+            self.calls[key] += 1
+        return now
+
+    def stop_evaluation(self, start):
+        """Add the time since start to the total time of the evaluations."""
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.total_time += elapsed
+            self.nevaluations += 1
+
+    def report(self, by_period=False):
+        """Return the timings as DataFrame.
+
+        Args:
+            by_period (bool): if True, the stages in PERIOD_STAGES are
+                reported for each period. Their calls outside the period
+                loop, e.g. the restoration of filter checkpoints, are not
+                included. The default is False.
+
+        Returns:
+            report (DataFrame): indexed by stage or by stage and period. The
+            columns are time (seconds), calls, time_per_call and share, the
+            share of the total time of the profiled evaluations.
+
+        """
+        with self._lock:
+            times = dict(self.times)
+            calls = dict(self.calls)
+            total_time = self.total_time
+
+        if len(times) == 0:
+            return _empty_report(by_period)
+
+        rows = []
+        for (stage, period), t in times.items():
+            rows.append({'stage': stage, 'period': period, 'time': t,
+                         'calls': calls[(stage, period)]})
+        df = pd.DataFrame(rows, columns=['stage', 'period', 'time', 'calls'])
+        df['stage_pos'] = df['stage'].apply(STAGES.index)
+
+        if by_period is True:
+            df = df[df['stage'].isin(PERIOD_STAGES) & df['period'].notnull()]
+            df = df.astype({'period': int})
+            df = df.sort_values(['stage_pos', 'period'])
+            df = df.set_index(['stage', 'period'])
+        else:
+            df = df.groupby(['stage_pos', 'stage'])[['time', 'calls']].sum()
+            df = df.reset_index().set_index('stage')
+        df = df[['time', 'calls']].astype({'calls': int})
+        df['time_per_call'] = df['time'] / df['calls']
+        df['share'] = df['time'] / total_time if total_time > 0 else 0.0
+        return df
+
+    def __getstate__(self):
+        # locks can not be pickled
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _empty_report(by_period):
+    """Report without timings that has the columns of a report."""
+    if by_period is True:
+        index = pd.MultiIndex.from_arrays([[], []], names=['stage', 'period'])
+    else:
+        index = pd.Index([], name='stage')
+    return pd.DataFrame(
+        {'time': pd.Series(dtype=float), 'calls': pd.Series(dtype=int),
+         'time_per_call': pd.Series(dtype=float),
+         'share': pd.Series(dtype=float)}).set_index(index)
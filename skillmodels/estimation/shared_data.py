@@ -0,0 +1,53 @@
+"""Share large arrays with worker processes through memory mapped files.
+
+When a SkillModel is sent to the processes of a multiprocessing Pool it is
+pickled for each task. Arrays that are stored as :class:`SharedArray` are only
+written to disk once. Their pickled form is a path and each worker maps the
+file into memory instead of holding a private copy of the data.
+
+"""
+import os
+import numpy as np
+
+
+class SharedArray:
+    """Lightweight and picklable handle of an array in a npy file.
+
+    Args:
+        path (str): path of the npy file.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return a read-only memory map of the array."""
+        return np.load(self.path, mmap_mode='r')
+
+
+def share_array(arr, directory, name):
+    """Write arr to directory and return a SharedArray handle.
+
+    Args:
+        arr (np.ndarray or list): numpy array or list of numpy arrays.
+        directory (str): existing directory where the npy files are stored.
+        name (str): name of the file without extension.
+
+    Returns:
+        handle (SharedArray or list): a list of handles if arr is a list.
+
+    """
+    if isinstance(arr, list):
+        return [share_array(a, directory, '{}_{}'.format(name, i))
+                for i, a in enumerate(arr)]
+    path = os.path.join(directory, name + '.npy')
+    np.save(path, np.ascontiguousarray(arr))
+    return SharedArray(path)
+
+
+def load_shared(handle):
+    """Load a SharedArray or a list of SharedArrays."""
+    if isinstance(handle, list):
+        return [load_shared(h) for h in handle]
+    return handle.load()
@@ -1,11 +1,27 @@
 from skillmodels.pre_processing.model_spec_processor import ModelSpecProcessor
 from skillmodels.pre_processing.data_processor import DataProcessor
+from skillmodels.pre_processing.data_processor import unique_individuals
 from skillmodels.estimation.likelihood_function import \
-    log_likelihood_per_individual
-from skillmodels.estimation.wa_functions import initial_meas_coeffs, \
-    prepend_index_level, factor_covs_and_measurement_error_variances, \
-    iv_reg_array_dict, iv_reg, large_df_for_iv_equations, \
-    transition_error_variance_from_u_covs, anchoring_error_variance_from_u_vars
+    log_likelihood_per_individual, log_likelihood, LikelihoodState
+from skillmodels.estimation.shared_data import SharedArray, share_array, \
+    load_shared
+from skillmodels.estimation.executors import executor_context, \
+    map_unordered, shares_memory
+from skillmodels.estimation.workspaces import WorkspacePool
+from skillmodels.estimation.evaluation_cache import EvaluationCache
+from skillmodels.estimation.bhhh import bhhh, bounds_arrays
+from skillmodels.estimation.svrg import svrg
+from skillmodels.estimation.optimizer_checkpoints import \
+    OptimizerCheckpoints, read_checkpoint
+from skillmodels.estimation.optimization_trace import OptimizationTrace
+from skillmodels.estimation.profiling import LikelihoodProfiler
+from skillmodels.estimation.wa_functions import \
+    initial_meas_coeffs_from_moments, prepend_index_level, \
+    factor_covs_and_measurement_error_variances, iv_reg_array_dict, \
+    weighted_iv_reg, weighted_means_and_covs, weighted_covs, \
+    monomial_exponents, coeffs_after_affine_transformation, \
+    large_df_for_iv_equations, transition_error_variance_from_u_covs, \
+    anchoring_error_variance_from_u_vars
 from statsmodels.base.model import GenericLikelihoodModel
 from statsmodels.base.model import LikelihoodModelResults
 from skillmodels.estimation.skill_model_results import \
@@ -23,10 +39,19 @@ from scipy.optimize import minimize
 from statsmodels.tools.numdiff import approx_hess, approx_fprime
 import pandas as pd
 import json
-from multiprocessing import Pool
+import copy
+import os
+import tempfile
+import threading
+from functools import partial
+from contextlib import contextmanager
+from numpy.lib.format import open_memmap
 import warnings
 
 
+_params_slices_lock = threading.Lock()
+
+
 class SkillModel(GenericLikelihoodModel):
     """Estimate dynamic nonlinear latent factor models.
 
@@ -54,13 +79,15 @@ class SkillModel(GenericLikelihoodModel):
         dataset_name (str): same as model_name
         save_path (str): specifies where intermediate results are saved.
         bootstrap_samples (list): optional, see docs of bootstrap functions.
+        telemetry (EstimationTelemetry): optional observer that reports the
+            progress of the estimation. See :ref:`basic_usage`.
 
     """
 
     def __init__(
             self, model_dict, dataset, estimator, model_name='some_model',
             dataset_name='some_dataset', save_path=None,
-            bootstrap_samples=None):
+            bootstrap_samples=None, telemetry=None):
         self.estimator = estimator
         specs = ModelSpecProcessor(
             model_dict=model_dict, dataset=dataset, estimator=estimator,
@@ -72,6 +99,11 @@ class SkillModel(GenericLikelihoodModel):
         self.y_data = data.y_data()
         self.__dict__.update(specs_dict)
 
+        if self.estimator == 'chs' and self.deduplicate_individuals is True:
+            self.unique_y_data, self.unique_c_data, self.unique_inverse, \
+                self.frequency_weights = unique_individuals(
+                    self.y_data, self.c_data)
+
         if bootstrap_samples is not None:
             self.bootstrap_samples = bootstrap_samples
             self._check_bs_samples()
@@ -91,6 +123,17 @@ class SkillModel(GenericLikelihoodModel):
 
         self.df_model = self.len_params(params_type='short')
         self.df_resid = self.nobs - self.df_model
+        self.workspace_pool = WorkspacePool(self._build_workspace)
+        self.evaluation_cache = EvaluationCache(self.evaluation_cache_size)
+        self.optimization_trace = None
+        if self.profile_likelihood is True:
+            self.likelihood_profiler = LikelihoodProfiler()
+        else:
+            self.likelihood_profiler = None
+        self.telemetry = telemetry
+        if telemetry is not None:
+            telemetry.labels.setdefault('model', self.model_name)
+            telemetry.labels.setdefault('dataset', self.dataset_name)
 
     def _general_params_slice(self, length):
         """Slice object for params taking the "next" *length* elements.
@@ -360,10 +403,11 @@ class SkillModel(GenericLikelihoodModel):
         self.lower_bound[params_slice] = \
             self.robust_bounds * self.bounds_distance
 
-    def _initial_X_zero(self):
+    def _initial_X_zero(self, nind=None):
         """Initial X_zero array filled with zeros."""
-        init = np.zeros((self.nobs, self.nemf, self.nfac))
-        flat_init = init.reshape(self.nobs * self.nemf, self.nfac)
+        nind = self.nobs if nind is None else nind
+        init = np.zeros((nind, self.nemf, self.nfac))
+        flat_init = init.reshape(nind * self.nemf, self.nfac)
         return init, flat_init
 
     def _X_zero_filler(self):
@@ -412,9 +456,10 @@ class SkillModel(GenericLikelihoodModel):
             X_zero_names.append(format_string.format(n, fac))
         return X_zero_names
 
-    def _initial_W_zero(self):
+    def _initial_W_zero(self, nind=None):
         """Initial W_zero array filled with 1/nemf."""
-        return np.ones((self.nobs, self.nemf)) / self.nemf
+        nind = self.nobs if nind is None else nind
+        return np.ones((nind, self.nemf)) / self.nemf
 
     def _params_slice_for_W_zero(self, params_type):
         """A slice object, selecting the part of params mapped to W_zero.
@@ -429,17 +474,18 @@ class SkillModel(GenericLikelihoodModel):
         """List with names for the params mapped to W_zero."""
         return ['W_zero__{}'.format(n) for n in range(self.nemf)]
 
-    def _initial_P_zero(self):
+    def _initial_P_zero(self, nind=None):
         """Initial P_zero array filled with zeros."""
+        nind = self.nobs if nind is None else nind
         if self.square_root_filters is False:
-            init = np.zeros((self.nobs, self.nemf, self.nfac, self.nfac))
+            init = np.zeros((nind, self.nemf, self.nfac, self.nfac))
             flat_init = init.reshape(
-                self.nobs * self.nemf, self.nfac, self.nfac)
+                nind * self.nemf, self.nfac, self.nfac)
         else:
             init = np.zeros(
-                (self.nobs, self.nemf, self.nfac + 1, self.nfac + 1))
+                (nind, self.nemf, self.nfac + 1, self.nfac + 1))
             flat_init = init.reshape(
-                self.nobs * self.nemf, self.nfac + 1, self.nfac + 1)
+                nind * self.nemf, self.nfac + 1, self.nfac + 1)
         return init, flat_init
 
     def _P_zero_filler(self):
@@ -609,13 +655,15 @@ class SkillModel(GenericLikelihoodModel):
             that map params to the corresponding quantity.
 
         """
-        self.param_counter = 0
-        slices = {}
-        for quantity in self.params_quants:
-            func = '_params_slice_for_{}'.format(quantity)
-            slices[quantity] = getattr(self, func)(params_type)
-        # safety measure
-        del self.param_counter
+        # the lock makes the side effect on self.param_counter thread safe
+        with _params_slices_lock:
+            self.param_counter = 0
+            slices = {}
+            for quantity in self.params_quants:
+                func = '_params_slice_for_{}'.format(quantity)
+                slices[quantity] = getattr(self, func)(params_type)
+            # safety measure
+            del self.param_counter
         return slices
 
     def len_params(self, params_type):
@@ -885,7 +933,7 @@ class SkillModel(GenericLikelihoodModel):
         scaling_factor = np.sqrt(self.kappa + self.nfac)
         return scaling_factor
 
-    def _initial_quantities_dict(self):
+    def _initial_quantities_dict(self, nind):
         init_dict = {}
         needed_quantities = self.params_quants.copy()
 
@@ -895,59 +943,188 @@ class SkillModel(GenericLikelihoodModel):
             needed_quantities.append('W_zero')
 
         for quant in needed_quantities:
-            if quant not in ['X_zero', 'P_zero']:
-                init_dict[quant] = getattr(self, '_initial_{}'.format(quant))()
-            else:
-                normal, flat = getattr(self, '_initial_{}'.format(quant))()
+            func = getattr(self, '_initial_{}'.format(quant))
+            if quant in ['X_zero', 'P_zero']:
+                normal, flat = func(nind)
                 init_dict[quant] = normal
                 init_dict['flat_{}'.format(quant)] = flat
+            elif quant == 'W_zero':
+                init_dict[quant] = func(nind)
+            else:
+                init_dict[quant] = func()
+
+        init_dict['P_zero_filler'] = self._P_zero_filler()
+        if 'X_zero' in self.params_quants:
+            init_dict['X_zero_filler'] = self._X_zero_filler()
+
+        # all quantities that are directly filled with entries of params are
+        # views on one buffer. See parse_params.pool_arrays.
+        keys = []
+        for quant in self._pooled_quantities():
+            if type(init_dict[quant]) == list:
+                keys += [(quant, i) for i in range(len(init_dict[quant]))]
+            else:
+                keys.append((quant, None))
+        arrays = [init_dict[quant] if i is None else init_dict[quant][i]
+                  for quant, i in keys]
+        buffer, views, offsets = pp.pool_arrays(arrays)
+        for (quant, i), view in zip(keys, views):
+            if i is None:
+                init_dict[quant] = view
+            else:
+                init_dict[quant][i] = view
+        init_dict['params_buffer'] = buffer
+        init_dict['buffer_offsets'] = dict(zip(keys, offsets))
 
-        sp = np.zeros((self.nemf * self.nobs, self.nsigma, self.nfac))
+        # measurements net of the contribution of control variables
+        init_dict['y_net'] = np.zeros((self.nupdates, nind))
+
+        sp = np.zeros((self.nemf * nind, self.nsigma, self.nfac))
         init_dict['sigma_points'] = sp
         init_dict['flat_sigma_points'] = sp.reshape(
-            self.nemf * self.nobs * self.nsigma, self.nfac)
+            self.nemf * nind * self.nsigma, self.nfac)
 
         return init_dict
 
+    def _pooled_quantities(self):
+        """Names of the quantities that are views on the params buffer."""
+        pooled = ['deltas', 'H', 'R', 'Q', 'trans_coeffs', 'P_zero_filler']
+        if 'psi' in self.params_quants:
+            pooled.append('psi')
+        if 'X_zero' in self.params_quants:
+            pooled.append('X_zero_filler')
+        return pooled
+
+    def _scatter_args_dict(self, initial_quantities, slices, transform_funcs):
+        """Arguments for the scatter of params into the params buffer.
+
+        The positions in the params buffer and in params are calculated once
+        for all entries of params that are used without transformation. See
+        parse_params._scatter_params.
+
+        """
+        targets = []
+        deltas_bool = self._deltas_bool()
+        for t in self.periods:
+            targets.append(
+                (('deltas', t), deltas_bool[t], slices['deltas'][t]))
+        targets.append((('H', None), self._H_bool(), slices['H']))
+        targets.append(
+            (('R', None), np.ones(self.nupdates, dtype=bool), slices['R']))
+        targets.append((('Q', None), self._Q_bool(), slices['Q']))
+        targets.append(
+            (('P_zero_filler', None), self._P_zero_bool(), slices['P_zero']))
+        if 'psi' in self.params_quants:
+            targets.append((('psi', None), self._psi_bool(), slices['psi']))
+        if 'X_zero' in self.params_quants:
+            boo = np.ones((self.nemf, self.nfac), dtype=bool)
+            targets.append((('X_zero_filler', None), boo, slices['X_zero']))
+        for f, s in product(range(self.nfac), self.stages):
+            if transform_funcs[f] is None:
+                boo = np.zeros_like(
+                    initial_quantities['trans_coeffs'][f], dtype=bool)
+                boo[s] = True
+                targets.append(
+                    (('trans_coeffs', f), boo, slices['trans_coeffs'][f][s]))
+
+        offsets = initial_quantities['buffer_offsets']
+        buffer_positions = []
+        params_positions = []
+        for key, boo, params_slice in targets:
+            buffer_positions.append(offsets[key] + np.flatnonzero(boo))
+            params_positions.append(
+                np.arange(params_slice.start, params_slice.stop))
+            assert len(buffer_positions[-1]) == len(params_positions[-1]), (
+                'The params_slice for {} selects {} entries of params but {} '
+                'entries have to be filled in model {}').format(
+                    key[0], len(params_positions[-1]),
+                    len(buffer_positions[-1]), self.model_name)
+
+        sc_args = {}
+        sc_args['buffer'] = initial_quantities['params_buffer']
+        sc_args['buffer_positions'] = np.concatenate(buffer_positions)
+        sc_args['params_positions'] = np.concatenate(params_positions)
+        return sc_args
+
+    def _trans_coeffs_transformations(self, initial_quantities, slices,
+                                      transform_funcs):
+        """List with the transformations of trans_coeffs.
+
+        See parse_params._transform_trans_coeffs.
+
+        """
+        transformations = []
+        for f, func in enumerate(transform_funcs):
+            if func is not None:
+                coeffs = initial_quantities['trans_coeffs'][f]
+                f_slices = slices['trans_coeffs'][f]
+                for s in self.stages:
+                    if s == 0 or f_slices[s] != f_slices[s - 1]:
+                        transformations.append(
+                            (getattr(tf, func), f_slices[s],
+                             self.included_factors[f], [coeffs[s]]))
+                    else:
+                        transformations[-1][3].append(coeffs[s])
+        return transformations
+
     def _parse_params_args_dict(self, initial_quantities, params_type):
-        pp = {}
+        pp_args = {}
         slices = self.params_slices(params_type=params_type)
+        if params_type == 'short':
+            transform_funcs = self._transform_trans_coeffs_funcs()
+        else:
+            transform_funcs = [None] * self.nfac
 
         # when adding initial quantities it's very important not to make copies
-        for quant in self.params_quants:
-            entry = '{}_args'.format(quant)
-            pp[entry] = {'initial': initial_quantities[quant]}
-            pp[entry]['params_slice'] = slices[quant]
-            if hasattr(self, '_{}_bool'.format(quant)):
-                pp[entry]['boo'] = getattr(self, '_{}_bool'.format(quant))()
-            if hasattr(self, '_{}_filler'.format(quant)):
-                pp[entry]['filler'] = getattr(
-                    self, '_{}_filler'.format(quant))()
-            if hasattr(self, '_{}_replacements'.format(quant)):
-                rep = getattr(self, '_{}_replacements'.format(quant))()
-                if len(rep) > 0:
-                    pp[entry]['replacements'] = rep
+        pp_args['scatter_args'] = self._scatter_args_dict(
+            initial_quantities, slices, transform_funcs)
 
         if self.endog_correction is True:
             helpers = self._helpers_for_H_transformation_with_psi()
-            pp['H_args']['psi'] = initial_quantities['psi']
-            pp['H_args']['psi_bool_for_H'] = helpers[0]
-            pp['H_args']['arr1'] = helpers[1]
-            pp['H_args']['arr2'] = helpers[2]
-            pp['H_args']['endog_position'] = self.endog_position
-            pp['H_args']['initial_copy'] = initial_quantities['H'].copy()
-
-        pp['P_zero_args']['cholesky_of_P_zero'] = self.cholesky_of_P_zero
-        pp['P_zero_args']['square_root_filters'] = self.square_root_filters
-        pp['P_zero_args']['params_type'] = params_type
+            pp_args['H_args'] = {
+                'initial': initial_quantities['H'],
+                'boo': self._H_bool(),
+                'psi': initial_quantities['psi'],
+                'psi_bool_for_H': helpers[0],
+                'arr1': helpers[1],
+                'arr2': helpers[2],
+                'endog_position': self.endog_position,
+                'initial_copy': initial_quantities['H'].copy()}
+
+        pp_args['R_args'] = {
+            'initial': initial_quantities['R'],
+            'square_root_filters': self.square_root_filters}
+
+        replacements = self._Q_replacements()
+        if len(replacements) > 0:
+            pp_args['Q_args'] = {
+                'initial': initial_quantities['Q'],
+                'replacements': replacements}
 
-        pp['R_args']['square_root_filters'] = self.square_root_filters
+        if 'X_zero' in self.params_quants:
+            pp_args['X_zero_args'] = {
+                'initial': initial_quantities['X_zero'],
+                'filler': initial_quantities['X_zero_filler']}
+            replacements = self._X_zero_replacements()
+            if len(replacements) > 0:
+                pp_args['X_zero_args']['replacements'] = replacements
 
-        if params_type == 'short':
-            pp['trans_coeffs_args']['transform_funcs'] = \
-                self._transform_trans_coeffs_funcs()
-            pp['trans_coeffs_args']['included_factors'] = self.included_factors
-        return pp
+        if 'W_zero' in self.params_quants:
+            pp_args['W_zero_args'] = {
+                'initial': initial_quantities['W_zero'],
+                'params_slice': slices['W_zero']}
+
+        pp_args['P_zero_args'] = {
+            'params_type': params_type,
+            'initial': initial_quantities['P_zero'],
+            'filler': initial_quantities['P_zero_filler'],
+            'cholesky_of_P_zero': self.cholesky_of_P_zero,
+            'square_root_filters': self.square_root_filters}
+
+        pp_args['trans_coeffs_args'] = {
+            'transformations': self._trans_coeffs_transformations(
+                initial_quantities, slices, transform_funcs)}
+        return pp_args
 
     def _restore_unestimated_quantities_args_dict(self, initial_quantities):
         r_args = {}
@@ -977,19 +1154,25 @@ class SkillModel(GenericLikelihoodModel):
                         initial_quantities['X_zero'],
                         initial_quantities['P_zero'],
                         like_vec,
-                        self.y_data[k],
-                        self.c_data[t],
-                        initial_quantities['deltas'][t][j],
+                        initial_quantities['y_net'][k],
                         initial_quantities['H'][k],
                         initial_quantities['R'][k: k + 1],
                         np.arange(self.nfac)[position_helper[k]],
                         initial_quantities['W_zero']]
                     if self.square_root_filters is False:
-                        u_args.append(np.zeros((self.nobs, self.nfac)))
+                        u_args.append(np.zeros((len(like_vec), self.nfac)))
                     u_args_list.append(u_args)
                     k += 1
         return u_args_list
 
+    def _subtract_controls_args_dict(self, initial_quantities, y_data, c_data):
+        sc_args = {}
+        sc_args['y_data'] = y_data
+        sc_args['c_data'] = [c.astype(float) for c in c_data]
+        sc_args['deltas'] = initial_quantities['deltas']
+        sc_args['out'] = initial_quantities['y_net']
+        return sc_args
+
     def _transition_equation_args_dicts(self, initial_quantities):
         dict_list = [[{} for f in self.factors] for s in self.stages]
 
@@ -1039,14 +1222,104 @@ class SkillModel(GenericLikelihoodModel):
         sp_args['scaling_factor'] = self.sigma_scaling_factor()
         return sp_args
 
-    def likelihood_arguments_dict(self, params_type):
-        """Construct a dict with arguments for the likelihood function."""
-        initial_quantities = self._initial_quantities_dict()
+    def _params_first_periods(self, params_type):
+        """Integer array with the first period influenced by each param.
+
+        Parameters of the measurement equations influence the filter from
+        the period of the measurement onwards. Parameters of the transition
+        equations are used in the predict step at the end of the first period
+        of their stage. All other parameters influence the first period.
+
+        args:
+            params_type (str): Takes the values 'short' and 'long'. See
+                :ref:`params_type`.
+
+        Returns:
+            np.ndarray: array of length len_params(params_type).
+
+        """
+        slices = self.params_slices(params_type)
+        first_periods = np.zeros(self.len_params(params_type), dtype=int)
+        update_periods = np.array(self.update_info.index.get_level_values(0))
+        first_stage_periods = [list(self.stagemap).index(s)
+                               for s in self.stages]
+
+        for t, sl in enumerate(slices['deltas']):
+            first_periods[sl] = t
+
+        H_periods = update_periods.copy()
+        if self.anchor_in_predict is True:
+            # the anchoring parameters are used in each predict step
+            H_periods[-1] = 0
+            first_periods[slices['deltas'][-1]] = 0
+        H_rows = np.nonzero(self._H_bool())[0]
+        first_periods[slices['H']] = H_periods[H_rows]
+
+        first_periods[slices['R']] = update_periods
+
+        Q_stages = np.nonzero(self._Q_bool())[0]
+        first_periods[slices['Q']] = \
+            np.array(first_stage_periods)[Q_stages]
+
+        # later stages can share the slice of an earlier stage
+        for f, s in product(range(self.nfac), reversed(self.stages)):
+            first_periods[slices['trans_coeffs'][f][s]] = \
+                first_stage_periods[s]
+
+        return first_periods
+
+    def _checkpoint_args_dict(self, initial_quantities, like_vec,
+                              params_type):
+        cp_args = {}
+        cp_args['first_periods'] = self._params_first_periods(params_type)
+        cp_args['base_params'] = np.full(len(cp_args['first_periods']),
+                                         np.nan)
+        cp_args['like_vec'] = like_vec
+        cp_args['stored_like_vecs'] = np.zeros(
+            (self.nperiods, ) + like_vec.shape)
+        for name, quant in [('states', 'X_zero'), ('covs', 'P_zero'),
+                            ('weights', 'W_zero')]:
+            cp_args[name] = initial_quantities[quant]
+            cp_args['stored_{}'.format(name)] = np.zeros(
+                (self.nperiods, ) + initial_quantities[quant].shape)
+        return cp_args
+
+    def _likelihood_data(self):
+        """y_data, c_data and the number of individuals used in the filter.
+
+        If deduplicate_individuals is True, the Kalman filter only runs on the
+        unique measurement and control histories.
+
+        """
+        if self.estimator == 'chs' and self.deduplicate_individuals is True:
+            y_data, c_data = self.unique_y_data, self.unique_c_data
+            nind = len(self.frequency_weights)
+        else:
+            y_data, c_data = self.y_data, self.c_data
+            nind = self.nobs
+        return y_data, c_data, nind
+
+    def likelihood_arguments_dict(self, params_type, weights=None):
+        """Construct a dict with arguments for the likelihood function.
+
+        Args:
+            params_type (str): 'short' or 'long'
+            weights (np.ndarray): optional weights of the individuals. See
+                :func:`log_likelihood_per_individual`.
+
+        """
+        y_data, c_data, nind = self._likelihood_data()
+        initial_quantities = self._initial_quantities_dict(nind)
 
         args = {}
-        args['like_vec'] = np.ones(self.nobs)
+        args['params_type'] = params_type
+        args['like_vec'] = np.ones(nind)
         args['parse_params_args'] = self._parse_params_args_dict(
             initial_quantities, params_type=params_type)
+        if self.estimator == 'chs':
+            args['subtract_controls_args'] = \
+                self._subtract_controls_args_dict(
+                    initial_quantities, y_data, c_data)
         args['stagemap'] = self.stagemap
         args['nmeas_list'] = self.nmeas_list
         args['anchoring'] = self.anchoring
@@ -1059,41 +1332,185 @@ class SkillModel(GenericLikelihoodModel):
             self._calculate_sigma_points_args_dict(initial_quantities)
         args['restore_args'] = self._restore_unestimated_quantities_args_dict(
             initial_quantities)
+        if self.estimator == 'chs' and self.deduplicate_individuals is True:
+            args['unique_inverse'] = self.unique_inverse
+        if self.estimator == 'chs' and self.checkpoint_filter_states is True:
+            args['checkpoint_args'] = self._checkpoint_args_dict(
+                initial_quantities, args['like_vec'], params_type)
+        if weights is not None:
+            args['weights'] = self._checked_weights(weights)
         return args
 
-    def nloglikeobs(self, params, args):
+    def _checked_weights(self, weights):
+        """Return weights as float array after checking their length."""
+        if weights is None:
+            return None
+        assert len(weights) == self.nobs, (
+            'The weights must have one entry per individual. This error '
+            'occured in model {} with dataset {}'.format(
+                self.model_name, self.dataset_name))
+        return np.asarray(weights, dtype=float)
+
+    def likelihood_state(self, params_type, weights=None):
+        """Construct the LikelihoodState used by the likelihood function.
+
+        If profile_likelihood is True, all states share the
+        LikelihoodProfiler of the model.
+
+        """
+        return LikelihoodState(
+            profiler=self.likelihood_profiler,
+            **self.likelihood_arguments_dict(params_type, weights))
+
+    def _build_workspace(self, key):
+        """Build a new workspace for the WorkspacePool of the model.
+
+        Args:
+            key (tuple): the kind of the workspace, i.e. 'state' for a
+                LikelihoodState and 'arguments' for a dict from
+                :meth:`likelihood_arguments_dict`, and the params_type.
+
+        """
+        kind, params_type = key
+        if kind == 'state':
+            return self.likelihood_state(params_type)
+        else:
+            return self.likelihood_arguments_dict(params_type)
+
+    @contextmanager
+    def workspace(self, kind, params_type, weights=None):
+        """Context manager that lends a workspace from the WorkspacePool.
+
+        The buffers of the workspace are used by nobody else until the
+        context is left. Afterwards the workspace is reused instead of being
+        built again. LikelihoodStates keep their filter checkpoints.
+
+        Args:
+            kind (str): 'state' or 'arguments'. See :meth:`_build_workspace`.
+            params_type (str): 'short' or 'long'
+            weights (np.ndarray): optional weights of the individuals. Only
+                used for workspaces of kind 'state'.
+
+        """
+        with self.workspace_pool.workspace((kind, params_type)) as workspace:
+            if kind == 'state':
+                workspace.set_weights(self._checked_weights(weights))
+            yield workspace
+
+    def nloglikeobs(self, params, state):
         """Negative log likelihood function per individual.
 
         This is the function used to calculate the standard errors based on
         the outer product of gradients.
 
         """
-        return - log_likelihood_per_individual(params, **args)
+        return - self.loglikeobs(params, state)
 
-    def nloglike(self, params, args):
+    def nloglike(self, params, state):
         """Negative log likelihood function.
 
         This is the function used to fit the model as numeric optimization
         methods are implemented as minimizers.
 
         """
-        if self.save_intermediate_optimization_results is True:
-            path = self.save_path + '/opt_results/iteration{}.json'
-            with open(path.format(self.optimize_iteration_counter), 'w') as j:
-                json.dump(params.tolist(), j)
-            self.optimize_iteration_counter += 1
-        return - log_likelihood_per_individual(params, **args).sum()
+        return - self.loglike(params, state)
+
+    def loglikeobs(self, params, state):
+        """Log likelihood per individual.
+
+        The result is memoized in the EvaluationCache of the model. During
+        an optimization with save_intermediate_optimization_results, the
+        evaluation is recorded in the optimization trace.
+
+        """
+        key = ('loglikeobs', state.params_type, state.weights_key)
+        res = self.evaluation_cache.lookup(
+            key, params, partial(log_likelihood_per_individual, params, state))
+        if self.optimization_trace is not None:
+            self.optimization_trace.record(params, res.sum(), 'loglikeobs')
+        return res
+
+    def loglike(self, params, state):
+        """Log likelihood.
+
+        The result is memoized in the EvaluationCache of the model. During
+        an optimization with save_intermediate_optimization_results, the
+        evaluation is recorded in the optimization trace.
+
+        """
+        key = ('loglike', state.params_type, state.weights_key)
+        res = self.evaluation_cache.lookup(
+            key, params, partial(log_likelihood, params, state))
+        if self.optimization_trace is not None:
+            self.optimization_trace.record(params, res, 'loglike')
+        return res
+
+    @contextmanager
+    def _optimization_trace(self, append=False):
+        """Record all likelihood evaluations while the context is active.
+
+        If save_intermediate_optimization_results is True, the evaluations
+        are written to save_path/opt_results/trace.bin. It can be read with
+        :func:`skillmodels.estimation.optimization_trace.
+        read_optimization_trace`.
+
+        """
+        if self.save_intermediate_optimization_results is False:
+            yield
+            return
+        path = self.save_path + '/opt_results/trace.bin'
+        with OptimizationTrace(path, self.len_params('short'),
+                               append=append) as trace:
+            self.optimization_trace = trace
+            try:
+                yield
+            finally:
+                self.optimization_trace = None
 
-    def loglikeobs(self, params, args):
-        """Log likelihood per individual."""
-        return log_likelihood_per_individual(params, **args)
+    def clear_evaluation_cache(self):
+        """Remove all memoized likelihood values and derivatives.
 
-    def loglike(self, params, args):
-        """Log likelihood."""
-        return log_likelihood_per_individual(params, **args).sum()
+        This is necessary if model attributes are changed after the
+        likelihood was evaluated. Idle workspaces are discarded as well
+        because they were built from the old attributes.
+
+        """
+        self.evaluation_cache.clear()
+        self.workspace_pool.clear()
+
+    def profiling_report(self, by_period=False):
+        """Return the timings of the stages of the likelihood function.
+
+        Only available if profile_likelihood is True. Evaluations in worker
+        processes are not included.
+
+        Args:
+            by_period (bool): if True, the stages that are run in each period
+                are reported per period.
+
+        Returns:
+            report (DataFrame): see
+            :meth:`skillmodels.estimation.profiling.LikelihoodProfiler.report`
+
+        """
+        assert self.likelihood_profiler is not None, (
+            'A profiling report is only available if profile_likelihood is '
+            'True. This error occured in model {} with dataset {}'.format(
+                self.model_name, self.dataset_name))
+        return self.likelihood_profiler.report(by_period=by_period)
+
+    @contextmanager
+    def _telemetry_phase(self, phase):
+        """Measure the time of phase if the model has a telemetry."""
+        if self.telemetry is None:
+            yield
+        else:
+            with self.telemetry.phase(phase):
+                yield
 
     def estimate_params_chs(self, start_params=None, params_type='short',
-                            return_optimize_dict=True):
+                            return_optimize_dict=True, weights=None,
+                            multistart=True, resume_from=None):
         """Estimate the params vector with the chs estimator.
 
         Args:
@@ -1104,27 +1521,105 @@ class SkillModel(GenericLikelihoodModel):
             return_optimize_dict (bool): if True, in addition to the params
                 vector a dictionary with information from the numerical
                 optimization is returned.
+            weights (np.ndarray): optional frequency weights of the
+                individuals. This is used to fit bootstrap replications
+                without resampling the data.
+            multistart (bool): if True and multistart_nstarts is larger than
+                one, the optimization starts from the survivor of
+                :meth:`_multistart_params`.
+            resume_from (str or bool): path of a checkpoint written with
+                save_optimizer_checkpoints. The optimization continues from
+                the checkpoint and start_params as well as all warm starts
+                are ignored. True means the checkpoint in save_path.
+
+        If progressive_sample_shares is specified and no weights are used,
+        the optimization is warm started with
+        :meth:`_progressive_start_params`. If minibatch_nbatches is specified
+        and no weights are used, the start values are then improved with
+        the stochastic steps of :meth:`_minibatch_start_params`.
 
         """
-        if start_params is None:
+        checkpoint = None
+        if resume_from is not None:
+            if resume_from is True:
+                resume_from = self._optimizer_checkpoint_path()
+            checkpoint = read_checkpoint(resume_from)
+            start_params = np.array(checkpoint['x'])
+        elif start_params is None:
             start_params = self.generate_start_params()
         bounds = self.bounds_list()
-        args = self.likelihood_arguments_dict(params_type='short')
-        if self.save_intermediate_optimization_results is True:
-            self.optimize_iteration_counter = 0
-        res = minimize(self.nloglike, start_params, args=(args),
-                       method='L-BFGS-B', bounds=bounds,
-                       options={'maxiter': self.maxiter,
-                                'maxfun': self.maxfun})
+        history = None
+        progressive_history = None
+        warm_start = checkpoint is None and weights is None
+        if warm_start and self.progressive_sample_shares is not None:
+            start_params, progressive_history = \
+                self._progressive_start_params(start_params, multistart)
+        elif checkpoint is None and multistart is True and \
+                self.multistart_nstarts > 1:
+            start_params, history = self._multistart_params(
+                start_params, bounds, weights)
+        gradient_norms = None
+        if warm_start and self.minibatch_nbatches is not None:
+            start_params, gradient_norms = self._minibatch_start_params(
+                start_params, bounds)
+        trace_context = self._optimization_trace(
+            append=checkpoint is not None)
+        telemetry = self.telemetry
+        if telemetry is not None:
+            telemetry.start_optimization()
+        with self.workspace('state', 'short', weights) as state, \
+                trace_context:
+            if self.chs_optimizer == 'bhhh':
+                loglikeobs = partial(self.loglikeobs, state=state)
+                callback = None
+                if telemetry is not None:
+                    loglikeobs = telemetry.objective(loglikeobs)
+                    callback = telemetry.iteration_end
+                res = bhhh(loglikeobs, start_params, bounds=bounds,
+                           weights=state.weights, maxiter=self.maxiter,
+                           tolerance=self.bhhh_tolerance, callback=callback)
+            else:
+                path = None
+                if self.save_optimizer_checkpoints is True and weights is None:
+                    path = self._optimizer_checkpoint_path()
+                tracker = OptimizerCheckpoints(
+                    path, self.optimizer_checkpoint_interval, checkpoint)
+                objective = self.nloglike
+                callback = tracker.callback
+                if telemetry is not None:
+                    objective = telemetry.objective(objective, negative=True)
+
+                    def callback(xk):
+                        tracker.callback(xk)
+                        telemetry.callback(xk)
+                # a resumed optimization only gets the remaining budget
+                options = {'maxiter': max(1, self.maxiter - tracker.nit),
+                           'maxfun': max(1, self.maxfun - tracker.nfev)}
+                res = minimize(tracker.objective(objective), start_params,
+                               args=(state, ), method='L-BFGS-B',
+                               bounds=bounds, callback=callback,
+                               options=options)
+                res.nfev = tracker.nfev
+                if path is not None:
+                    tracker.save()
 
         optimize_dict = {}
         optimize_dict['success'] = res.success
         optimize_dict['nfev'] = res.nfev
         optimize_dict['log_lh_value'] = -res.fun
         optimize_dict['xopt'] = res.x.tolist()
+        if history is not None:
+            optimize_dict['multistart_history'] = history
+        if progressive_history is not None:
+            optimize_dict['progressive_history'] = progressive_history
+        if gradient_norms is not None:
+            optimize_dict['minibatch_gradient_norms'] = gradient_norms
 
         params = self.expandparams(res.x) if params_type == 'long' else res.x
 
+        if self.chs_optimizer == 'bhhh' and weights is None:
+            self._store_bhhh_cov_matrix(res)
+
         if optimize_dict['success'] is False:
             warnings.warn(
                 'The model {} in dataset {} terminated unsuccessfully. Its '
@@ -1141,6 +1636,195 @@ class SkillModel(GenericLikelihoodModel):
         else:
             return params
 
+    def _optimizer_checkpoint_path(self):
+        """Path of the optimizer checkpoint in save_path."""
+        return self.save_path + '/opt_results/checkpoint.json'
+
+    def _subsample_model(self, positions):
+        """Copy of the model with the individuals at positions.
+
+        The copy shares the model specifications with the original model.
+        Only the data arrays are subsets of the original ones, such that the
+        Kalman filter of the copy only runs on the selected individuals. The
+        copy has its own WorkspacePool and EvaluationCache because its
+        workspaces have a different size.
+
+        """
+        sub_mod = copy.copy(self)
+        sub_mod.model_name = self.model_name + '_subsample_{}'.format(
+            len(positions))
+        sub_mod.nobs = len(positions)
+        sub_mod.y_data = self.y_data[:, positions]
+        sub_mod.c_data = [arr[positions] for arr in self.c_data]
+        if self.deduplicate_individuals is True:
+            sub_mod.unique_y_data, sub_mod.unique_c_data, \
+                sub_mod.unique_inverse, sub_mod.frequency_weights = \
+                unique_individuals(sub_mod.y_data, sub_mod.c_data)
+        sub_mod.progressive_sample_shares = None
+        sub_mod.save_intermediate_optimization_results = False
+        sub_mod.save_params_before_calculating_standard_errors = False
+        sub_mod.save_optimizer_checkpoints = False
+        sub_mod.workspace_pool = WorkspacePool(sub_mod._build_workspace)
+        sub_mod.evaluation_cache = EvaluationCache(self.evaluation_cache_size)
+        sub_mod.telemetry = None
+        return sub_mod
+
+    def _progressive_start_params(self, start_params, multistart=True):
+        """Warm start the chs estimator on growing random subsamples.
+
+        The model is fit on nested random subsamples whose sizes are the
+        progressive_sample_shares of the full sample. Each fit starts from
+        the estimates of the previous subsample. Most iterations far away
+        from the optimum are thus done with cheap likelihood evaluations.
+        If multistart is True, the multistart of :meth:`_multistart_params`
+        is run on the smallest subsample.
+
+        Returns:
+            params (np.ndarray): short params estimated on the largest
+                subsample.
+            history (list): list of dicts with the number of individuals,
+                the log likelihood value and the number of function
+                evaluations of each subsample.
+
+        """
+        permutation = np.random.permutation(self.nobs)
+        history = []
+        for i, share in enumerate(self.progressive_sample_shares):
+            nobs = int(np.ceil(share * self.nobs))
+            sub_mod = self._subsample_model(np.sort(permutation[:nobs]))
+            start_params, optimize_dict = sub_mod.estimate_params_chs(
+                start_params, params_type='short', return_optimize_dict=True,
+                multistart=multistart is True and i == 0)
+            history.append({'nobs': nobs,
+                            'log_lh_value': optimize_dict['log_lh_value'],
+                            'nfev': optimize_dict['nfev']})
+        return start_params, history
+
+    def _minibatch_start_params(self, start_params, bounds):
+        """Improve start_params with stochastic steps on mini-batches.
+
+        The individuals are randomly split into minibatch_nbatches
+        mini-batches. Each mini-batch is a model from
+        :meth:`_subsample_model`, such that the Kalman filter only runs on
+        its individuals. minibatch_epochs epochs of :func:`svrg` are run with
+        the numerical gradients of the average log likelihood of the
+        mini-batches. The result is polished on the full sample by
+        :meth:`estimate_params_chs`.
+
+        Returns:
+            params (np.ndarray): the short params after the last epoch.
+            gradient_norms (list): norm of the gradient of the average log
+                likelihood of the full sample at the start of each epoch.
+
+        """
+        batches = np.array_split(
+            np.random.permutation(self.nobs), self.minibatch_nbatches)
+        batch_models = [self._subsample_model(np.sort(positions))
+                        for positions in batches]
+        batch_shares = np.array([len(positions) for positions in batches])
+        batch_shares = batch_shares / self.nobs
+
+        def batch_gradient(b, params):
+            mod = batch_models[b]
+            with mod.workspace('state', 'short') as state:
+                return approx_fprime(
+                    params, lambda x: mod.loglike(x, state) / mod.nobs,
+                    centered=True).ravel()
+
+        return svrg(batch_gradient, start_params, batch_shares, bounds,
+                    epochs=self.minibatch_epochs,
+                    learning_rate=self.minibatch_learning_rate)
+
+    def _store_bhhh_cov_matrix(self, res):
+        """Store the outer product of gradients covariance matrix of bhhh.
+
+        The scores of the last bhhh iteration are the derivatives with respect
+        to the short params. The covariance matrix of the long params follows
+        with the delta method and the jacobian of expandparams, which does
+        not need any evaluations of the likelihood. It is stored together
+        with the long params in stored_bhhh_cov_matrix, where
+        :meth:`op_of_gradient_cov_matrix` finds it.
+
+        This is only done if the short and long params have the same length.
+        Otherwise the delta method does not give the outer product of the
+        scores with respect to the long params, which is what
+        :meth:`_op_of_gradient_cov_matrix` calculates.
+
+        """
+        if self.len_params('short') != self.len_params('long'):
+            return
+        jacobian = approx_fprime(res.x, self.expandparams, centered=True)
+        u = np.linalg.qr(res.score_obs)[1]
+        root = np.dot(jacobian, np.linalg.inv(u))
+        self.stored_bhhh_cov_matrix = (
+            self.expandparams(res.x), np.dot(root, root.T))
+
+    def _perturbed_start_params(self, start_params, bounds):
+        """List of multistart_nstarts start vectors around start_params.
+
+        The first entry is start_params. The others add normally distributed
+        noise with a standard deviation of multistart_perturbation times the
+        absolute value of the start value, but at least times 0.1. They are
+        clipped to the bounds.
+
+        """
+        start_params = np.array(start_params, dtype=float)
+        lower, upper = bounds_arrays(bounds, len(start_params))
+        scale = self.multistart_perturbation * np.maximum(
+            np.abs(start_params), 0.1)
+        noise = np.random.normal(
+            size=(self.multistart_nstarts - 1, len(start_params)))
+        draws = np.clip(start_params + scale * noise, lower, upper)
+        return [start_params] + list(draws)
+
+    def _multistart_round(self, start_params, bounds, weights=None):
+        """Run at most multistart_round_maxiter iterations of L-BFGS-B.
+
+        Returns:
+            params (np.ndarray): the short params vector after the round.
+            log_lh_value (float): the log likelihood at params.
+
+        """
+        with self.workspace('state', 'short', weights) as state:
+            res = minimize(lambda x: - self.loglike(x, state), start_params,
+                           method='L-BFGS-B', bounds=bounds,
+                           options={'maxiter': self.multistart_round_maxiter,
+                                    'maxfun': self.maxfun})
+        return res.x, -res.fun
+
+    def _multistart_params(self, start_params, bounds, weights=None):
+        """Select start values for the chs estimator by successive halving.
+
+        The optimization is started from the perturbed start vectors of
+        :meth:`_perturbed_start_params`. They are run in rounds of at most
+        multistart_round_maxiter iterations that are distributed with the
+        executor. After each round only the share multistart_keep_share of
+        the candidates with the highest log likelihood is continued, until
+        one candidate is left.
+
+        Returns:
+            params (np.ndarray): the surviving short params vector.
+            history (list): list with the log likelihood values of all
+                candidates in each round.
+
+        """
+        candidates = self._perturbed_start_params(start_params, bounds)
+        history = []
+        with self._shared_data_model() as shared_mod, self._executor() as ex:
+            round_func = partial(
+                shared_mod._multistart_round, bounds=bounds, weights=weights)
+            while len(candidates) > 1:
+                results = list(ex.map(round_func, candidates))
+                values = np.array([value for x, value in results])
+                history.append(values.tolist())
+                values[np.isnan(values)] = -np.inf
+                # at least one candidate is dropped in each round
+                nkeep = min(len(candidates) - 1, int(np.ceil(
+                    len(candidates) * self.multistart_keep_share)))
+                best = np.argsort(-values, kind='mergesort')[:nkeep]
+                candidates = [results[i][0] for i in best]
+        return candidates[0], history
+
     def all_variables_for_iv_equations(self, period, factor=None, suffix=''):
         """List of lists with names of measurements of included factors.
 
@@ -1293,27 +1977,39 @@ class SkillModel(GenericLikelihoodModel):
         res_meas.columns = [col + '_resid' for col in res_meas.columns]
         return res_meas
 
-    def all_iv_estimates(self, period, data, factor=None):
+    def all_iv_estimates(self, period, weights, factor=None):
         """Coeffs and residual covs for all IV equations of factor in period.
 
+        The IV equations are estimated for all rows of weights at once. Their
+        independent variables are the measurements instead of the residual
+        measurements. This does not change the residuals of the equations
+        and the coefficients are converted in
+        :meth:`_iv_coeffs_of_residual_measurements`. Therefore, the estimates
+        do not depend on wa estimates of earlier periods.
+
         Args:
             period (int): period identifier
+            weights (np.ndarray): array of shape [nweights, nind] with
+                frequency weights of the individuals in the index of
+                self.y_data[0].
             factor (str): name of a latent factor
-            data (DataFrames): see large_df_for_iv_equations in wa_functions
 
         Returns:
-            iv_coeffs (DataFrame): pandas DataFrame with the estimated
-            coefficients of all IV equations of factor in period. The
-            DataFrame has a Multiindex. The first level are the names of
-            the dependent variables (next period measurements) of the
-            estimated equations. The second level consists of integers that
-            identify the different combinations of independent variables.
+            iv_coeffs (list): list with one pandas DataFrame per row of
+            weights with the estimated coefficients of all IV equations of
+            factor in period. The DataFrames have a Multiindex. The first
+            level are the names of the dependent variables (next period
+            measurements) of the estimated equations. The second level
+            consists of integers that identify the different combinations of
+            independent variables.
 
         Returns:
-            u_cov_df (DataFrame): pandas DataFrame with covariances of iv
-            residuals u with alternative dependent variables. The index is
-            the same Multiindex as in iv_coeffs. The columns are all
-            possible dependent variables of *factor* in *period*.
+            u_cov_dfs (list): list with one pandas DataFrame per row of
+            weights with covariances of iv residuals u with alternative
+            dependent variables. The index is the same Multiindex as in
+            iv_coeffs. The columns are all possible dependent variables of
+            *factor* in *period*. In the anchoring period, the list contains
+            pandas Series with the variances of u instead.
 
         """
         last_period = self.periods[-1]
@@ -1327,52 +2023,166 @@ class SkillModel(GenericLikelihoodModel):
             nr_deltas = self.number_of_iv_parameters(factor)
             trans_name = self.transition_names[self.factors.index(factor)]
             depvars = self.measurements[factor][period + 1]
+            depvar_data = self.y_data[period + 1]
         else:
             nr_deltas = self.number_of_iv_parameters(anch_equation=True)
             trans_name = 'linear'
             depvars = [self.anch_outcome]
+            depvar_data = self.y_data[period]
 
-        iv_columns = ['delta_{}'.format(i) for i in range(nr_deltas)]
-        u_cov_columns = ['cov_u_{}'.format(y) for y in depvars]
+        indepvars_data = self.y_data[period].copy()
+        indepvars_data.columns = [
+            col + '_resid' for col in indepvars_data.columns]
+        data = large_df_for_iv_equations(
+            depvar_data=depvar_data, indepvars_data=indepvars_data,
+            instruments_data=self.y_data[period])
 
+        iv_columns = ['delta_{}'.format(i) for i in range(nr_deltas)]
         ind_tuples = [(dep_name, indep_loc) for dep_name, indep_loc in product(
             depvars, range(len(indep_permutations)))]
         index = pd.MultiIndex.from_tuples(ind_tuples)
 
-        iv_coeffs = pd.DataFrame(data=0.0, index=index, columns=iv_columns)
-        if period != last_period:
-            u_cov_df = pd.DataFrame(
-                data=0.0, index=index, columns=u_cov_columns)
-        else:
-            u_var_sr = pd.Series(
-                data=0.0, index=range(len(indep_permutations)), name='u_var')
+        nweights = len(weights)
+        coeffs = np.zeros((nweights, len(index), nr_deltas))
+        u_covs = np.full((nweights, len(index), len(depvars)), np.nan)
+        ids = self.y_data[0].index
 
+        row = 0
         for dep in depvars:
-            counter = 0
             for indep, instr in zip(indep_permutations, instr_permutations):
                 iv_arrs = iv_reg_array_dict(
                     dep, indep, instr, trans_name, data)
                 non_missing_index = iv_arrs.pop('non_missing_index')
-                deltas = iv_reg(**iv_arrs)
-                iv_coeffs.loc[(dep, counter)] = deltas
+                w = weights[:, ids.get_indexer(non_missing_index)]
+                deltas = weighted_iv_reg(weights=w, **iv_arrs)
+                coeffs[:, row] = deltas
                 y, x = iv_arrs['depvar_arr'], iv_arrs['indepvars_arr']
-                u = pd.Series(data=y - np.dot(x, deltas),
-                              index=non_missing_index)
+                u = y - np.dot(deltas, x.T)
 
                 if period != last_period:
-                    for dep2 in depvars:
+                    for d, dep2 in enumerate(depvars):
                         if dep2 != dep:
-                            u_cov_df.loc[(dep, counter), dep2] = \
-                                u.cov(data[('y', dep2)])
-                        else:
-                            u_cov_df.loc[(dep, counter), dep2] = np.nan
+                            other = data[('y', dep2)].loc[non_missing_index]
+                            u_covs[:, row, d] = weighted_covs(
+                                u, other.values, w)
                 else:
-                    u_var_sr[counter] = u.var()
-                counter += 1
+                    u_covs[:, row, 0] = weighted_covs(u, u, w)
+                row += 1
+
+        iv_coeffs = [pd.DataFrame(data=c, index=index, columns=iv_columns)
+                     for c in coeffs]
         if period != last_period:
-            return iv_coeffs, u_cov_df
+            u_cov_dfs = [pd.DataFrame(data=c, index=index, columns=depvars)
+                         for c in u_covs]
+            return iv_coeffs, u_cov_dfs
+        else:
+            u_var_srs = [pd.Series(
+                data=c[:, 0], index=range(len(indep_permutations)),
+                name='u_var') for c in u_covs]
+            return iv_coeffs, u_var_srs
+
+    def _iv_exponents(self, period, factor=None):
+        """Exponents of the residual measurements in the IV equations.
+
+        See monomial_exponents in wa_functions. The exponents refer to the
+        order of the residual measurements in the permutations from
+        :meth:`variable_permutations_for_iv_equations` and are the same for
+        all permutations.
+
+        """
+        indep_permutations, instr_permutations = \
+            self.variable_permutations_for_iv_equations(period, factor)
+        if period != self.periods[-1]:
+            trans_name = self.transition_names[self.factors.index(factor)]
         else:
-            return iv_coeffs, u_var_sr
+            trans_name = 'linear'
+        x_formula, _ = getattr(tf, 'iv_formula_{}'.format(trans_name))(
+            indep_permutations[0], instr_permutations[0])
+        return monomial_exponents(x_formula, indep_permutations[0])
+
+    def _iv_coeffs_of_residual_measurements(
+            self, period, iv_coeffs, exponents, factor=None):
+        """Convert iv_coeffs from :meth:`all_iv_estimates`.
+
+        The residual measurements are (measurement - intercept) / loading
+        with the wa estimates of the measurement coefficients in period.
+
+        Args:
+            period (int): period identifier
+            iv_coeffs (DataFrame): coefficients of the measurements
+            exponents (np.ndarray): see :meth:`_iv_exponents`
+            factor (str): name of a latent factor
+
+        Returns:
+            iv_coeffs (DataFrame): coefficients of the residual measurements
+
+        """
+        indep_permutations, _ = \
+            self.variable_permutations_for_iv_equations(period, factor)
+        loadings = self.extended_meas_coeffs('loadings', period)
+        intercepts = self.extended_meas_coeffs('intercepts', period)
+        meas_names = [[m[:-6] for m in perm] for perm in indep_permutations]
+        counters = iv_coeffs.index.get_level_values(1)
+        scale = np.array([loadings[names].values for names in meas_names])
+        shift = np.array([intercepts[names].values for names in meas_names])
+
+        coeffs = coeffs_after_affine_transformation(
+            iv_coeffs.values, exponents, scale[counters], shift[counters])
+        return pd.DataFrame(
+            data=coeffs, index=iv_coeffs.index, columns=iv_coeffs.columns)
+
+    def _wa_statistics(self, weights):
+        """Sample statistics on which the wa estimates are based.
+
+        The wa estimator only uses means and covariances of the measurements
+        and the results of the IV equations from :meth:`all_iv_estimates`.
+        None of them depends on wa estimates of earlier periods. They are
+        calculated for all rows of weights at once, such that many bootstrap
+        replications only need a few large matrix products.
+
+        Args:
+            weights (np.ndarray): array of shape [nweights, nind] with
+                frequency weights of the individuals in the index of
+                self.y_data[0].
+
+        Returns:
+            statistics (list): list with one dictionary per row of weights.
+            The key 'means' has a list with one Series of measurement means
+            per period, 'covs' a list with one covariance matrix per period,
+            'iv' a dictionary with the results of :meth:`all_iv_estimates`
+            for each (period, factor) and 'exponents' a dictionary with the
+            results of :meth:`_iv_exponents`. The factor is None for the
+            anchoring equation.
+
+        """
+        iv_keys = []
+        for t, (f, factor) in product(
+                self.periods[:-1], enumerate(self.factors)):
+            if self.transition_names[f] != 'constant':
+                iv_keys.append((t, factor))
+        if self.anchoring is True:
+            iv_keys.append((self.periods[-1], None))
+
+        exponents = {key: self._iv_exponents(*key) for key in iv_keys}
+        statistics = [{'means': [], 'covs': [], 'iv': {},
+                       'exponents': exponents} for w in weights]
+
+        ids = self.y_data[0].index
+        for t in self.periods:
+            data = self.y_data[t]
+            means, covs = weighted_means_and_covs(
+                data.values, weights[:, ids.get_indexer(data.index)])
+            for stats, mean, cov in zip(statistics, means, covs):
+                stats['means'].append(
+                    pd.Series(data=mean, index=data.columns))
+                stats['covs'].append(pd.DataFrame(
+                    data=cov, index=data.columns, columns=data.columns))
+
+        for key in iv_keys:
+            iv_coeffs, u_stats = self.all_iv_estimates(key[0], weights, key[1])
+            for stats, coeffs, u in zip(statistics, iv_coeffs, u_stats):
+                stats['iv'][key] = (coeffs, u)
+        return statistics
 
     def model_coeffs_from_iv_coeffs_args_dict(self, period, factor):
         """Dictionary with optional arguments of model_coeffs_from_iv_coeffs.
@@ -1423,19 +2233,28 @@ class SkillModel(GenericLikelihoodModel):
             self.identified_restrictions['trans_intercept_value'].loc[
                 stage, factor] = intercept
 
-    def _calculate_wa_quantities(self):
+    def _calculate_wa_quantities(self, statistics=None):
         """Helper function.
 
         In this function the wa estimates are calculated, but not yet written
         into a single params vector that can be used for later processing.
 
+        Args:
+            statistics (dict): optional, one element of the list returned by
+                :meth:`_wa_statistics`. By default, the statistics of the
+                unweighted sample are used.
+
         """
+        if statistics is None:
+            weights = np.ones((1, len(self.y_data[0])))
+            statistics = self._wa_statistics(weights)[0]
+
         self.identified_restrictions['coeff_sum_value'][:] = None
         self.identified_restrictions['trans_intercept_value'][:] = None
         t = 0
         # identify measurement system and factor means in initial period
-        meas_coeffs, X_zero = initial_meas_coeffs(
-            y_data=self.y_data[t],
+        meas_coeffs, X_zero = initial_meas_coeffs_from_moments(
+            means=statistics['means'][t], cov=statistics['covs'][t],
             measurements=self.measurements, normalizations=self.normalizations)
         self.storage_df.update(prepend_index_level(meas_coeffs, t))
 
@@ -1449,18 +2268,14 @@ class SkillModel(GenericLikelihoodModel):
         # apply the WA IV approach in all period for all factors and calculate
         # all model parameters of interest from the iv parameters
         for t, stage in zip(self.periods[:-1], self.stagemap[:-1]):
-            # generate the large IV DataFrame for period t
-            resid_meas = self.residual_measurements(period=t)
-            iv_data = large_df_for_iv_equations(
-                depvar_data=self.y_data[t + 1], indepvars_data=resid_meas,
-                instruments_data=self.y_data[t])
-
             for f, factor in enumerate(self.factors):
                 trans_name = self.transition_names[f]
                 if trans_name != 'constant':
                     # get iv estimates (parameters and residual covariances)
-                    iv_coeffs, u_cov_df = self.all_iv_estimates(
-                        t, iv_data, factor)
+                    iv_coeffs, u_cov_df = statistics['iv'][(t, factor)]
+                    iv_coeffs = self._iv_coeffs_of_residual_measurements(
+                        t, iv_coeffs, statistics['exponents'][(t, factor)],
+                        factor)
 
                     # get model parameters from iv parameters
                     model_coeffs_func = getattr(
@@ -1487,11 +2302,9 @@ class SkillModel(GenericLikelihoodModel):
 
         if self.anchoring is True:
             t = self.periods[-1]
-            resid_meas = self.residual_measurements(period=t)
-            iv_data = large_df_for_iv_equations(
-                depvar_data=self.y_data[t], indepvars_data=resid_meas,
-                instruments_data=self.y_data[t])
-            iv_coeffs, u_var_sr = self.all_iv_estimates(t, iv_data)
+            iv_coeffs, u_var_sr = statistics['iv'][(t, None)]
+            iv_coeffs = self._iv_coeffs_of_residual_measurements(
+                t, iv_coeffs, statistics['exponents'][(t, None)])
             deltas = iv_coeffs.mean().values
             anch_intercept = deltas[-1]
             anch_loadings = deltas[:-1]
@@ -1514,7 +2327,7 @@ class SkillModel(GenericLikelihoodModel):
             loadings = self.extended_meas_coeffs(
                 period=t, coeff_type='loadings')
             all_meas = list(loadings.index)
-            meas_cov = self.y_data[t][all_meas].cov()
+            meas_cov = statistics['covs'][t].loc[all_meas, all_meas]
             # loadings = self.storage_df.loc[t, 'loadings']
             meas_per_f = self._measurement_per_factor_dict(period=t)
 
@@ -1544,11 +2357,16 @@ class SkillModel(GenericLikelihoodModel):
                 d[factor] = ['{}_copied'.format(m) for m in initial_meas]
         return d
 
-    def estimate_params_wa(self):
-        """Estimate the params vector with wa."""
+    def estimate_params_wa(self, statistics=None):
+        """Estimate the params vector with wa.
+
+        Args:
+            statistics (dict): optional, see :meth:`_calculate_wa_quantities`
+
+        """
         storage_df, X_zero, P_zero, trans_coeffs, trans_var_df, \
             anch_intercept, anch_loadings, anch_variance = \
-            self._calculate_wa_quantities()
+            self._calculate_wa_quantities(statistics)
 
         params = np.zeros(self.len_params(params_type='long'))
         slices = self.params_slices(params_type='long')
@@ -1617,50 +2435,134 @@ class SkillModel(GenericLikelihoodModel):
 
         return params
 
+    def _executor(self, max_workers=None):
+        """Context manager that yields the executor for parallel work.
+
+        See executor_context in the executors module. max_workers defaults
+        to the max_workers setting.
+
+        """
+        if max_workers is None:
+            max_workers = self.max_workers
+        return executor_context(
+            self.executor, max_workers, self.threads_per_worker)
+
+    @contextmanager
+    def _numerical_derivative_state(self, params):
+        """Lend a LikelihoodState to calculate numerical derivatives at params.
+
+        If checkpoint_filter_states is True, the likelihood is evaluated once
+        at params, such that all evaluations of the numerical derivative can
+        restart the filter from checkpoints that are valid for params.
+
+        """
+        with self.workspace('state', 'long') as state:
+            if state.checkpoint_args is not None:
+                # not memoized, because a cached value would not set the
+                # checkpoints
+                log_likelihood_per_individual(params, state)
+            yield state
+
+    def _loglike_at_points(self, points, params, per_obs=False):
+        """Evaluate loglike or loglikeobs at each params vector in points.
+
+        The evaluations use one LikelihoodState for params. See
+        :meth:`_numerical_derivative_state`.
+
+        """
+        func = self.loglikeobs if per_obs is True else self.loglike
+        with self._numerical_derivative_state(params) as state:
+            return [func(point, state) for point in points]
+
+    def _parallel_loglike_at_points(self, points, params, per_obs=False):
+        """Evaluate the points in parallel with one chunk per worker."""
+        nchunks = min(self.max_workers or os.cpu_count(), len(points))
+        chunks = [points[i::nchunks] for i in range(nchunks)]
+        with self._shared_data_model() as shared_mod, self._executor() as ex:
+            # each chunk builds its own LikelihoodState, i.e. its own buffers
+            futures = [ex.submit(
+                shared_mod._loglike_at_points, chunk, params, per_obs)
+                for chunk in chunks]
+            results = [future.result() for future in futures]
+        values = [None] * len(points)
+        for i, chunk_values in enumerate(results):
+            values[i::nchunks] = chunk_values
+        return values
+
+    def _numerical_derivative(self, derivative_func, params, per_obs=False):
+        """Numerical derivative of loglike or loglikeobs at params.
+
+        If parallel_derivatives is True, the derivative function is run
+        twice. The first run only records the params vectors at which the
+        likelihood has to be evaluated. They are evaluated in parallel and
+        the second run calculates the derivative from the stored values.
+        Therefore, the results are the same as without parallelization.
+
+        Args:
+            derivative_func (function): a function from
+                statsmodels.tools.numdiff that takes params and a function.
+            params (np.ndarray): params vector of type long
+            per_obs (bool): if True, loglikeobs is differentiated.
+
+        """
+        if self.parallel_derivatives is False:
+            func = self.loglikeobs if per_obs is True else self.loglike
+            with self._numerical_derivative_state(params) as state:
+                return derivative_func(params, func, args=(state, ))
+
+        points = []
+        dummy_value = np.zeros(self.nobs) if per_obs is True else 0.0
+
+        def record(point):
+            points.append(point.copy())
+            return dummy_value
+
+        derivative_func(params, record)
+        values = iter(
+            self._parallel_loglike_at_points(points, params, per_obs))
+        return derivative_func(params, lambda point: next(values))
+
     def score(self, params):
         """Gradient of loglike with respect to each parameter.
 
-        To calculate the gradient, simple numerical derivatives are used.
+        To calculate the gradient, simple numerical derivatives are used. The
+        result is memoized in the EvaluationCache of the model.
+
         """
         if self.estimator == 'wa':
             raise NotApplicableError(
                 'score only works for likelihood based estimators.')
-        elif not hasattr(self, 'stored_score'):
-            args = self.likelihood_arguments_dict('long')
-            self.stored_score = approx_fprime(
-                params, self.loglike, args=(args, ), centered=True).ravel()
-
-        return self.stored_score
+        return self.evaluation_cache.lookup(
+            ('score', ), params, lambda: self._numerical_derivative(
+                partial(approx_fprime, centered=True), params).ravel())
 
     def score_obs(self, params):
         """Gradient of loglikeobs with respect to each parameter.
 
-        To calculate the gradient, simple numerical derivatives are used.
+        To calculate the gradient, simple numerical derivatives are used. The
+        result is memoized in the EvaluationCache of the model.
 
         """
         if self.estimator == 'wa':
             raise NotApplicableError(
                 'score_obs only works for likelihood based estimators.')
-        elif not hasattr(self, 'stored_score_obs'):
-            args = self.likelihood_arguments_dict('long')
-            self.stored_score_obs = approx_fprime(
-                params, self.loglikeobs, args=(args, ), centered=True)
-        return self.stored_score_obs
+        return self.evaluation_cache.lookup(
+            ('score_obs', ), params, lambda: self._numerical_derivative(
+                partial(approx_fprime, centered=True), params, per_obs=True))
 
     def hessian(self, params):
         """Hessian matrix of loglike.
 
-        To calculate the hessian, simple numerical derivatives are used.
+        To calculate the hessian, simple numerical derivatives are used. The
+        result is memoized in the EvaluationCache of the model.
 
         """
         if self.estimator == 'wa':
             raise NotApplicableError(
                 'hessian only works for likelihood based estimators.')
-        elif not hasattr(self, 'stored_hessian'):
-            args = self.likelihood_arguments_dict('long')
-            self.stored_hessian = approx_hess(
-                params, self.loglike, args=(args, ))
-        return self.stored_hessian
+        return self.evaluation_cache.lookup(
+            ('hessian', ), params,
+            lambda: self._numerical_derivative(approx_hess, params))
 
     def op_of_gradient_cov_matrix(self, params):
         """Covariance matrix of params based on outer product of gradients."""
@@ -1669,6 +2571,15 @@ class SkillModel(GenericLikelihoodModel):
             'long type. Your params vector has incorrect length in model {} '
             'with dataset {}').format(self.model_name, self.dataset_name)
 
+        # the chs estimator with the bhhh optimizer stores the result
+        stored = getattr(self, 'stored_bhhh_cov_matrix', None)
+        if stored is not None and np.array_equal(stored[0], params):
+            return stored[1].copy()
+        return self.evaluation_cache.lookup(
+            ('op_of_gradient_cov_matrix', ), params,
+            partial(self._op_of_gradient_cov_matrix, params))
+
+    def _op_of_gradient_cov_matrix(self, params):
         gradient = self.score_obs(params)
         # what follows is equivalent to:
         # cov = np.linalg.inv(np.dot(gradient.T, gradient))
@@ -1732,60 +2643,80 @@ class SkillModel(GenericLikelihoodModel):
         bootstrap_samples = individuals[selected_indices].tolist()
         return bootstrap_samples
 
-    def _select_bootstrap_data(self, rep):
-        """Return the data of the resampled individuals."""
-        data = self.data.set_index(
-            [self.person_identifier, self.period_identifier], drop=False)
-        current_sample = self.bootstrap_samples[rep]
-        bs_index = pd.MultiIndex.from_product(
-            [current_sample, self.periods],
-            names=[self.person_identifier, self.period_identifier])
-        bs_data = data.loc[bs_index].reset_index(drop=True)
-        return bs_data
+    def _bootstrap_positions(self, rep):
+        """Positions of the resampled individuals in the data arrays.
 
-    def _bs_fit(self, rep, params):
-        """Check the bootstrap data and re-fit the model with it."""
-        bootstrap_data = self._select_bootstrap_data(rep)
+        Individuals that were dropped from the estimation sample because of
+        missing controls are skipped. For the wa estimator, the positions
+        refer to the index of self.y_data[0].
 
-        if self.save_path is not None:
-            bs_save_path = self.save_path + '/bootstrap/{}'.format(rep)
+        """
+        if self.estimator == 'wa':
+            ids = self.y_data[0].index
         else:
-            bs_save_path = None
+            first_period = self.data[
+                self.data[self.period_identifier] == self.periods[0]]
+            ids = first_period[self.person_identifier].values[
+                self.obs_to_keep]
+        positions = pd.Index(ids).get_indexer(self.bootstrap_samples[rep])
+        return positions[positions >= 0]
 
-        new_mod = SkillModel(
-            model_dict=self.model_dict, dataset=bootstrap_data,
-            estimator=self.estimator,
-            model_name=self.model_name + '_{}'.format(rep),
-            dataset_name=self.dataset_name + '_{}'.format(rep),
-            save_path=bs_save_path)
+    def _bootstrap_weights(self, rep):
+        """Frequency weights of the individuals in bootstrap replication rep.
 
-        if new_mod.len_params('long') != len(params):
-            warn_message = (
-                'No bootstrap results were calculated for replication {} '
-                'because the resulting parameter vectors would not have '
-                'had the right length. This can be caused if variables '
-                'were dropped automatically because they had no variance. '
-                'in the bootstrap data. It happened in model {} for '
-                'dataset {}.').format(
-                    rep, self.model_name, self.dataset_name)
-            warnings.warn(warn_message)
-            bs_params = [np.nan] * len(params)
-            if self.estimator == 'chs':
-                optimize_dict = {
-                    'success': 'Not started because the resulting ' +
-                    'parameter vector would have had the wrong length.'}
+        Resampling with replacement is equivalent to weighting each individual
+        of the original sample with the number of times it was drawn. This
+        allows to fit the model without materializing the resampled data.
+
+        """
+        if hasattr(self, 'bootstrap_weights'):
+            return np.array(self.bootstrap_weights[rep])
+        return np.bincount(
+            self._bootstrap_positions(rep), minlength=self.nobs).astype(float)
+
+    def _bootstrap_model(self, rep):
+        """Copy of the model that is fit in bootstrap replication rep.
 
-        elif self.estimator == 'chs':
-            start_params = new_mod.reduceparams(params)
-            bs_params, optimize_dict = new_mod.estimate_params_chs(
+        The model specifications do not depend on the resampled individuals.
+        Instead of processing them again for each replication, the copy shares
+        them with the original model. It also uses the data of the original
+        sample and is fit with the weights from :meth:`_bootstrap_weights`.
+
+        """
+        bs_mod = copy.copy(self)
+        # the replications do not report their iterations
+        bs_mod.telemetry = None
+        bs_mod.model_name = self.model_name + '_{}'.format(rep)
+        bs_mod.dataset_name = self.dataset_name + '_{}'.format(rep)
+        if self.save_path is not None:
+            bs_mod.save_path = self.save_path + '/bootstrap/{}'.format(rep)
+            ModelSpecProcessor._generate_save_directories(bs_mod)
+
+        if self.estimator == 'wa':
+            # the wa estimator writes intermediate results into these
+            bs_mod.storage_df = self.storage_df.copy()
+            bs_mod.identified_restrictions = {
+                key: df.copy()
+                for key, df in self.identified_restrictions.items()}
+        return bs_mod
+
+    def _bs_fit(self, rep, params):
+        """Re-fit the model with the data of bootstrap replication rep."""
+        bs_mod = self._bootstrap_model(rep)
+
+        if self.estimator == 'chs':
+            start_params = self.reduceparams(params)
+            bs_params, optimize_dict = bs_mod.estimate_params_chs(
                 start_params=start_params, return_optimize_dict=True,
-                params_type='long')
+                params_type='long', weights=self._bootstrap_weights(rep),
+                multistart=False)
 
         elif self.estimator == 'wa':
-            bs_params = new_mod.estimate_params_wa()
+            weights = self._bootstrap_weights(rep).reshape(1, -1)
+            bs_params = bs_mod.estimate_params_wa(
+                self._wa_statistics(weights)[0])
 
         if self.estimator == 'chs' and optimize_dict['success'] is False:
-            bs_params = [np.nan] * len(bs_params)
             warnings.warn(
                 'The optimization for bootstrap replication {} has failed. '
                 'It is therefore not included in the calculation of standard '
@@ -1794,14 +2725,296 @@ class SkillModel(GenericLikelihoodModel):
             bs_params = [np.nan] * len(params)
         return bs_params
 
+    def _wa_bootstrap_params(self, reps):
+        """Fit the wa estimator in several bootstrap replications at once.
+
+        The sample statistics of all replications are calculated together by
+        :meth:`_wa_statistics`. Only the calculation of the estimates from
+        these statistics is done separately for each replication.
+
+        Returns:
+            results (list): list of tuples with a replication and its params.
+
+        """
+        weights = np.array([self._bootstrap_weights(rep) for rep in reps])
+        results = []
+        for rep, statistics in zip(reps, self._wa_statistics(weights)):
+            bs_mod = self._bootstrap_model(rep)
+            results.append((rep, bs_mod.estimate_params_wa(statistics)))
+        return results
+
+    def _shared_attribute_names(self):
+        """Names of the large data arrays that are shared with workers."""
+        names = []
+        if self.estimator == 'chs':
+            names += ['y_data', 'c_data']
+            if self.deduplicate_individuals is True:
+                names += ['unique_y_data', 'unique_c_data', 'unique_inverse',
+                          'frequency_weights']
+        return names
+
+    @contextmanager
+    def _shared_data_model(self, bootstrap=False):
+        """Copy of the model that can be sent cheaply to worker processes.
+
+        The large data arrays are written once to memory mapped files in a
+        temporary directory that exists until the context is left. Pickling
+        the copy only pickles the paths of these files (see __getstate__) and
+        all workers map the same files into memory.
+
+        The copy does not contain the raw dataset. If bootstrap is True and
+        the chs estimator is used, the frequency weights of all bootstrap
+        replications are shared as one matrix instead of the lists of
+        person identifiers.
+
+        If the workers of the executor are threads, they share the memory of
+        the process and the copy simply references the arrays of the model.
+
+        """
+        shared_mod = copy.copy(self)
+        if shares_memory(self.executor):
+            yield shared_mod
+            return
+
+        shared_mod.data = None
+        with tempfile.TemporaryDirectory() as directory:
+            shared_arrays = {}
+            for name in self._shared_attribute_names():
+                shared_arrays[name] = share_array(
+                    getattr(self, name), directory, name)
+
+            if bootstrap is True and self.estimator == 'chs':
+                path = directory + '/bootstrap_weights.npy'
+                weights = np.lib.format.open_memmap(
+                    path, mode='w+', dtype=float,
+                    shape=(self.bootstrap_nreps, self.nobs))
+                for rep in range(self.bootstrap_nreps):
+                    weights[rep] = self._bootstrap_weights(rep)
+                del weights
+                shared_arrays['bootstrap_weights'] = SharedArray(path)
+                shared_mod.bootstrap_samples = None
+
+            for name, handle in shared_arrays.items():
+                setattr(shared_mod, name, load_shared(handle))
+            shared_mod.shared_arrays = shared_arrays
+            yield shared_mod
+
+    def __getstate__(self):
+        """Pickle the shared arrays as their handles.
+
+        Executors that were passed in by the user can not be pickled. They are
+        not needed by the workers because those don't start parallel work.
+
+        The WorkspacePool and the EvaluationCache are not pickled. Each
+        process builds its own workspaces from the shared arrays and has its
+        own cache.
+
+        """
+        state = self.__dict__.copy()
+        state.update(state.get('shared_arrays', {}))
+        if not isinstance(state.get('executor'), str):
+            state.pop('executor', None)
+        state.pop('workspace_pool', None)
+        state.pop('evaluation_cache', None)
+        for name in ['optimization_trace', 'telemetry']:
+            if name in state:
+                # open files can not be pickled
+                state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, handle in state.get('shared_arrays', {}).items():
+            state[name] = load_shared(handle)
+        self.__dict__.update(state)
+        self.workspace_pool = WorkspacePool(self._build_workspace)
+        self.evaluation_cache = EvaluationCache(self.evaluation_cache_size)
+
+    def _bootstrap_store(self, params):
+        """Arrays in which the bootstrap replications are stored.
+
+        If save_bootstrap_replications is True, the arrays are memory mapped
+        npy files in save_path/bootstrap and each finished replication is
+        written to disk immediately. If these files were already created for
+        the same params and number of replications, e.g. by an interrupted
+        run, they are reused and completed replications are not estimated
+        again.
+
+        Returns:
+            bs_params (np.ndarray): array of shape [bootstrap_nreps,
+                len(params)] with the params of each replication.
+
+            completed (np.ndarray): boolean array of length bootstrap_nreps
+                that indicates which replications are done.
+
+        """
+        shape = (self.bootstrap_nreps, len(params))
+        if self.save_bootstrap_replications is False:
+            return np.full(shape, np.nan), np.zeros(shape[0], dtype=bool)
+
+        directory = self.save_path + '/bootstrap'
+        os.makedirs(directory, exist_ok=True)
+        params_path = directory + '/bootstrap_params.npy'
+        completed_path = directory + '/completed.npy'
+        info_path = directory + '/bootstrap_info.json'
+        info = {'params': np.asarray(params, dtype=float).tolist(),
+                'bootstrap_nreps': self.bootstrap_nreps}
+
+        resume = False
+        if all(os.path.exists(path)
+               for path in [params_path, completed_path, info_path]):
+            with open(info_path) as j:
+                resume = json.load(j) == info
+
+        if resume is True:
+            bs_params = open_memmap(params_path, mode='r+')
+            completed = open_memmap(completed_path, mode='r+')
+        else:
+            bs_params = open_memmap(
+                params_path, mode='w+', dtype=float, shape=shape)
+            bs_params[:] = np.nan
+            completed = open_memmap(
+                completed_path, mode='w+', dtype=bool, shape=shape[:1])
+            # the info is written last such that an incomplete store is
+            # never reused
+            with open(info_path, 'w') as j:
+                json.dump(info, j)
+        return bs_params, completed
+
+    def _indexed_bs_fit(self, rep, params):
+        """Return rep and the result of _bs_fit."""
+        return rep, self._bs_fit(rep, params)
+
+    def _bootstrap_waves(self, to_do):
+        """Split the replications that are not done into waves."""
+        if self.bootstrap_mc_tolerance is None:
+            return [to_do]
+        size = self.bootstrap_wave_size
+        return [to_do[i: i + size] for i in range(0, len(to_do), size)]
+
+    def _run_bootstrap_waves(self, fit_wave, to_do, bs_params, completed):
+        """Fit the replications in to_do wave by wave and store the results.
+
+        Args:
+            fit_wave (function): takes a list of replications and returns an
+                iterable of tuples with a replication and its params.
+            to_do (list): the replications that are not completed yet.
+            bs_params, completed: see :meth:`_bootstrap_store`
+
+        """
+        for wave in self._bootstrap_waves(to_do):
+            if self._bootstrap_precision_reached(bs_params[completed]):
+                break
+            for rep, rep_params in fit_wave(wave):
+                bs_params[rep] = rep_params
+                completed[rep] = True
+                if self.save_bootstrap_replications is True:
+                    bs_params.flush()
+                    completed.flush()
+
+    def _bootstrap_mc_error(self, bs_params, alpha=0.05):
+        """Largest relative Monte Carlo error of the bootstrap statistics.
+
+        The Monte Carlo standard error of the bootstrap standard error of a
+        parameter is approximated with the kurtosis of its bootstrap
+        distribution. The Monte Carlo error of each bound of the confidence
+        interval is approximated from the width of a distribution free 95
+        percent confidence interval of the quantile, i.e. one that is based on
+        order statistics. Both are divided by the bootstrap standard error.
+
+        Args:
+            bs_params (np.ndarray): array of shape [nreps, nparams] with the
+                params of the completed replications.
+            alpha (float): significance level of the confidence interval.
+
+        """
+        nreps = len(bs_params)
+        sds = bs_params.std(axis=0, ddof=1)
+        varies = sds > 0
+        bs_params = bs_params[:, varies]
+        sds = sds[varies]
+
+        centered = bs_params - bs_params.mean(axis=0)
+        kurtosis = (centered ** 4).mean(axis=0) / \
+            (centered ** 2).mean(axis=0) ** 2
+        mc_errors = [sds * np.sqrt(np.maximum(kurtosis - 1, 0) / (4 * nreps))]
+
+        sorted_params = np.sort(bs_params, axis=0)
+        for p in [0.5 * alpha, 1 - 0.5 * alpha]:
+            spread = 1.96 * np.sqrt(nreps * p * (1 - p))
+            lower = int(np.clip(np.floor(nreps * p - spread), 0, nreps - 1))
+            upper = int(np.clip(np.ceil(nreps * p + spread), 0, nreps - 1))
+            mc_errors.append(
+                (sorted_params[upper] - sorted_params[lower]) / (2 * 1.96))
+
+        return (np.array(mc_errors) / sds).max(initial=0.0)
+
+    def _bootstrap_precision_reached(self, bs_params):
+        """Check if the bootstrap can stop before bootstrap_nreps replications.
+
+        Args:
+            bs_params (np.ndarray): array of shape [nreps, nparams] with the
+                params of the completed replications. Failed replications
+                are NaN.
+
+        """
+        if self.bootstrap_mc_tolerance is None:
+            return False
+        bs_params = bs_params[~np.isnan(bs_params).any(axis=1)]
+        if len(bs_params) < self.bootstrap_wave_size:
+            return False
+        mc_error = self._bootstrap_mc_error(bs_params)
+        return mc_error <= self.bootstrap_mc_tolerance
+
+    def _multiplier_bootstrap_params(self, params):
+        """Draws of params from the score based multiplier bootstrap.
+
+        Each draw is a one-step estimate from the scores of the individuals,
+        each multiplied with a standard normal random variable:
+
+            params_b = params + inv(- hessian) * sum_i (xi_ib * score_i)
+
+        As the scores and the hessian at params are only calculated once,
+        all draws together only need a few matrix products.
+
+        Returns:
+            draws (np.ndarray): array of shape [bootstrap_nreps, len(params)]
+
+        """
+        scores = self.score_obs(params)
+        step_matrix = np.linalg.inv(-self.hessian(params)).T
+        draws = np.empty((self.bootstrap_nreps, len(params)))
+        # draw the multipliers in chunks to limit the memory usage
+        chunk_size = max(1, int(1e7 // len(scores)))
+        for start in range(0, self.bootstrap_nreps, chunk_size):
+            stop = min(start + chunk_size, self.bootstrap_nreps)
+            multipliers = np.random.normal(size=(stop - start, len(scores)))
+            draws[start: stop] = params + np.dot(
+                np.dot(multipliers, scores), step_matrix)
+        return draws
+
     def all_bootstrap_params(self, params):
         """Return a DataFrame of all bootstrap parameters.
 
         Create the resampled datasets from lists of person identifiers and fit
         re-fit the model.
 
-        The boostrap replications are estimated in parallel, using the
-        Multiprocessing module from the Python Standard Library.
+        The boostrap replications are estimated in parallel with the executor
+        from :meth:`_executor`. The workers receive a copy of the model whose
+        data is shared through memory mapped files. See
+        :meth:`_shared_data_model`. The wa estimator does not need
+        workers because all replications of a wave are fit together by
+        :meth:`_wa_bootstrap_params`.
+
+        Finished replications are written to the store described in
+        :meth:`_bootstrap_store` as soon as they arrive.
+
+        If bootstrap_mc_tolerance is specified, the replications are run in
+        waves and no further waves are started once the Monte Carlo error of
+        the bootstrap statistics is small enough. See
+        :meth:`_bootstrap_mc_error`.
+
+        If bootstrap_method is 'multiplier', the model is not re-estimated.
+        Instead, the draws from :meth:`_multiplier_bootstrap_params` are used.
 
         """
         assert len(params) == self.len_params('long'), (
@@ -1809,14 +3022,35 @@ class SkillModel(GenericLikelihoodModel):
             'long type. Your params vector has incorrect length in model {} '
             'with dataset {}').format(self.model_name, self.dataset_name)
 
+        if not hasattr(self, 'stored_bootstrap_params') and \
+                self.bootstrap_method == 'multiplier':
+            ind = ['rep_{}'.format(rep) for rep in range(self.bootstrap_nreps)]
+            with self._telemetry_phase('bootstrap'):
+                draws = self._multiplier_bootstrap_params(params)
+            self.stored_bootstrap_params = pd.DataFrame(
+                data=draws, index=ind, columns=self.param_names('long'))
+
         if not hasattr(self, 'stored_bootstrap_params'):
-            bs_fit_args = [(r, params) for r in range(self.bootstrap_nreps)]
-            with Pool(self.bootstrap_nprocesses) as p:
-                bootstrap_params = p.starmap(self._bs_fit, bs_fit_args)
+            bs_params, completed = self._bootstrap_store(params)
+            to_do = [r for r in range(self.bootstrap_nreps)
+                     if not completed[r]]
+            if len(to_do) > 0 and self.estimator == 'wa':
+                with self._telemetry_phase('bootstrap'):
+                    self._run_bootstrap_waves(
+                        self._wa_bootstrap_params, to_do, bs_params, completed)
+            elif len(to_do) > 0:
+                with self._shared_data_model(bootstrap=True) as shared_mod, \
+                        self._telemetry_phase('bootstrap'):
+                    bs_fit = partial(shared_mod._indexed_bs_fit, params=params)
+                    with self._executor(self.bootstrap_nprocesses) as ex:
+                        self._run_bootstrap_waves(
+                            partial(map_unordered, ex, bs_fit), to_do,
+                            bs_params, completed)
             ind = ['rep_{}'.format(rep) for rep in range(self.bootstrap_nreps)]
             cols = self.param_names('long')
             bootstrap_params_df = pd.DataFrame(
-                data=bootstrap_params, index=ind, columns=cols)
+                data=np.array(bs_params), index=ind, columns=cols)
+            bootstrap_params_df = bootstrap_params_df[np.array(completed)]
             bootstrap_params_df.dropna(inplace=True)
             self.stored_bootstrap_params = bootstrap_params_df
         return self.stored_bootstrap_params
@@ -1860,23 +3094,52 @@ class SkillModel(GenericLikelihoodModel):
         p_values = numerator / (len(bs_params) + 1)
         return p_values
 
-    def fit(self, start_params=None, params=None):
-        """Fit the model and return an instance of SkillModelResults."""
-        if self.estimator == 'chs':
-            params, optimize_dict = self.estimate_params_chs(
-                start_params, return_optimize_dict=True, params_type='long')
-
-        elif self.estimator == 'wa':
-            params = self.estimate_params_wa()
-            optimize_dict = None
-
+    def cov_matrix(self, params):
+        """Covariance matrix of params with the standard_error_method."""
         cov_func = getattr(
             self, '{}_cov_matrix'.format(self.standard_error_method))
-        cov = cov_func(params)
+        with self._telemetry_phase('standard_errors'):
+            return cov_func(params)
 
-        like_res = LikelihoodModelResults(self, params, cov)
+    def fit(self, start_params=None, params=None, standard_errors='lazy',
+            resume_from=None):
+        """Fit the model and return an instance of SkillModelResults.
+
+        Args:
+            start_params (np.ndarray): start values for the chs estimator.
+            params (np.ndarray): not used.
+            standard_errors (str): when the covariance matrix of the
+                parameters is calculated. 'lazy' (the default) calculates it
+                when standard errors, confidence intervals or similar are
+                accessed for the first time. 'eager' calculates it before
+                fit returns and 'background' starts the calculation in a
+                background thread. See
+                :meth:`SkillModelResults.calculate_standard_errors`.
+            resume_from (str or bool): checkpoint from which the chs
+                estimator continues. See :meth:`estimate_params_chs`.
+
+        """
+        assert standard_errors in ['lazy', 'eager', 'background'], (
+            'standard_errors must be one of lazy, eager and background, not '
+            '{}.'.format(standard_errors))
+
+        with self._telemetry_phase('estimation'):
+            if self.estimator == 'chs':
+                params, optimize_dict = self.estimate_params_chs(
+                    start_params, return_optimize_dict=True,
+                    params_type='long', resume_from=resume_from)
+
+            elif self.estimator == 'wa':
+                params = self.estimate_params_wa()
+                optimize_dict = None
+
+        like_res = LikelihoodModelResults(self, params)
 
         skillmodel_res = SkillModelResults(self, like_res, optimize_dict)
+        if standard_errors == 'eager':
+            skillmodel_res.calculate_standard_errors()
+        elif standard_errors == 'background':
+            skillmodel_res.calculate_standard_errors(background=True)
         return skillmodel_res
 
     def _generate_start_factors(self):
@@ -1948,18 +3211,18 @@ class SkillModel(GenericLikelihoodModel):
             intermediate_factors = []
 
         changed_pos = self.factors.index(self.me_of)
-        args = self.likelihood_arguments_dict('long')
-        tsp_args = args['predict_args']['transform_sigma_points_args']
-        pp_args = args['parse_params_args']
-        parse_params(self.me_params, **pp_args)
-
         factors = self.me_at.copy()
 
-        for t, stage in enumerate(self.stagemap[:-1]):
-            if return_intermediate is True:
-                intermediate_factors.append(factors.copy())
-            factors[:, changed_pos] += change[t]
-            transform_sigma_points(stage, factors, **tsp_args)
+        with self.workspace('arguments', 'long') as args:
+            tsp_args = args['predict_args']['transform_sigma_points_args']
+            pp_args = args['parse_params_args']
+            parse_params(self.me_params, **pp_args)
+
+            for t, stage in enumerate(self.stagemap[:-1]):
+                if return_intermediate is True:
+                    intermediate_factors.append(factors.copy())
+                factors[:, changed_pos] += change[t]
+                transform_sigma_points(stage, factors, **tsp_args)
 
         if return_intermediate is False:
             return factors
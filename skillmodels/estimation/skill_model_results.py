@@ -2,6 +2,8 @@ from statsmodels.base.model import GenericLikelihoodModelResults
 from statsmodels.tools.decorators import resettable_cache, cache_readonly
 import numpy as np
 from statsmodels.tools.numdiff import approx_fprime, approx_fprime_cs
+from concurrent.futures import ThreadPoolExecutor
+import threading
 
 
 class NotApplicableError(Exception):
@@ -20,6 +22,11 @@ class SkillModelResults(GenericLikelihoodModelResults):
 
     In addition it contains a method to calculate marginal effects.
 
+    The covariance matrix of the parameters is only calculated when it is
+    needed for the first time, e.g. to access standard errors, or when
+    :meth:`calculate_standard_errors` is called. Point estimates and the
+    log likelihood value are available immediately.
+
     """
 
     def __init__(self, model, mlefit, optimize_dict=None):
@@ -30,10 +37,48 @@ class SkillModelResults(GenericLikelihoodModelResults):
         self.df_model = model.df_model
         self.df_resid = model.df_resid
         self._cache = resettable_cache()
-        self.__dict__.update(mlefit.__dict__)
+        self._cov_lock = threading.Lock()
+        mle_dict = mlefit.__dict__.copy()
+        self._normalized_cov_params = mle_dict.pop(
+            'normalized_cov_params', None)
+        self.__dict__.update(mle_dict)
         self.param_names = model.param_names(params_type='long')
         self.nperiods = self.model.nperiods
 
+    @property
+    def normalized_cov_params(self):
+        """Covariance matrix of params, calculated on first access."""
+        with self._cov_lock:
+            if self._normalized_cov_params is None:
+                self._normalized_cov_params = self.model.cov_matrix(
+                    self.params)
+        return self._normalized_cov_params
+
+    @normalized_cov_params.setter
+    def normalized_cov_params(self, value):
+        with self._cov_lock:
+            self._normalized_cov_params = value
+
+    def calculate_standard_errors(self, background=False):
+        """Calculate the covariance matrix of the parameters now.
+
+        Args:
+            background (bool): if True, the calculation runs in a background
+                thread and a concurrent.futures.Future is returned. Accessing
+                standard errors before it is done blocks until the calculation
+                is finished.
+
+        Returns:
+            cov (np.ndarray or Future): the covariance matrix or a Future.
+
+        """
+        if background is False:
+            return self.normalized_cov_params
+        ex = ThreadPoolExecutor(max_workers=1)
+        future = ex.submit(lambda: self.normalized_cov_params)
+        ex.shutdown(wait=False)
+        return future
+
     @cache_readonly
     def aic(self):
         if self.estimator == 'chs':
@@ -0,0 +1,55 @@
+"""Stochastic variance reduced gradient ascent on mini-batches.
+
+If the sample is very large, a full evaluation of the likelihood is slow and
+the first iterations of a deterministic optimizer, that are far away from the
+optimum, are expensive. Stochastic gradient methods make many cheap steps with
+the gradients of small mini-batches of individuals instead.
+
+The SVRG algorithm of Johnson and Zhang (2013) corrects the mini-batch
+gradient with the difference between the full and the mini-batch gradient at
+a snapshot of the parameters. This reduces the variance of the steps, such
+that a constant learning rate can be used.
+
+"""
+import numpy as np
+from skillmodels.estimation.bhhh import bounds_arrays
+
+
+def svrg(batch_gradient, x0, batch_shares, bounds=None, epochs=5,
+         learning_rate=0.01):
+    """Maximize an average log likelihood with SVRG.
+
+    Args:
+        batch_gradient (function): takes the index of a mini-batch and a
+            params vector and returns the gradient of the average log
+            likelihood contribution of the individuals in the batch.
+        x0 (np.ndarray): start values.
+        batch_shares (np.ndarray): share of the individuals in each batch.
+        bounds (list): list of (lower, upper) tuples. None means unbounded.
+            Each step is projected onto the bounds.
+        epochs (int): number of snapshots. Each epoch makes one step per
+            mini-batch.
+        learning_rate (float): step size.
+
+    Returns:
+        x (np.ndarray): the params vector after the last epoch.
+        gradient_norms (list): norm of the full gradient at each snapshot.
+
+    """
+    x = np.array(x0, dtype=float)
+    lower, upper = bounds_arrays(bounds, len(x))
+    x = np.clip(x, lower, upper)
+    nbatches = len(batch_shares)
+    gradient_norms = []
+
+    for epoch in range(epochs):
+        snapshot = x.copy()
+        snapshot_gradients = [batch_gradient(b, snapshot)
+                              for b in range(nbatches)]
+        full_gradient = np.dot(batch_shares, snapshot_gradients)
+        gradient_norms.append(float(np.linalg.norm(full_gradient)))
+        for b in np.random.permutation(nbatches):
+            direction = batch_gradient(b, x) - snapshot_gradients[b] + \
+                full_gradient
+            x = np.clip(x + learning_rate * direction, lower, upper)
+    return x, gradient_norms
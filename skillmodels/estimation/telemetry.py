@@ -0,0 +1,354 @@
+"""Report the progress of an estimation while it runs.
+
+:class:`EstimationTelemetry` is an observer that a SkillModel notifies after
+each iteration of the chs optimizer and at the end of each phase of the
+estimation. Each notification is turned into a record that is passed to all
+sinks. A record contains:
+
+    * event: 'iteration' or 'phase_end'
+    * phase: the phase that ended, i.e. 'estimation', 'standard_errors' or
+      'bootstrap'. None for iterations.
+    * iteration, nfev: number of iterations and likelihood evaluations of the
+      current optimization
+    * log_lh_value and gradient_norm at the current iterate
+    * evaluations_per_second since the previous record
+    * time_estimation, time_standard_errors, time_bootstrap: cumulative wall
+      time in each phase. Time in a nested phase, e.g. the bootstrap during
+      the calculation of standard errors, only counts for the inner phase.
+    * peak_memory: maximal resident memory of the process in bytes
+    * elapsed: seconds since the telemetry was created
+    * timestamp and the labels of the telemetry
+
+Three sinks are implemented: :class:`LoggingSink`, :class:`CSVSink` and
+:class:`MetricsFileSink`. Every object with the methods emit(record) and
+close() can be used as sink.
+
+"""
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+PHASES = ['estimation', 'standard_errors', 'bootstrap']
+
+FIELDS = ['timestamp', 'event', 'phase', 'iteration', 'nfev', 'log_lh_value',
+          'gradient_norm', 'evaluations_per_second', 'time_estimation',
+          'time_standard_errors', 'time_bootstrap', 'peak_memory', 'elapsed']
+
+
+def peak_memory():
+    """Maximal resident memory of the process in bytes.
+
+    Worker processes are not included. None if the platform does not
+    provide the resource module.
+
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class EstimationTelemetry:
+    """Observer of an estimation that passes records to pluggable sinks.
+
+    Args:
+        sinks (list): list of sinks, e.g. [LoggingSink(), CSVSink(path)].
+        labels (dict): optional labels that are added to each record, e.g.
+            the name of the job. SkillModel adds model and dataset.
+
+    """
+
+    def __init__(self, sinks, labels=None):
+        self.sinks = list(sinks)
+        self.labels = {} if labels is None else dict(labels)
+        self.phase_times = {phase: 0.0 for phase in PHASES}
+        self.iteration = 0
+        self.nfev = 0
+        self._evaluations = []
+        self._start = time.perf_counter()
+        self._last_record = (self._start, 0)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that measures the time spent in phase name.
+
+        Phases can be nested. While an inner phase runs, the time of the
+        outer phase is paused. Each thread has its own stack of phases.
+
+        """
+        stack = self._phase_stack()
+        now = time.perf_counter()
+        if stack:
+            self._add_phase_time(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add_phase_time(name, now - stack.pop()[1])
+            if stack:
+                stack[-1][1] = now
+            self.emit(self._record('phase_end', phase=name))
+
+    def _phase_stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add_phase_time(self, name, elapsed):
+        with self._lock:
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + elapsed
+
+    def start_optimization(self):
+        """Reset the counters of the optimization."""
+        with self._lock:
+            self.iteration = 0
+            self.nfev = 0
+            self._evaluations = []
+            self._last_record = (time.perf_counter(), 0)
+
+    def objective(self, func, negative=False):
+        """Wrap func to count and record its evaluations.
+
+        Args:
+            func (function): returns the log likelihood or the log likelihood
+                contributions of all individuals.
+            negative (bool): True if func returns the negative log
+                likelihood.
+
+        """
+        def wrapped(x, *args):
+            value = func(x, *args)
+            log_lh_value = float(np.sum(value))
+            if negative is True:
+                log_lh_value = -log_lh_value
+            with self._lock:
+                self.nfev += 1
+                self._evaluations.append(
+                    (np.array(x, dtype=float), log_lh_value))
+            return value
+        return wrapped
+
+    def callback(self, xk):
+        """Callback of scipy optimizers. See :meth:`iteration_end`."""
+        self.iteration_end(xk)
+
+    def iteration_end(self, params, log_lh_value=None, gradient=None):
+        """Emit a record for an iteration of the optimizer.
+
+        Args:
+            params (np.ndarray): the current iterate.
+            log_lh_value (float): the log likelihood at params. If None, it
+                is taken from the evaluations of the wrapped objective.
+            gradient (np.ndarray): the gradient at params. If None, it is
+                reconstructed from the finite differences the optimizer
+                evaluated since the last iteration. See
+                :func:`finite_difference_gradient`.
+
+        """
+        with self._lock:
+            self.iteration += 1
+            evaluations = self._evaluations
+            self._evaluations = []
+        params = np.array(params, dtype=float)
+        if log_lh_value is None:
+            log_lh_value = _value_at(params, evaluations)
+        if gradient is None:
+            gradient = finite_difference_gradient(
+                params, log_lh_value, evaluations)
+        self.emit(self._record(
+            'iteration', log_lh_value=log_lh_value,
+            gradient_norm=float(np.linalg.norm(gradient))))
+
+    def _record(self, event, **fields):
+        now = time.perf_counter()
+        with self._lock:
+            last_time, last_nfev = self._last_record
+            record = dict.fromkeys(FIELDS)
+            record.update(self.labels)
+            record.update(
+                timestamp=time.time(), event=event,
+                iteration=self.iteration, nfev=self.nfev,
+                peak_memory=peak_memory(), elapsed=now - self._start)
+            for phase, t in self.phase_times.items():
+                record['time_{}'.format(phase)] = t
+            if event == 'iteration':
+                record['evaluations_per_second'] = \
+                    (self.nfev - last_nfev) / max(now - last_time, 1e-9)
+                self._last_record = (now, self.nfev)
+        record.update(fields)
+        return record
+
+    def emit(self, record):
+        """Pass record to all sinks."""
+        with self._lock:
+            for sink in self.sinks:
+                sink.emit(record)
+
+    def close(self):
+        """Close all sinks."""
+        with self._lock:
+            for sink in self.sinks:
+                sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _value_at(params, evaluations):
+    for x, value in evaluations:
+        if np.array_equal(x, params):
+            return value
+    return np.nan
+
+
+def finite_difference_gradient(params, log_lh_value, evaluations):
+    """Gradient from evaluations that differ from params in one entry.
+
+    Optimizers that approximate the gradient numerically evaluate the
+    function at params and at points that differ in one entry. These
+    evaluations are used to calculate the gradient without additional
+    evaluations. Entries without such an evaluation are NaN.
+
+    Args:
+        params (np.ndarray): the point of the gradient.
+        log_lh_value (float): the function value at params.
+        evaluations (list): list of tuples with points and function values.
+
+    """
+    gradient = np.full(len(params), np.nan)
+    for x, value in evaluations:
+        changed = np.flatnonzero(x != params)
+        if len(changed) == 1 and np.isnan(gradient[changed[0]]):
+            i = changed[0]
+            gradient[i] = (value - log_lh_value) / (x[i] - params[i])
+    return gradient
+
+
+class LoggingSink:
+    """Write each record as one log message.
+
+    Args:
+        logger (logging.Logger): the default is the logger 'skillmodels'.
+        level (int): the log level. The default is logging.INFO.
+
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logging.getLogger('skillmodels') if logger is None \
+            else logger
+        self.level = level
+
+    def emit(self, record):
+        if record['event'] == 'iteration':
+            self.logger.log(
+                self.level, 'iteration %s: log_lh_value %.6f, gradient_norm '
+                '%.3g, %.1f evaluations per second, peak memory %s bytes',
+                record['iteration'], record['log_lh_value'],
+                record['gradient_norm'], record['evaluations_per_second'],
+                record['peak_memory'])
+        else:
+            self.logger.log(
+                self.level, 'phase %s ended after %.1f seconds, peak memory '
+                '%s bytes', record['phase'],
+                record['time_{}'.format(record['phase'])],
+                record['peak_memory'])
+
+    def close(self):
+        pass
+
+
+class CSVSink:
+    """Append each record as one row to a csv file.
+
+    The header is written if the file is new or empty.
+
+    Args:
+        path (str): path of the csv file.
+        labels (list): names of labels that are written as extra columns.
+
+    """
+
+    def __init__(self, path, labels=('model', 'dataset')):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.DictWriter(
+            self._file, fieldnames=list(labels) + FIELDS,
+            extrasaction='ignore')
+        if new is True:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def emit(self, record):
+        self._writer.writerow(record)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class MetricsFileSink:
+    """Keep the latest values in a metrics text file.
+
+    The file uses the text format of Prometheus, such that it can be scraped,
+    e.g. by the textfile collector of the node exporter. Each metric is a
+    gauge named prefix_field with the labels of the record. The file is
+    replaced atomically after each record.
+
+    Args:
+        path (str): path of the metrics file.
+        prefix (str): prefix of the metric names.
+
+    """
+
+    metric_fields = ['iteration', 'nfev', 'log_lh_value', 'gradient_norm',
+                     'evaluations_per_second', 'time_estimation',
+                     'time_standard_errors', 'time_bootstrap', 'peak_memory',
+                     'timestamp']
+
+    def __init__(self, path, prefix='skillmodels'):
+        self.path = path
+        self.prefix = prefix
+        self.values = {}
+
+    def emit(self, record):
+        for field in self.metric_fields:
+            if record.get(field) is not None:
+                self.values[field] = record[field]
+        labels = ','.join(
+            '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+            for key, value in sorted(record.items())
+            if key not in FIELDS and value is not None)
+
+        lines = []
+        for field in self.metric_fields:
+            if field in self.values:
+                name = '{}_{}'.format(self.prefix, field)
+                lines.append('# TYPE {} gauge'.format(name))
+                lines.append('{}{{{}}} {}'.format(
+                    name, labels, float(self.values[field])))
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 import skillmodels.model_functions.transition_functions as tf
 from patsy import dmatrix
+from scipy.special import comb
+from itertools import product
 
 
 def loadings_from_covs(data, normalization):
@@ -23,13 +25,30 @@ def loadings_from_covs(data, normalization):
         loadings (Series): pandas Series with estimated factor loadings
 
     """
-    measurements = list(data.columns)
+    return loadings_from_cov_matrix(data.cov(), normalization)
+
+
+def loadings_from_cov_matrix(cov, normalization):
+    """Factor loadings of measurements of one factor in the first period.
+
+    Same as :func:`loadings_from_covs` but takes the covariance matrix of the
+    measurements instead of the data.
+
+    Args:
+        cov (DataFrame): covariance matrix of the measurements of one factor
+            in one period.
+        normalization (list): see :func:`loadings_from_covs`
+
+    Returns:
+        loadings (Series): pandas Series with estimated factor loadings
+
+    """
+    measurements = list(cov.columns)
     nmeas = len(measurements)
     assert nmeas >= 3, (
         'For covariance based factor loading estimation 3 or more '
         'measurements are needed.')
 
-    cov = data.cov()
     load_norm, load_norm_val = normalization
     loadings = pd.Series(index=measurements, name='loadings')
 
@@ -70,23 +89,44 @@ def intercepts_from_means(data, normalization, loadings):
         factor mean: The estimated factor mean if a intercept was normalized
         or None
     """
-    measurements = list(data.columns)
+    return intercepts_from_mean_values(data.mean(), normalization, loadings)
+
+
+def intercepts_from_mean_values(means, normalization, loadings):
+    """Calculate intercepts and factor means for 1 factor in the first period.
+
+    Same as :func:`intercepts_from_means` but takes the means of the
+    measurements instead of the data.
+
+    Args:
+        means (Series): means of the measurements of one factor in one period.
+        normalization (list): see :func:`intercepts_from_means`
+        loadings (Series): pandas Series with estimated factor loadings
+
+    Returns:
+        intercepts (Series): pandas Series with estimated measurement
+        intercepts
+
+    Returns:
+        factor mean: The estimated factor mean if a intercept was normalized
+        or None
+
+    """
+    measurements = list(means.index)
 
     if len(normalization) == 0:
-        intercepts = data.mean()
+        intercepts = means.copy()
         factor_mean = None
     else:
         intercepts = pd.Series(index=measurements, name='intercepts')
         intercept_norm, intercept_norm_val = normalization
         loading = loadings[intercept_norm]
-        factor_mean = \
-            (data[intercept_norm].mean() - intercept_norm_val) / loading
+        factor_mean = (means[intercept_norm] - intercept_norm_val) / loading
 
         for m, meas in enumerate(measurements):
             if meas != intercept_norm:
                 loading = loadings[meas]
-                intercepts[meas] = \
-                    data[meas].mean() - loading * factor_mean
+                intercepts[meas] = means[meas] - loading * factor_mean
             else:
                 intercepts[meas] = intercept_norm_val
     return intercepts, factor_mean
@@ -127,19 +167,44 @@ def initial_meas_coeffs(y_data, measurements, normalizations):
     Returns:
         X_zero (np.ndarray): numpy array with initial factor means.
 
+    """
+    return initial_meas_coeffs_from_moments(
+        y_data.mean(), y_data.cov(), measurements, normalizations)
+
+
+def initial_meas_coeffs_from_moments(means, cov, measurements, normalizations):
+    """Dataframe of loadings and intercepts for all factors in initial period.
+
+    Same as :func:`initial_meas_coeffs` but takes the means and the
+    covariance matrix of the measurement data of the initial period.
+
+    Args:
+        means (Series): means of the measurements in the initial period.
+        cov (DataFrame): covariance matrix of the measurements in the initial
+            period.
+        measurements (dictionary): see :func:`initial_meas_coeffs`
+        normalizations (dictionary): see :func:`initial_meas_coeffs`
+
+    Returns:
+        meas_coeffs (DataFrame): DataFrame with loadings and intercepts of the
+        initial period.
+
+    Returns:
+        X_zero (np.ndarray): numpy array with initial factor means.
+
     """
     factors = sorted(list(measurements.keys()))
     to_concat = []
     X_zero = []
     for f, factor in enumerate(factors):
         meas_list = measurements[factor][0]
-        data = y_data[meas_list]
         norminfo_load = normalizations[factor]['loadings'][0]
 
-        loadings = loadings_from_covs(data, norminfo_load)
+        loadings = loadings_from_cov_matrix(
+            cov.loc[meas_list, meas_list], norminfo_load)
         norminfo_intercept = normalizations[factor]['intercepts'][0]
-        intercepts, factor_mean = intercepts_from_means(
-            data, norminfo_intercept, loadings)
+        intercepts, factor_mean = intercepts_from_mean_values(
+            means[meas_list], norminfo_intercept, loadings)
         to_concat.append(pd.concat([loadings, intercepts], axis=1))
         X_zero.append(factor_mean)
 
@@ -308,6 +373,224 @@ def _iv_gmm_weights(z, u=None):
     return w
 
 
+def weighted_cross_products(arr1, arr2, weights):
+    """Weighted sums of the outer products of the rows of arr1 and arr2.
+
+    args:
+        arr1 (np.ndarray): array of shape [n, k1]
+        arr2 (np.ndarray): array of shape [n, k2]
+        weights (np.ndarray): array of shape [nweights, n]
+
+    Returns:
+        cross_products (np.ndarray): array of shape [nweights, k1, k2]
+
+    """
+    nobs, k1 = arr1.shape
+    k2 = arr2.shape[1]
+    nweights = len(weights)
+    if nweights <= k2:
+        weighted = arr1.T.reshape(1, k1, nobs) * weights.reshape(
+            nweights, 1, nobs)
+        return np.matmul(weighted, arr2)
+    # for many weight vectors it is faster to calculate the products of all
+    # observations once and sum them up with one matrix product
+    if arr1 is arr2:
+        # only calculate the upper triangle of symmetric cross products
+        rows, cols = np.triu_indices(k1)
+        sums = weights.dot(arr1[:, rows] * arr1[:, cols])
+        cross_products = np.empty((nweights, k1, k1))
+        cross_products[:, rows, cols] = sums
+        cross_products[:, cols, rows] = sums
+        return cross_products
+    products = arr1.reshape(nobs, k1, 1) * arr2.reshape(nobs, 1, k2)
+    return weights.dot(products.reshape(nobs, k1 * k2)).reshape(
+        nweights, k1, k2)
+
+
+def weighted_iv_reg(depvar_arr, indepvars_arr, instruments_arr, weights):
+    """Estimate an iv equation via 2sls for many weight vectors at once.
+
+    The cross products x'z, z'z and z'y are weighted sums of the cross
+    products of the individual observations. They are calculated for all
+    weight vectors with one matrix product each. With frequency weights
+    this gives the same result as :func:`iv_reg` on a dataset where each
+    observation is repeated as often as its weight says.
+
+    args:
+        depvar_arr (np.ndarray): see :func:`iv_reg`
+        indepvars_arr (np.ndarray): see :func:`iv_reg`
+        instruments_arr (np.ndarray): see :func:`iv_reg`
+        weights (np.ndarray): array of shape [nweights, n]
+
+    Returns:
+        beta (np.ndarray): array of shape [nweights, k] with the estimated
+        parameters for each weight vector.
+
+    """
+    y = depvar_arr
+    x = indepvars_arr
+    z = instruments_arr
+    nobs, k = x.shape
+    k_prime = z.shape[1]
+    nweights = len(weights)
+
+    xTz = weighted_cross_products(x, z, weights)
+    zTz = weighted_cross_products(z, z, weights)
+    zTy = weights.dot(z * y.reshape(nobs, 1))
+
+    w = np.linalg.pinv(zTz / weights.sum(axis=1).reshape(nweights, 1, 1))
+    helper = np.matmul(xTz, w)
+    inverse_part = np.linalg.pinv(
+        np.matmul(helper, np.transpose(xTz, axes=(0, 2, 1))))
+    y_part = np.matmul(helper, zTy.reshape(nweights, k_prime, 1))
+    beta = np.matmul(inverse_part, y_part).reshape(nweights, k)
+    return beta
+
+
+def weighted_means_and_covs(data, weights):
+    """Means and pairwise covariances of data for many weight vectors.
+
+    Missing values are treated like in the mean and cov methods of pandas
+    DataFrames, i.e. each covariance is calculated from the observations
+    where both variables are observed. The sums of products that are needed
+    for all covariances are calculated with one matrix product for all
+    weight vectors.
+
+    args:
+        data (np.ndarray): array of shape [n, nvariables], can contain NaNs.
+        weights (np.ndarray): array of shape [nweights, n] with frequency
+            weights.
+
+    Returns:
+        means (np.ndarray): array of shape [nweights, nvariables]
+
+        covs (np.ndarray): array of shape [nweights, nvariables, nvariables]
+
+    """
+    observed = np.isfinite(data)
+    # centering does not change the covariances but makes the sums of
+    # products numerically more precise
+    center = np.nanmean(data, axis=0)
+    filled = np.where(observed, data - center, 0.0)
+    observed = observed.astype(float)
+
+    sum_w = weighted_cross_products(observed, observed, weights)
+    sum_x = weighted_cross_products(filled, observed, weights)
+    sum_xx = weighted_cross_products(filled, filled, weights)
+    covs = (sum_xx - sum_x * np.transpose(sum_x, axes=(0, 2, 1)) / sum_w) / \
+        (sum_w - 1)
+    means = weights.dot(filled) / weights.dot(observed) + center
+    return means, covs
+
+
+def weighted_covs(arr1, arr2, weights):
+    """Covariances of arr1 and arr2 for many weight vectors.
+
+    Observations where arr1 or arr2 is NaN are skipped.
+
+    args:
+        arr1 (np.ndarray): array of shape [n] or [nweights, n]
+        arr2 (np.ndarray): array of shape [n] or [nweights, n]
+        weights (np.ndarray): array of shape [nweights, n] with frequency
+            weights.
+
+    Returns:
+        covs (np.ndarray): array of length nweights
+
+    """
+    observed = np.isfinite(arr1) & np.isfinite(arr2)
+    weights = weights * observed
+    arr1 = np.where(observed, arr1, 0.0)
+    arr2 = np.where(observed, arr2, 0.0)
+    sum_w = weights.sum(axis=-1)
+    weighted1 = weights * arr1
+    sum_1 = weighted1.sum(axis=-1)
+    sum_2 = (weights * arr2).sum(axis=-1)
+    sum_12 = (weighted1 * arr2).sum(axis=-1)
+    return (sum_12 - sum_1 * sum_2 / sum_w) / (sum_w - 1)
+
+
+def monomial_exponents(formula, variables):
+    """Exponents of the variables in the columns of a patsy design matrix.
+
+    All columns of the design matrix have to be products of powers of the
+    variables and the constant. Moreover, for each column all columns with
+    smaller exponents have to be in the design matrix as well. This is the
+    case for the formulas of all transition functions that can be estimated
+    with the wa estimator.
+
+    args:
+        formula (str): a patsy formula as returned by the iv_formula
+            functions in the transition_functions module.
+        variables (list): names of the variables in formula.
+
+    Returns:
+        exponents (np.ndarray): integer array of shape [ncolumns, nvariables]
+
+    """
+    nvar = len(variables)
+    # in row j + 1 of the probe, variable j is 2 and all others are 1
+    probe = np.vstack([np.ones(nvar), np.eye(nvar) + 1])
+    design = _design_matrix(formula, probe, variables)
+    exponents = np.round(np.log2(design[1:] / design[0]).T).astype(int)
+
+    check = np.random.RandomState(0).uniform(0.5, 1.5, size=(3, nvar))
+    expected = np.prod(check.reshape(3, 1, nvar) ** exponents, axis=2)
+    design = _design_matrix(formula, check, variables)
+    assert np.allclose(design, expected), (
+        'The columns of the design matrix of {} are not products of powers '
+        'of the variables.'.format(formula))
+
+    existing = set(map(tuple, exponents))
+    for row in exponents:
+        for smaller in product(*[range(e + 1) for e in row]):
+            assert smaller in existing, (
+                'The design matrix of {} is not closed under affine '
+                'transformations of the variables.'.format(formula))
+    return exponents
+
+
+def _design_matrix(formula, arr, variables):
+    data = pd.DataFrame(data=arr, columns=variables)
+    data['constant'] = 1.0
+    return dmatrix(formula, data=data, return_type='dataframe').values
+
+
+def coeffs_after_affine_transformation(coeffs, exponents, scale, shift):
+    """Coefficients of a polynomial after an affine change of its variables.
+
+    The polynomial is sum_c coeffs[c] * prod_j y_j ** exponents[c, j]. After
+    substituting y = scale * x + shift and multiplying out, the same
+    polynomial is expressed in terms of x. Since the residual measurements in
+    the iv equations of the wa estimator are affine transformations of the
+    measurements, this gives the iv coefficients of the residual measurements
+    from those of the measurements.
+
+    args:
+        coeffs (np.ndarray): array of shape [..., ncolumns]
+        exponents (np.ndarray): see :func:`monomial_exponents`
+        scale (np.ndarray): array of shape [..., nvariables]
+        shift (np.ndarray): array of shape [..., nvariables]
+
+    Returns:
+        new_coeffs (np.ndarray): array of shape [..., ncolumns]
+
+    """
+    # the transformation matrix has the entries
+    # prod_j binom(e[c, j], e[d, j]) * scale_j ** e[d, j] *
+    #     shift_j ** (e[c, j] - e[d, j]) for c in the rows and d in the columns
+    e_from = exponents.reshape(len(exponents), 1, -1)
+    e_to = exponents.reshape(1, len(exponents), -1)
+    diff = np.maximum(e_from - e_to, 0)
+    scale = np.expand_dims(np.expand_dims(scale, -2), -2)
+    shift = np.expand_dims(np.expand_dims(shift, -2), -2)
+    factors = comb(e_from, e_to) * scale ** e_to * shift ** diff
+    transformation_matrix = np.prod(factors, axis=-1)
+    new_coeffs = np.matmul(
+        np.expand_dims(coeffs, -2), transformation_matrix)
+    return new_coeffs[..., 0, :]
+
+
 def large_df_for_iv_equations(depvar_data, indepvars_data, instruments_data):
     to_concat = [prepend_column_level(depvar_data, 'y'),
                  prepend_column_level(indepvars_data, 'x'),
@@ -0,0 +1,71 @@
+"""Reusable workspaces for the likelihood function.
+
+A workspace is a LikelihoodState or a dict with likelihood arguments. It holds
+buffers that are updated in place when the likelihood is evaluated. Two
+evaluations that run at the same time must therefore never use the same
+workspace and constructing a new one for each evaluation is expensive.
+
+A :class:`WorkspacePool` solves both problems. Each workspace is lent to only
+one user at a time and is reused after it was released. The pool is thread
+safe, such that several threads can acquire workspaces at the same time.
+
+"""
+import threading
+from contextlib import contextmanager
+
+
+class WorkspacePool:
+    """Thread safe pool of workspaces.
+
+    Args:
+        build (function): is called with the key of a workspace and returns a
+            new workspace. It is called without holding the lock of the pool.
+
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._idle = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return a workspace for key that is not used by anyone else."""
+        with self._lock:
+            idle = self._idle.get(key, [])
+            workspace = idle.pop() if len(idle) > 0 else None
+        if workspace is None:
+            workspace = self.build(key)
+        with self._lock:
+            self._keys[id(workspace)] = key
+        return workspace
+
+    def release(self, workspace):
+        """Give an acquired workspace back to the pool."""
+        with self._lock:
+            key = self._keys.pop(id(workspace))
+            self._idle.setdefault(key, []).append(workspace)
+
+    @contextmanager
+    def workspace(self, key):
+        """Context manager that acquires and releases a workspace."""
+        workspace = self.acquire(key)
+        try:
+            yield workspace
+        finally:
+            self.release(workspace)
+
+    def clear(self):
+        """Discard all idle workspaces.
+
+        This is necessary if model attributes that are used to build the
+        workspaces change after some workspaces were built.
+
+        """
+        with self._lock:
+            self._idle = {}
+
+    def nidle(self, key):
+        """Number of idle workspaces for key."""
+        with self._lock:
+            return len(self._idle.get(key, []))
@@ -1,21 +1,29 @@
-"""Contains Kalman Update and Predict functions in several flavors."""
+"""Contains Kalman Update and Predict functions in several flavors.
+
+The update functions are compiled numpy gufuncs. They don't call the Python
+API, so numpy releases the GIL while they run and several threads can filter
+independent LikelihoodStates at the same time. The numba functions called by
+the predict functions are compiled with nogil=True for the same reason.
+
+"""
 
 from numba import float64 as f64
 from numba import int64 as i64
 from numba import guvectorize
+import time
 import numpy as np
 from skillmodels.fast_routines.transform_sigma_points import \
     transform_sigma_points
 from skillmodels.fast_routines.qr_decomposition import array_qr
 
 
-@guvectorize([(f64[:, :], f64[:, :, :], f64[:], f64[:], f64[:],
-               f64[:], f64[:], f64[:], i64[:], f64[:])],
-             ('(nemf, nfac), (nemf, nfac_, nfac_), (), (), (ncon), '
-              '(ncon), (nfac), (), (ninc), (nemf)'),
+@guvectorize([(f64[:, :], f64[:, :, :], f64[:], f64[:], f64[:], f64[:],
+               i64[:], f64[:])],
+             ('(nemf, nfac), (nemf, nfac_, nfac_), (), (), (nfac), (), '
+              '(ninc), (nemf)'),
              target='cpu', nopython=True)
-def sqrt_linear_update(state, cov, like_vec, y, c, delta, h, sqrt_r,
-                       positions, weights):
+def sqrt_linear_update(state, cov, like_vec, y, h, sqrt_r, positions,
+                       weights):
     """Make a linear Kalman update in square root form and evaluate likelihood.
 
     The square-root form of the Kalman update is much more robust than the
@@ -31,11 +39,9 @@ def sqrt_linear_update(state, cov, like_vec, y, c, delta, h, sqrt_r,
 
         like_vec (np.ndarray): a scalar in form of a length one numpy array.
 
-        y (np.ndarray): a scalar in form of a length one numpy array.
-
-        c (np.ndarray): numpy array of (..., ncontrols) with control variables.
-
-        delta (np.ndarray): estimated parameters of the control variables.
+        y (np.ndarray): a scalar in form of a length one numpy array. It is the
+            measurement minus the contribution of the control variables
+            (see subtract_controls in the likelihood_function module).
 
         h (np.ndarray): numpy array of length nfac with factor loadings.
 
@@ -52,15 +58,10 @@ def sqrt_linear_update(state, cov, like_vec, y, c, delta, h, sqrt_r,
     """
     nemf, nfac = state.shape
     m = nfac + 1
-    ncontrol = delta.shape[0]
     # invariant = 0.398942280401432702863218082711682654917240142822265625
     invariant = 1 / (2 * np.pi) ** 0.5
     invar_diff = y[0]
     if np.isfinite(invar_diff):
-        # same for all factor distributions
-        for cont in range(ncontrol):
-            invar_diff -= c[cont] * delta[cont]
-
         # per distribution stuff
         for emf in range(nemf):
             diff = invar_diff
@@ -119,13 +120,13 @@ def sqrt_linear_update(state, cov, like_vec, y, c, delta, h, sqrt_r,
                 weights[emf] /= sum_wprob
 
 
-@guvectorize([(f64[:, :], f64[:, :, :], f64[:], f64[:], f64[:],
-               f64[:], f64[:], f64[:], i64[:], f64[:], f64[:])],
-             ('(nemf, nfac), (nemf, nfac, nfac), (), (), (ncon), '
-              '(ncon), (nfac), (), (ninc), (nemf), (nfac)'),
+@guvectorize([(f64[:, :], f64[:, :, :], f64[:], f64[:], f64[:], f64[:],
+               i64[:], f64[:], f64[:])],
+             ('(nemf, nfac), (nemf, nfac, nfac), (), (), (nfac), (), '
+              '(ninc), (nemf), (nfac)'),
              target='cpu', nopython=True)
-def normal_linear_update(state, cov, like_vec, y, c, delta, h, r, positions,
-                         weights, kf):
+def normal_linear_update(state, cov, like_vec, y, h, r, positions, weights,
+                         kf):
     """Make a linear Kalman update and evaluate likelihood.
 
     All quantities (states, covariances likelihood and weights) are updated in
@@ -138,11 +139,9 @@ def normal_linear_update(state, cov, like_vec, y, c, delta, h, r, positions,
 
         like_vec (np.ndarray): a scalar in form of a length one numpy array.
 
-        y (np.ndarray): a scalar in form of a length one numpy array.
-
-        c (np.ndarray): numpy array of (..., ncontrols) with control variables.
-
-        delta (np.ndarray): estimated parameters of the control variables.
+        y (np.ndarray): a scalar in form of a length one numpy array. It is the
+            measurement minus the contribution of the control variables
+            (see subtract_controls in the likelihood_function module).
 
         h (np.ndarray): numpy array of length nfac with factor loadings.
 
@@ -160,15 +159,10 @@ def normal_linear_update(state, cov, like_vec, y, c, delta, h, r, positions,
 
     """
     nemf, nfac = state.shape
-    ncontrol = delta.shape[0]
     # invariant = 0.398942280401432702863218082711682654917240142822265625
     invariant = 1 / (2 * np.pi) ** 0.5
     invar_diff = y[0]
     if np.isfinite(invar_diff):
-        # same for all factor distributions
-        for cont in range(ncontrol):
-            invar_diff -= c[cont] * delta[cont]
-
         # per distribution stuff
         for emf in range(nemf):
             diff = invar_diff
@@ -215,7 +209,8 @@ def normal_linear_update(state, cov, like_vec, y, c, delta, h, r, positions,
 def normal_unscented_predict(stage, sigma_points, flat_sigma_points,
                              s_weights_m, s_weights_c, Q,
                              transform_sigma_points_args,
-                             out_flat_states, out_flat_covs):
+                             out_flat_states, out_flat_covs, profiler=None,
+                             period=None):
     """Make a unscented Kalman filter predict step in square-root form.
 
     Args:
@@ -232,6 +227,10 @@ def normal_unscented_predict(stage, sigma_points, flat_sigma_points,
         transform_sigma_points_args (dict): (see transform_sigma_points).
         out_flat_states (np.ndarray): output array of (nind * nemf, nfac).
         out_flat_covs (np.ndarray): output array of (nind * nemf, nfac, nfac).
+        profiler (LikelihoodProfiler): optional. If given, the time of the
+            transition functions and of the calculation of the predicted
+            states and covariances are recorded for period.
+        period (int): the period in which the predict step is done.
 
     References:
         Van Der Merwe, R. and Wan, E.A. The Square-Root Unscented Kalman
@@ -240,8 +239,12 @@ def normal_unscented_predict(stage, sigma_points, flat_sigma_points,
     """
     nemf_times_nind, nsigma, nfac = sigma_points.shape
     q = Q[stage]
+    if profiler is not None:
+        tic = time.perf_counter()
     transform_sigma_points(stage, flat_sigma_points,
                            **transform_sigma_points_args)
+    if profiler is not None:
+        tic = profiler.stop('transition_functions', tic, period)
     # get them back into states
     predicted_states = np.dot(s_weights_m, sigma_points, out=out_flat_states)
     devs = sigma_points - predicted_states.reshape(nemf_times_nind, 1, nfac)
@@ -250,11 +253,14 @@ def normal_unscented_predict(stage, sigma_points, flat_sigma_points,
         * devs.reshape(nemf_times_nind, nsigma, nfac, 1)
     out_flat_covs[:] = \
         np.sum((s_weights_c.reshape(nsigma, 1, 1) * dev_outerprod), axis=1) + q
+    if profiler is not None:
+        profiler.stop('predict_covariances', tic, period)
 
 
 def sqrt_unscented_predict(stage, sigma_points, flat_sigma_points, s_weights_m,
                            s_weights_c, Q, transform_sigma_points_args,
-                           out_flat_states, out_flat_covs):
+                           out_flat_states, out_flat_covs, profiler=None,
+                           period=None):
     """Make a unscented Kalman filter predict step in square-root form.
 
     The square-root form of the Kalman predict is much more robust than the
@@ -274,6 +280,10 @@ def sqrt_unscented_predict(stage, sigma_points, flat_sigma_points, s_weights_m,
         transform_sigma_points_args (dict): (see transform_sigma_points).
         out_flat_states (np.ndarray): output array of (nind * nemf, nfac).
         out_flat_covs (np.ndarray): output array of (nind * nemf, nfac, nfac).
+        profiler (LikelihoodProfiler): optional. If given, the time of the
+            transition functions and of the calculation of the predicted
+            states and covariances are recorded for period.
+        period (int): the period in which the predict step is done.
 
     References:
         Van Der Merwe, R. and Wan, E.A. The Square-Root Unscented Kalman
@@ -282,8 +292,12 @@ def sqrt_unscented_predict(stage, sigma_points, flat_sigma_points, s_weights_m,
     """
     nemf_times_nind, nsigma, nfac = sigma_points.shape
     q = Q[stage]
+    if profiler is not None:
+        tic = time.perf_counter()
     transform_sigma_points(stage, flat_sigma_points,
                            **transform_sigma_points_args)
+    if profiler is not None:
+        tic = profiler.stop('transition_functions', tic, period)
 
     # get them back into states
     predicted_states = np.dot(s_weights_m, sigma_points, out=out_flat_states)
@@ -294,6 +308,8 @@ def sqrt_unscented_predict(stage, sigma_points, flat_sigma_points, s_weights_m,
     qr_points[:, 0: nsigma, :] = devs * qr_weights
     qr_points[:, nsigma:, :] = np.sqrt(q)
     out_flat_covs[:, 1:, 1:] = array_qr(qr_points)[:, :nfac, :]
+    if profiler is not None:
+        profiler.stop('predict_covariances', tic, period)
 
 
 def sqrt_probit_update(k, t, j, states, covs, mix_weights, like_vec, y_data,
@@ -1,7 +1,7 @@
 from numba import jit
 
 
-@jit
+@jit(nopython=True, nogil=True)
 def array_qr(arr):
     """Calculate R of a QR decomposition for matrices in an array.
 
@@ -22,6 +22,10 @@ functions is explained with a transition function called example_func:
     Returns
         * 1d array
 
+    If the function is compiled with numba it should use nogil=True. Otherwise
+    it blocks other threads when the likelihood is evaluated on several
+    threads (see the executor in :ref:`model_specs`).
+
 For each transition function, the following auxiliary functions must
 be implemented:
 
@@ -358,7 +362,7 @@ def output_has_known_location_log_ces():
 # =============================================================================
 
 
-@jit
+@jit(nopython=True, nogil=True)
 def translog(sigma_points, coeffs, included_positions):
     # the coeffs will be parsed as follows:
     # last entry = TFP term
@@ -434,7 +438,7 @@ def output_has_known_location_translog():
 # =============================================================================
 
 
-@jit
+@jit(nopython=True, nogil=True)
 def no_squares_translog(sigma_points, coeffs, included_positions):
     # the coeffs will be parsed as follows:
     # last entry = TFP term
@@ -78,3 +78,43 @@ class DataProcessor:
         else:
             raise NotImplementedError(
                 'DataProcessor.c_data only works for CHS estimator')
+
+
+def unique_individuals(y_data, c_data):
+    """Collapse individuals with identical measurement and control histories.
+
+    Individuals whose complete y_data and c_data histories are equal have
+    the same contribution to the likelihood. It is therefore sufficient to
+    run the Kalman filter once for each distinct history.
+
+    Args:
+        y_data (np.ndarray): numpy array of shape [nupdates, nind].
+        c_data (list): list of numpy arrays of shape [nind, ncontrols_t].
+
+    Returns:
+        unique_y_data (np.ndarray): numpy array of shape [nupdates, nunique].
+
+        unique_c_data (list): list of numpy arrays of shape
+            [nunique, ncontrols_t].
+
+        unique_inverse (np.ndarray): array of length nind with the position
+            of each individual in the unique arrays.
+
+        frequency_weights (np.ndarray): array of length nunique with the number
+            of individuals that share each history.
+
+    """
+    histories = np.ascontiguousarray(
+        np.column_stack([y_data.T] + list(c_data)), dtype=float)
+    # view each history as one opaque element such that np.unique compares
+    # them bytewise. Contrary to float comparisons this treats two NaNs as
+    # equal, which is what we need for missing measurements.
+    row_size = histories.dtype.itemsize * histories.shape[1]
+    rows = histories.view(np.dtype((np.void, row_size))).ravel()
+    _, first_index, unique_inverse, frequency_weights = np.unique(
+        rows, return_index=True, return_inverse=True, return_counts=True)
+
+    unique_y_data = y_data[:, first_index]
+    unique_c_data = [arr[first_index] for arr in c_data]
+    return unique_y_data, unique_c_data, unique_inverse.ravel(), \
+        frequency_weights
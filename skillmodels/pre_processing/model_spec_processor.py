@@ -5,6 +5,7 @@ from itertools import product
 import skillmodels.model_functions.transition_functions as tf
 import os
 import warnings
+from concurrent.futures import Executor
 
 
 class ModelSpecProcessor:
@@ -61,6 +62,8 @@ class ModelSpecProcessor:
              "restrict_W_zeros": True,
              "restrict_P_zeros": True,
              "cholesky_of_P_zero": False,
+             "deduplicate_individuals": False,
+             "checkpoint_filter_states": False,
              "probit_measurements": False,
              "probanch_function": "odds_ratio",
              "ignore_intercept_in_linear_anchoring": True,
@@ -80,6 +83,9 @@ class ModelSpecProcessor:
              'chs_standard_error_method': 'op_of_gradient',
              'save_intermediate_optimization_results': False,
              'save_params_before_calculating_standard_errors': False,
+             'save_bootstrap_replications': False,
+             'save_optimizer_checkpoints': False,
+             'optimizer_checkpoint_interval': 10,
              'maxiter': 1000000,
              'maxfun': 1000000,
              'period_identifier': 'period',
@@ -87,6 +93,25 @@ class ModelSpecProcessor:
              'bootstrap_nreps': 300,
              'bootstrap_sample_size': None,
              'bootstrap_nprocesses': None,
+             'bootstrap_mc_tolerance': None,
+             'bootstrap_method': 'resample',
+             'bootstrap_wave_size': 50,
+             'executor': 'process',
+             'max_workers': None,
+             'threads_per_worker': 1,
+             'parallel_derivatives': False,
+             'evaluation_cache_size': 32,
+             'profile_likelihood': False,
+             'chs_optimizer': 'L-BFGS-B',
+             'bhhh_tolerance': 1e-8,
+             'progressive_sample_shares': None,
+             'minibatch_nbatches': None,
+             'minibatch_epochs': 5,
+             'minibatch_learning_rate': 0.01,
+             'multistart_nstarts': 1,
+             'multistart_perturbation': 0.1,
+             'multistart_round_maxiter': 50,
+             'multistart_keep_share': 0.5,
              'anchoring_mode': 'only_estimate_anchoring_equation'
              }
 
@@ -135,7 +160,8 @@ class ModelSpecProcessor:
             self.bootstrap_sample_size = self.nobs
 
     def _generate_save_directories(self):
-        if self.save_intermediate_optimization_results is True:
+        if self.save_intermediate_optimization_results is True or \
+                self.save_optimizer_checkpoints is True:
             os.makedirs(self.save_path + '/opt_results', exist_ok=True)
         if self.save_params_before_calculating_standard_errors is True:
             os.makedirs(self.save_path + '/params', exist_ok=True)
@@ -192,18 +218,52 @@ class ModelSpecProcessor:
             'Currently, the only standard error method supported with the wa '
             'estimator is bootstrap.')
 
+        bootstrap_admissible = ['resample', 'multiplier']
+        assert self.bootstrap_method in bootstrap_admissible, (
+            'The bootstrap_method has to be one of {}. Check model {}'.format(
+                bootstrap_admissible, self.model_name))
+        if self.bootstrap_method == 'multiplier':
+            assert self.estimator == 'chs', (
+                'The multiplier bootstrap needs the scores of a likelihood '
+                'and is only possible with the chs estimator. Check model '
+                '{}'.format(self.model_name))
+
+        assert isinstance(self.executor, Executor) or \
+            self.executor in ['process', 'thread'], (
+                'The executor has to be "process", "thread" or a '
+                'concurrent.futures.Executor. Check model {}'.format(
+                    self.model_name))
+
+        assert 0 < self.multistart_keep_share < 1, (
+            'The multistart_keep_share has to be between 0 and 1. Check '
+            'model {}'.format(self.model_name))
+
+        if self.progressive_sample_shares is not None:
+            shares = list(self.progressive_sample_shares)
+            assert shares == sorted(shares) and 0 < shares[0] and \
+                shares[-1] < 1, (
+                    'The progressive_sample_shares have to be increasing and '
+                    'between 0 and 1. Check model {}'.format(self.model_name))
+
+        optimizer_admissible = ['L-BFGS-B', 'bhhh']
+        assert self.chs_optimizer in optimizer_admissible, (
+            'The chs_optimizer has to be one of {}. Check model {}'.format(
+                optimizer_admissible, self.model_name))
+
         chs_admissible = ['bootstrap', 'op_of_gradient', 'hessian_inverse']
         assert self.chs_standard_error_method in chs_admissible, (
             'Currently, the only standard error methods supported with the '
             'chs estimator are {}'.format(chs_admissible))
 
         something_ist_saved = self.save_intermediate_optimization_results or \
-            self.save_params_before_calculating_standard_errors
+            self.save_params_before_calculating_standard_errors or \
+            self.save_bootstrap_replications or \
+            self.save_optimizer_checkpoints
         if something_ist_saved is True:
             assert self.save_path is not None, (
                 'If you specified to save intermediate optimization '
-                'results or estimated parameters you have to provide '
-                'a save_path.')
+                'results, estimated parameters or bootstrap replications you '
+                'have to provide a save_path.')
 
         if self.estimator == 'wa':
             assert self.probit_measurements is False, (
@@ -0,0 +1,56 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from skillmodels.estimation.bhhh import bhhh
+
+
+def normal_loglikeobs(params, data, weights=None):
+    mean, log_sd = params
+    sd = np.exp(log_sd)
+    loglike = - np.log(sd) - 0.5 * ((data - mean) / sd) ** 2
+    if weights is not None:
+        loglike = loglike * weights
+    return loglike
+
+
+class TestBHHH:
+    def setup(self):
+        np.random.seed(1234)
+        self.data = np.random.normal(loc=2, scale=3, size=500)
+        self.expected = np.array(
+            [self.data.mean(), np.log(self.data.std())])
+
+    def test_bhhh_finds_maximum_likelihood_estimates(self):
+        res = bhhh(lambda x: normal_loglikeobs(x, self.data),
+                   np.array([0.0, 0.0]))
+        assert res.success
+        aaae(res.x, self.expected, decimal=4)
+        assert_equal(res.score_obs.shape, (500, 2))
+
+    def test_bhhh_respects_bounds(self):
+        res = bhhh(lambda x: normal_loglikeobs(x, self.data),
+                   np.array([0.0, 0.0]), bounds=[(None, 1.0), (None, None)])
+        assert res.x[0] <= 1.0
+        aaae(res.x[0], 1.0)
+
+    def test_weights_are_equivalent_to_duplicated_data(self):
+        weights = np.arange(500) % 3
+        duplicated = np.repeat(self.data, weights)
+        res = bhhh(lambda x: normal_loglikeobs(x, self.data, weights),
+                   np.array([0.0, 0.0]), weights=weights.astype(float))
+        expected = bhhh(lambda x: normal_loglikeobs(x, duplicated),
+                        np.array([0.0, 0.0]))
+        aaae(res.x, expected.x, decimal=4)
+        aaae(np.dot(res.score_obs.T, res.score_obs),
+             np.dot(expected.score_obs.T, expected.score_obs), decimal=3)
+
+    def test_callback_receives_iterates_and_gradients(self):
+        calls = []
+        res = bhhh(lambda x: normal_loglikeobs(x, self.data),
+                   np.array([0.0, 0.0]),
+                   callback=lambda x, fun, gradient: calls.append(
+                       (x.copy(), fun, gradient)))
+        assert_equal(len(calls), res.nit)
+        aaae(calls[0][0], np.zeros(2))
+        aaae(calls[0][1], normal_loglikeobs(np.zeros(2), self.data).sum())
+        assert np.linalg.norm(calls[-1][2]) < 0.1
@@ -0,0 +1,66 @@
+from nose.tools import assert_equal
+from unittest.mock import Mock
+import numpy as np
+from numpy.testing import assert_array_equal as aae
+from skillmodels.estimation.evaluation_cache import EvaluationCache, \
+    array_digest
+
+
+class TestEvaluationCache:
+    def setup(self):
+        self.cache = EvaluationCache(maxsize=2)
+        self.func = Mock(return_value=np.arange(3.0))
+        self.params = np.array([1.0, 2.0])
+
+    def test_repeated_lookup_is_a_hit(self):
+        self.cache.lookup(('score', ), self.params, self.func)
+        res = self.cache.lookup(('score', ), self.params.copy(), self.func)
+        aae(res, np.arange(3.0))
+        assert_equal(self.func.call_count, 1)
+        assert_equal(self.cache.info()['hits'], 1)
+        assert_equal(self.cache.info()['misses'], 1)
+
+    def test_different_params_or_keys_are_misses(self):
+        self.cache.lookup(('score', ), self.params, self.func)
+        self.cache.lookup(('score', ), self.params + 1, self.func)
+        self.cache.lookup(('hessian', ), self.params, self.func)
+        assert_equal(self.func.call_count, 3)
+
+    def test_least_recently_used_result_is_dropped(self):
+        for i in range(3):
+            self.cache.lookup(('score', ), self.params + i, self.func)
+        self.cache.lookup(('score', ), self.params + 2, self.func)
+        assert_equal(self.func.call_count, 3)
+        self.cache.lookup(('score', ), self.params, self.func)
+        assert_equal(self.func.call_count, 4)
+        assert_equal(self.cache.info()['currsize'], 2)
+
+    def test_cached_result_can_not_be_changed_by_caller(self):
+        res = self.cache.lookup(('score', ), self.params, self.func)
+        res[:] = 0
+        res = self.cache.lookup(('score', ), self.params, self.func)
+        aae(res, np.arange(3.0))
+
+    def test_stored_result_is_returned(self):
+        self.cache.store(('cov', ), self.params, np.eye(2))
+        aae(self.cache.lookup(('cov', ), self.params, self.func), np.eye(2))
+        assert_equal(self.func.call_count, 0)
+
+    def test_clear(self):
+        self.cache.lookup(('score', ), self.params, self.func)
+        self.cache.clear()
+        self.cache.lookup(('score', ), self.params, self.func)
+        assert_equal(self.func.call_count, 2)
+        assert_equal(self.cache.info()['hits'], 0)
+
+    def test_maxsize_zero_disables_cache(self):
+        cache = EvaluationCache(maxsize=0)
+        cache.lookup(('score', ), self.params, self.func)
+        cache.lookup(('score', ), self.params, self.func)
+        assert_equal(self.func.call_count, 2)
+
+
+def test_array_digest():
+    arr = np.arange(4.0)
+    assert_equal(array_digest(arr), array_digest(arr.copy()))
+    assert array_digest(arr) != array_digest(arr + 1)
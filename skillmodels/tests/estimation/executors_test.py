@@ -0,0 +1,93 @@
+from nose.tools import assert_equal, assert_raises
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from unittest.mock import Mock
+from skillmodels import SkillModel as smo
+from skillmodels.estimation.executors import executor_context, \
+    map_unordered, shares_memory, thread_environment_variables
+from concurrent.futures import ThreadPoolExecutor
+from statsmodels.tools.numdiff import approx_fprime, approx_hess
+from functools import partial
+import os
+
+
+def square(x):
+    return x ** 2
+
+
+class TestExecutorContext:
+    def test_thread_executor(self):
+        with executor_context('thread', max_workers=2) as ex:
+            assert isinstance(ex, ThreadPoolExecutor)
+            result = sorted(map_unordered(ex, square, range(5)))
+        assert_equal(result, [0, 1, 4, 9, 16])
+
+    def test_process_executor(self):
+        with executor_context('process', max_workers=2) as ex:
+            result = sorted(map_unordered(ex, abs, [-2, 1, -3]))
+        assert_equal(result, [1, 2, 3])
+
+    def test_user_executor_is_not_shut_down(self):
+        user_executor = ThreadPoolExecutor(1)
+        with executor_context(user_executor) as ex:
+            assert ex is user_executor
+        assert_equal(user_executor.submit(square, 3).result(), 9)
+        user_executor.shutdown()
+
+    def test_invalid_executor(self):
+        with assert_raises(NotImplementedError):
+            with executor_context('cluster'):
+                pass
+
+
+class TestSharesMemory:
+    def test_thread_executors_share_memory(self):
+        assert shares_memory('thread')
+        with ThreadPoolExecutor(1) as ex:
+            assert shares_memory(ex)
+
+    def test_process_executor_does_not_share_memory(self):
+        assert not shares_memory('process')
+
+
+def thread_variables():
+    return [os.environ.get(var) for var in thread_environment_variables]
+
+
+class TestLimitThreads:
+    def test_limit_threads_sets_environment_variables(self):
+        # limit_threads changes the whole process and is therefore only
+        # called in a worker, where it runs as initializer
+        with executor_context('process', max_workers=1,
+                              threads_per_worker=2) as ex:
+            variables = ex.submit(thread_variables).result()
+        assert_equal(variables, ['2'] * len(thread_environment_variables))
+
+
+class TestParallelNumericalDerivative:
+    def setup(self):
+        self.params = np.array([0.5, -1.0, 2.0])
+        self.nobs = 4
+        self.parallel_derivatives = True
+
+        def loglikeobs(params):
+            return np.arange(1, 5) * np.sin(params).sum() + params[0] ** 3
+
+        self.loglikeobs = loglikeobs
+        self._parallel_loglike_at_points = Mock(
+            side_effect=lambda points, params, per_obs: [
+                loglikeobs(p) if per_obs else loglikeobs(p).sum()
+                for p in points])
+
+    def test_parallel_score_obs_equals_serial_score_obs(self):
+        func = partial(approx_fprime, centered=True)
+        calculated = smo._numerical_derivative(
+            self, func, self.params, per_obs=True)
+        aaae(calculated, func(self.params, self.loglikeobs))
+
+    def test_parallel_hessian_equals_serial_hessian(self):
+        calculated = smo._numerical_derivative(self, approx_hess, self.params)
+        expected = approx_hess(
+            self.params, lambda p: self.loglikeobs(p).sum())
+        aaae(calculated, expected)
+        assert_equal(self._parallel_loglike_at_points.call_count, 1)
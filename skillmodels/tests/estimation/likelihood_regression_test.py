@@ -1,11 +1,14 @@
 import pickle
 import json
+import numpy as np
 import pandas as pd
 from skillmodels import SkillModel
 from skillmodels.estimation.likelihood_function import \
-    log_likelihood_per_individual
+    log_likelihood_per_individual, log_likelihood
 
 from numpy.testing import assert_array_almost_equal as aaae
+from numpy.testing import assert_array_equal as aae
+from nose.tools import assert_equal
 
 
 def test_likelihood_value():
@@ -16,7 +19,7 @@ def test_likelihood_value():
     mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
                      model_name='test_model')
 
-    args = mod.likelihood_arguments_dict(params_type='short')
+    state = mod.likelihood_state(params_type='short')
 
     params = [1,
               1.01, 1.02, 1.03, 1.04, 1.05, 1.06, 1.07, 1.08, 1.09, 1.1,
@@ -39,7 +42,7 @@ def test_likelihood_value():
               0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.1, 0.1, 0.447, 0, 0, 0.447,
               0, 0.447, 3, 3, -0.5, 0.6]
 
-    res = log_likelihood_per_individual(params, **args)
+    res = log_likelihood_per_individual(params, state)
 
     in_path = 'skillmodels/tests/estimation/regression_test_fixture.pickle'
     with open(in_path, 'rb') as p:
@@ -54,12 +57,81 @@ def test_likelihood_value():
     #     pickle.dump(res, p)
 
 
+def test_likelihood_value_with_checkpoints():
+    df = pd.read_stata('skillmodels/tests/estimation/chs_test_ex2.dta')
+    with open('skillmodels/tests/estimation/test_model2.json') as j:
+        model_dict = json.load(j)
+    model_dict['general']['checkpoint_filter_states'] = True
 
+    mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
+                     model_name='test_model')
 
+    state = mod.likelihood_state(params_type='short')
+    mod.checkpoint_filter_states = False
+    state_without_checkpoints = mod.likelihood_state(params_type='short')
 
+    params = mod.generate_start_params()
+    log_likelihood_per_individual(params, state)
+    base_params = state.checkpoint_args['base_params'].copy()
+    aae(base_params, params)
 
+    first_periods = state.checkpoint_args['first_periods']
+    for i in [0, np.argmax(first_periods), len(params) - 1]:
+        perturbed = params.copy()
+        perturbed[i] += 0.01
+        res = log_likelihood_per_individual(perturbed, state)
+        expected = log_likelihood_per_individual(
+            perturbed, state_without_checkpoints)
+        aaae(res, expected)
+        # evaluations that only change one entry keep the checkpoints
+        aae(state.checkpoint_args['base_params'], base_params)
 
 
+def test_weighted_likelihood_value():
+    df = pd.read_stata('skillmodels/tests/estimation/chs_test_ex2.dta')
+    with open('skillmodels/tests/estimation/test_model2.json') as j:
+        model_dict = json.load(j)
+
+    mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
+                     model_name='test_model')
+    params = mod.generate_start_params()
+    weights = np.arange(mod.nobs) % 3
 
+    expected_per_individual = weights * log_likelihood_per_individual(
+        params, mod.likelihood_state(params_type='short'))
 
+    for deduplicate in [False, True]:
+        model_dict['general']['deduplicate_individuals'] = deduplicate
+        mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
+                         model_name='test_model')
+        state = mod.likelihood_state(params_type='short', weights=weights)
+        aaae(log_likelihood_per_individual(params, state),
+             expected_per_individual)
+        aaae(log_likelihood(params, state), expected_per_individual.sum(),
+             decimal=5)
 
+
+def test_profiled_likelihood_value():
+    df = pd.read_stata('skillmodels/tests/estimation/chs_test_ex2.dta')
+    with open('skillmodels/tests/estimation/test_model2.json') as j:
+        model_dict = json.load(j)
+
+    mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
+                     model_name='test_model')
+    params = mod.generate_start_params()
+    expected = log_likelihood_per_individual(
+        params, mod.likelihood_state(params_type='short'))
+
+    model_dict['general']['profile_likelihood'] = True
+    mod = SkillModel(model_dict=model_dict, dataset=df, estimator='chs',
+                     model_name='test_model')
+    state = mod.likelihood_state(params_type='short')
+    aaae(log_likelihood_per_individual(params, state), expected)
+
+    report = mod.profiling_report(by_period=True)
+    assert (report.loc['updates', 'calls'] == 1).all()
+    assert len(report.loc['updates']) == mod.nperiods
+    assert len(report.loc['transition_functions']) == mod.nperiods - 1
+    if mod.anchoring is True:
+        assert_equal(list(report.loc['anchoring'].index), [mod.nperiods - 1])
+    assert mod.likelihood_profiler.nevaluations == 1
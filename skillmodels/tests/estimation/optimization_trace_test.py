@@ -0,0 +1,58 @@
+from nose.tools import assert_equal, assert_raises
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from skillmodels.estimation.optimization_trace import OptimizationTrace, \
+    read_optimization_trace
+import os
+import tempfile
+
+
+class TestOptimizationTrace:
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trace.bin')
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        with OptimizationTrace(self.path, 2) as trace:
+            trace.record(np.array([1.0, 2.0]), -3.0, 'loglike')
+            trace.record(np.array([4.0, 5.0]), -6.0, 'loglikeobs')
+        df = read_optimization_trace(self.path, param_names=['a', 'b'])
+        assert_equal(list(df.columns), ['kind', 'log_lh_value', 'time', 'a',
+                                        'b'])
+        assert_equal(list(df['kind']), ['loglike', 'loglikeobs'])
+        aaae(df['log_lh_value'].values, [-3.0, -6.0])
+        aaae(df[['a', 'b']].values, [[1.0, 2.0], [4.0, 5.0]])
+        assert df['time'].is_monotonic_increasing
+
+    def test_records_are_written_in_batches(self):
+        trace = OptimizationTrace(self.path, 1, buffer_size=2)
+        trace.record(np.zeros(1), 0.0, 'loglike')
+        assert_equal(len(read_optimization_trace(self.path)), 0)
+        trace.record(np.ones(1), 1.0, 'loglike')
+        assert_equal(len(read_optimization_trace(self.path)), 2)
+        trace.record(np.ones(1), 2.0, 'loglike')
+        trace.close()
+        assert_equal(len(read_optimization_trace(self.path)), 3)
+
+    def test_append(self):
+        with OptimizationTrace(self.path, 1) as trace:
+            trace.record(np.zeros(1), 0.0, 'loglike')
+        with OptimizationTrace(self.path, 1, append=True) as trace:
+            trace.record(np.ones(1), 1.0, 'loglike')
+        aaae(read_optimization_trace(self.path)['param_0'].values, [0, 1])
+
+    def test_overwrite(self):
+        with OptimizationTrace(self.path, 1) as trace:
+            trace.record(np.zeros(1), 0.0, 'loglike')
+        with OptimizationTrace(self.path, 1) as trace:
+            trace.record(np.ones(1), 1.0, 'loglike')
+        aaae(read_optimization_trace(self.path)['param_0'].values, [1])
+
+    def test_append_with_different_nparams_raises_error(self):
+        with OptimizationTrace(self.path, 1):
+            pass
+        assert_raises(AssertionError, OptimizationTrace, self.path, 2,
+                      append=True)
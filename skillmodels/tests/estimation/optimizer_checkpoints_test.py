@@ -0,0 +1,56 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from scipy.optimize import minimize
+from skillmodels.estimation.optimizer_checkpoints import \
+    OptimizerCheckpoints, read_checkpoint
+import os
+import tempfile
+
+
+def rosenbrock(x):
+    return (1 - x[0]) ** 2 + 100 * (x[1] - x[0] ** 2) ** 2
+
+
+class TestOptimizerCheckpoints:
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def test_counters_and_best_value(self):
+        tracker = OptimizerCheckpoints()
+        func = tracker.objective(rosenbrock)
+        func(np.array([0.0, 0.0]))
+        func(np.array([1.0, 1.0]))
+        func(np.array([2.0, 0.0]))
+        tracker.callback(np.array([1.0, 1.0]))
+        assert_equal(tracker.nfev, 3)
+        assert_equal(tracker.nit, 1)
+        assert_equal(tracker.best_fun, 0.0)
+        assert_equal(tracker.best_x, [1.0, 1.0])
+
+    def test_checkpoint_is_written_every_interval(self):
+        tracker = OptimizerCheckpoints(self.path, interval=2)
+        tracker.callback(np.zeros(2))
+        assert not os.path.exists(self.path)
+        tracker.callback(np.ones(2))
+        assert_equal(read_checkpoint(self.path)['x'], [1.0, 1.0])
+
+    def test_resume_continues_counters(self):
+        tracker = OptimizerCheckpoints(self.path, interval=1)
+        minimize(tracker.objective(rosenbrock), np.array([-1.0, 2.0]),
+                 method='L-BFGS-B', callback=tracker.callback,
+                 options={'maxiter': 5})
+        checkpoint = read_checkpoint(self.path)
+        assert_equal(checkpoint['nit'], 5)
+
+        resumed = OptimizerCheckpoints(self.path, checkpoint=checkpoint)
+        res = minimize(resumed.objective(rosenbrock),
+                       np.array(checkpoint['x']), method='L-BFGS-B',
+                       callback=resumed.callback)
+        assert resumed.nit > 5
+        assert resumed.nfev > checkpoint['nfev']
+        aaae(res.x, np.ones(2), decimal=3)
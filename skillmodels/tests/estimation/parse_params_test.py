@@ -5,7 +5,27 @@ import numpy as np
 import scipy.linalg as sl
 
 
-class TestMapParamsToDeltas:
+class TestPoolArrays:
+    def setup(self):
+        self.arrays = [np.arange(6).reshape(2, 3), np.ones(4)]
+
+    def test_pool_arrays_buffer(self):
+        buffer, views, offsets = pp.pool_arrays(self.arrays)
+        aae(buffer, np.array([0, 1, 2, 3, 4, 5, 1, 1, 1, 1]))
+
+    def test_pool_arrays_views(self):
+        buffer, views, offsets = pp.pool_arrays(self.arrays)
+        aae(views[0], self.arrays[0])
+        aae(views[1], self.arrays[1])
+        buffer[:] = 10
+        aae(views[1], np.ones(4) * 10)
+
+    def test_pool_arrays_offsets(self):
+        buffer, views, offsets = pp.pool_arrays(self.arrays)
+        assert offsets == [0, 6]
+
+
+class TestScatterParams:
     def setup(self):
         self.params = np.arange(200)
         self.initial = [np.zeros((4, 3)), np.zeros((6, 2))]
@@ -14,38 +34,30 @@ class TestMapParamsToDeltas:
 
         boo2 = np.ones((6, 2), dtype=bool)
         boo2[0, 0] = False
-        self.bools = [boo1, boo2]
-
-        self.slices = [slice(10, 21), slice(21, 32)]
 
-    def test_map_params_to_deltas(self):
+        self.buffer, self.views, offsets = pp.pool_arrays(self.initial)
+        self.buffer_positions = np.concatenate(
+            [np.flatnonzero(boo1), 12 + np.flatnonzero(boo2)])
+        self.params_positions = np.arange(10, 32)
 
+    def test_scatter_params(self):
         expected0 = np.array(
             [[10, 11, 12], [13, 14, 15], [0, 16, 17], [18, 19, 20]])
         expected1 = np.array(
             [[0, 21], [22, 23], [24, 25], [26, 27], [28, 29], [30, 31]])
 
-        pp._map_params_to_deltas(self.params, self.initial,
-                                 self.slices, self.bools)
+        pp._scatter_params(self.params, self.buffer, self.buffer_positions,
+                           self.params_positions)
 
-        aae(self.initial[0], expected0)
-        aae(self.initial[1], expected1)
+        aae(self.views[0], expected0)
+        aae(self.views[1], expected1)
 
-
-class TestMapParamsToPsi:
-    def setup(self):
-        self.params = np.arange(100)
-        self.slice = slice(10, 15)
-        self.initial = np.zeros(10)
-        self.boo = np.array([True, False] * 5)
-
-    def test_map_params_to_psi(self):
-        expected = np.array([10, 0, 11, 0, 12, 0, 13, 0, 14, 0])
-        pp._map_params_to_psi(self.params, self.initial, self.slice, self.boo)
-        aae(self.initial, expected)
+    def test_scatter_params_with_list(self):
+        self.params = list(self.params)
+        self.test_scatter_params()
 
 
-class TestMapParamsToH:
+class TestTransformHWithPsi:
     def setup(self):
         self.params = np.arange(100)
 
@@ -57,21 +69,11 @@ class TestMapParamsToH:
         self.boo[[1, 4], 1] = True
         self.boo[[2, 3, 4], 2] = True
 
-        self.slice = slice(10, 17)
         self.initial_copy = self.initial.copy()
+        # the entries from params are written before the transformation
+        self.initial[self.boo] = self.params[10: 17]
 
-    def test_map_params_to_H_without_psi_transformation(self):
-        expected = np.array([
-            [10, 0, 0],
-            [0, 11, 0],
-            [0, 3, 12],
-            [13, 0, 14],
-            [0, 15, 16]])
-        pp._map_params_to_H(params=self.params, initial=self.initial,
-                            params_slice=self.slice, boo=self.boo)
-        aae(self.initial, expected)
-
-    def test_map_params_to_H_with_psi_transformation(self):
+    def test_transform_H_with_psi(self):
         psi_boo = np.array([True, False, False, True, False])
         psi = np.array([1, 5, 8])
         arr1 = np.zeros((2, 1))
@@ -84,16 +86,15 @@ class TestMapParamsToH:
             [13, 65, 118],
             [0, 15, 16]])
 
-        pp._map_params_to_H(params=self.params, initial=self.initial,
-                            params_slice=self.slice, boo=self.boo,
-                            psi_bool_for_H=psi_boo, psi=psi, arr1=arr1,
-                            arr2=arr2, endog_position=0,
-                            initial_copy=self.initial_copy)
+        pp._transform_H_with_psi(
+            initial=self.initial, boo=self.boo, psi_bool_for_H=psi_boo,
+            psi=psi, arr1=arr1, arr2=arr2, endog_position=0,
+            initial_copy=self.initial_copy)
         aae(self.initial, expected)
 
-    def test_map_params_to_H_with_psi_transformation_unclean_initial(self):
-        self.initial[:] = 100
-        self.test_map_params_to_H_with_psi_transformation()
+    def test_transform_H_with_psi_unclean_initial(self):
+        self.initial[~self.boo] = 100
+        self.test_transform_H_with_psi()
 
 
 class TestMapParamsToRAndWZero:
@@ -102,16 +103,14 @@ class TestMapParamsToRAndWZero:
         self.slice = slice(15, 20)
         self.initial = np.zeros(5)
 
-    def test_map_params_to_r(self):
-        self.square_root_filters = False
-        pp._map_params_to_R(
-            self.params, self.initial, self.slice, self.square_root_filters)
+    def test_transform_r(self):
+        self.initial[:] = self.params[self.slice]
+        pp._transform_R(self.initial, square_root_filters=False)
         aae(self.initial, np.array([15, 16, 17, 18, 19]))
 
-    def test_map_params_to_r_square_root_filters(self):
-        self.square_root_filters = True
-        pp._map_params_to_R(
-            self.params, self.initial, self.slice, self.square_root_filters)
+    def test_transform_r_square_root_filters(self):
+        self.initial[:] = self.params[self.slice]
+        pp._transform_R(self.initial, square_root_filters=True)
         aae(self.initial, np.sqrt(np.array([15, 16, 17, 18, 19])))
 
     def test_map_params_to_w_zero(self):
@@ -119,7 +118,7 @@ class TestMapParamsToRAndWZero:
         aae(self.initial, np.array([15, 16, 17, 18, 19]))
 
 
-class TestMapParamsToQ:
+class TestReplaceQ:
     def setup(self):
         self.initial = np.zeros((2, 3, 3))
         self.boo = np.zeros_like(self.initial, dtype=bool)
@@ -132,15 +131,9 @@ class TestMapParamsToQ:
         self.params = np.arange(100)
         self.slice = slice(4, 8)
 
-    def test_map_params_to_q_without_replacements(self):
-        pp._map_params_to_Q(self.params, self.initial, self.slice, self.boo)
-        expected = np.array([[[4, 0, 0], [0, 5, 0], [0, 0, 6]],
-                             [[0, 0, 0], [0, 7, 0], [0, 0, 0]]])
-        aae(self.initial, expected)
-
-    def test_map_params_to_q_with_replacements(self):
-        pp._map_params_to_Q(self.params, self.initial, self.slice, self.boo,
-                            self.replacements)
+    def test_replace_q(self):
+        self.initial[self.boo] = self.params[self.slice]
+        pp._replace_Q(self.initial, self.replacements)
         expected = np.array([[[4, 0, 0], [0, 5, 0], [0, 0, 6]],
                              [[4, 0, 0], [0, 7, 0], [0, 0, 0]]])
         aae(self.initial, expected)
@@ -157,20 +150,20 @@ class TestMapParamsToXZero:
         self.filler = np.zeros((self.nemf, self.nfac))
         self.replacements = [[(1, 0), (0, 0)]]
 
-    def test_map_params_to_x_zero_with_replacement(self):
+    def test_x_zero_from_filler_with_replacement(self):
         exp = np.zeros((self.nind, self.nemf, self.nfac))
         exp[:, 0] = np.array([10, 11, 12])
         exp[:, 1] = np.array([23, 14, 15])
-        pp._map_params_to_X_zero(self.params, self.initial, self.filler,
-                                 self.slice, self.replacements)
+        self.filler[:] = self.params[self.slice].reshape(self.filler.shape)
+        pp._X_zero_from_filler(self.initial, self.filler, self.replacements)
         aae(self.initial, exp)
 
-    def test_map_params_to_x_zero_without_replacement(self):
+    def test_x_zero_from_filler_without_replacement(self):
         exp = np.zeros((self.nind, self.nemf, self.nfac))
         exp[:, 0] = np.array([10, 11, 12])
         exp[:, 1] = np.array([13, 14, 15])
-        pp._map_params_to_X_zero(self.params, self.initial, self.filler,
-                                 self.slice)
+        self.filler[:] = self.params[self.slice].reshape(self.filler.shape)
+        pp._X_zero_from_filler(self.initial, self.filler)
         aae(self.initial, exp)
 
     def test_transform_params_for_X_zero_no_replacements_short_to_long(self):
@@ -194,7 +187,7 @@ class TestMapParamsToXZero:
         aae(result, expected)
 
 
-class TestMapParamsToPZero:
+class TestPZeroFromFiller:
     def setup(self):
         self.nemf = 2
         self.nfac = 3
@@ -223,7 +216,7 @@ class TestMapParamsToPZero:
         self.fill_one = np.array([[10, 2, 1], [0, 13, 3], [0, 0, 15]])
         self.fill_two = np.array([[16, 2, 1], [0, 19, 4], [0, 0, 21]])
 
-    def test_map_params_to_p_zero_chol_to_chol_2_mat(self):
+    def test_p_zero_from_filler_chol_to_chol_2_mat(self):
         self.params_type = 'short'
         self.cholesky_of_P_zero = True
         self.square_root_filters = True
@@ -232,14 +225,14 @@ class TestMapParamsToPZero:
         exp[:, 0, 1:, 1:] = self.fill_one
         exp[:, 1, 1:, 1:] = self.fill_two
 
-        pp._map_params_to_P_zero(
-            self.params, self.params_type, self.sqrt_initial, self.slice_2mat,
-            self.filler_2mat, self.boo_2mat, self.cholesky_of_P_zero,
-            self.square_root_filters)
+        self.filler_2mat[self.boo_2mat] = self.params[self.slice_2mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.sqrt_initial, self.filler_2mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.sqrt_initial, exp)
 
-    def test_map_params_to_p_zero_chol_to_notchol_2_mat(self):
+    def test_p_zero_from_filler_chol_to_notchol_2_mat(self):
         self.params_type = 'short'
         self.cholesky_of_P_zero = True
         self.square_root_filters = False
@@ -248,14 +241,14 @@ class TestMapParamsToPZero:
         exp[:, 0] = np.dot(self.fill_one.T, self.fill_one)
         exp[:, 1] = np.dot(self.fill_two.T, self.fill_two)
 
-        pp._map_params_to_P_zero(self.params, self.params_type, self.initial,
-                                 self.slice_2mat, self.filler_2mat,
-                                 self.boo_2mat, self.cholesky_of_P_zero,
-                                 self.square_root_filters)
+        self.filler_2mat[self.boo_2mat] = self.params[self.slice_2mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.initial, self.filler_2mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.initial, exp)
 
-    def test_map_params_to_p_zero_not_chol_to_not_chol_2_mat(self):
+    def test_p_zero_from_filler_not_chol_to_not_chol_2_mat(self):
         self.params_type = 'long'
         self.cholesky_of_P_zero = False
         self.square_root_filters = False
@@ -266,14 +259,14 @@ class TestMapParamsToPZero:
         exp[:, 1] = self.fill_two + \
             (self.fill_two - np.diag(np.diagonal(self.fill_two))).T
 
-        pp._map_params_to_P_zero(self.params, self.params_type, self.initial,
-                                 self.slice_2mat, self.filler_2mat,
-                                 self.boo_2mat, self.cholesky_of_P_zero,
-                                 self.square_root_filters)
+        self.filler_2mat[self.boo_2mat] = self.params[self.slice_2mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.initial, self.filler_2mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.initial, exp)
 
-    def test_map_params_to_p_zero_notchol_to_chol_2_mat(self):
+    def test_p_zero_from_filler_notchol_to_chol_2_mat(self):
         self.params_type = 'long'
         self.cholesky_of_P_zero = False
         self.square_root_filters = True
@@ -287,14 +280,14 @@ class TestMapParamsToPZero:
             self.fill_two +
             (self.fill_two - np.diag(np.diagonal(self.fill_two))).T)
 
-        pp._map_params_to_P_zero(
-            self.params, self.params_type, self.sqrt_initial, self.slice_2mat,
-            self.filler_2mat, self.boo_2mat, self.cholesky_of_P_zero,
-            self.square_root_filters)
+        self.filler_2mat[self.boo_2mat] = self.params[self.slice_2mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.sqrt_initial, self.filler_2mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.sqrt_initial, exp)
 
-    def test_map_params_to_p_zero_chol_to_chol_1_mat_restricted(self):
+    def test_p_zero_from_filler_chol_to_chol_1_mat_restricted(self):
         self.params_type = 'short'
         self.cholesky_of_P_zero = True
         self.square_root_filters = True
@@ -302,14 +295,14 @@ class TestMapParamsToPZero:
         exp = np.zeros_like(self.sqrt_initial)
         exp[:, :, 1:, 1:] = self.fill_one
 
-        pp._map_params_to_P_zero(
-            self.params, self.params_type, self.sqrt_initial, self.slice_1mat,
-            self.filler_1mat, self.boo_1mat, self.cholesky_of_P_zero,
-            self.square_root_filters)
+        self.filler_1mat[self.boo_1mat] = self.params[self.slice_1mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.sqrt_initial, self.filler_1mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.sqrt_initial, exp)
 
-    def test_map_params_to_p_zero_chol_to_notchol_1_mat_restricted(self):
+    def test_p_zero_from_filler_chol_to_notchol_1_mat_restricted(self):
         self.params_type = 'short'
         self.cholesky_of_P_zero = True
         self.square_root_filters = False
@@ -317,14 +310,14 @@ class TestMapParamsToPZero:
         exp = np.zeros_like(self.initial)
         exp[:] = np.dot(self.fill_one.T, self.fill_one)
 
-        pp._map_params_to_P_zero(self.params, self.params_type, self.initial,
-                                 self.slice_1mat, self.filler_1mat,
-                                 self.boo_1mat, self.cholesky_of_P_zero,
-                                 self.square_root_filters)
+        self.filler_1mat[self.boo_1mat] = self.params[self.slice_1mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.initial, self.filler_1mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.initial, exp)
 
-    def test_map_params_to_p_zero_notchol_to_chol_1_mat_restricted(self):
+    def test_p_zero_from_filler_notchol_to_chol_1_mat_restricted(self):
         self.params_type = 'long'
         self.cholesky_of_P_zero = False
         self.square_root_filters = False
@@ -333,14 +326,14 @@ class TestMapParamsToPZero:
         exp[:] = self.fill_one + \
             (self.fill_one - np.diag(np.diagonal(self.fill_one))).T
 
-        pp._map_params_to_P_zero(self.params, self.params_type, self.initial,
-                                 self.slice_1mat, self.filler_1mat,
-                                 self.boo_1mat, self.cholesky_of_P_zero,
-                                 self.square_root_filters)
+        self.filler_1mat[self.boo_1mat] = self.params[self.slice_1mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.initial, self.filler_1mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.initial, exp)
 
-    def test_map_params_to_p_zero_not_chol_to_not_chol_1_mat_restricted(self):
+    def test_p_zero_from_filler_not_chol_to_not_chol_1_mat_restricted(self):
         self.params_type = 'long'
         self.cholesky_of_P_zero = False
         self.square_root_filters = True
@@ -350,13 +343,20 @@ class TestMapParamsToPZero:
             self.fill_one +
             (self.fill_one - np.diag(np.diagonal(self.fill_one))).T)
 
-        pp._map_params_to_P_zero(
-            self.params, self.params_type, self.sqrt_initial, self.slice_1mat,
-            self.filler_1mat, self.boo_1mat, self.cholesky_of_P_zero,
-            self.square_root_filters)
+        self.filler_1mat[self.boo_1mat] = self.params[self.slice_1mat]
+        pp._P_zero_from_filler(
+            self.params_type, self.sqrt_initial, self.filler_1mat,
+            self.cholesky_of_P_zero, self.square_root_filters)
 
         aae(self.sqrt_initial, exp)
 
+    def test_p_zero_from_filler_does_not_change_filler(self):
+        self.filler_2mat[self.boo_2mat] = self.params[self.slice_2mat]
+        expected = self.filler_2mat.copy()
+        pp._P_zero_from_filler(
+            'long', self.sqrt_initial, self.filler_2mat, False, True)
+        aae(self.filler_2mat, expected)
+
     def test_transform_params_for_p_zero_no_transform_short_to_long(self):
         params_for_P_zero = self.params[self.slice_2mat]
         result = pp.transform_params_for_P_zero(
@@ -451,6 +451,15 @@ class TestMapParamsToTransCoeffs:
         aae(self.initial_no_transform[0], exp1)
         aae(self.initial_no_transform[1], exp2)
 
+    def test_transform_trans_coeffs(self):
+        coeffs = self.initial_transform[1]
+        transformations = [
+            (fake_transform_func, slice(16, 20), self.included[1],
+             [coeffs[0], coeffs[1]])]
+        exp = np.array([[32, 34, 36, 38, 1], [32, 34, 36, 38, 1]])
+        pp._transform_trans_coeffs(self.params, transformations)
+        aae(coeffs, exp)
+
     @patch('skillmodels.estimation.parse_params._map_params_to_trans_coeffs')
     def test_transform_params_for_trans_coeffs_short_to_long(self, mock):
         mock.side_effect = fake_map_func
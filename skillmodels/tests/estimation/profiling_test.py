@@ -0,0 +1,60 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from skillmodels.estimation.profiling import LikelihoodProfiler
+import pickle
+
+
+class TestLikelihoodProfiler:
+    def setup(self):
+        self.profiler = LikelihoodProfiler()
+        self.profiler.times.update({
+            ('parse_params', None): 1.0, ('updates', 0): 2.0,
+            ('updates', 1): 3.0, ('transition_functions', 0): 4.0})
+        self.profiler.calls.update({
+            ('parse_params', None): 2, ('updates', 0): 2,
+            ('updates', 1): 2, ('transition_functions', 0): 2})
+        self.profiler.total_time = 10.0
+        self.profiler.nevaluations = 2
+
+    def test_report(self):
+        report = self.profiler.report()
+        assert_equal(list(report.index),
+                     ['parse_params', 'updates', 'transition_functions'])
+        aaae(report['time'].values, [1.0, 5.0, 4.0])
+        aaae(report['calls'].values, [2, 4, 2])
+        aaae(report['time_per_call'].values, [0.5, 1.25, 2.0])
+        aaae(report['share'].values, [0.1, 0.5, 0.4])
+
+    def test_report_by_period(self):
+        report = self.profiler.report(by_period=True)
+        assert_equal(list(report.index),
+                     [('updates', 0), ('updates', 1),
+                      ('transition_functions', 0)])
+        aaae(report['time'].values, [2.0, 3.0, 4.0])
+
+    def test_stop_returns_start_of_next_stage(self):
+        profiler = LikelihoodProfiler()
+        tic = profiler.stop('restore', 0.0)
+        assert profiler.stop('parse_params', tic) >= tic
+        assert_equal(profiler.calls[('restore', None)], 1)
+        assert_equal(profiler.calls[('parse_params', None)], 1)
+
+    def test_clear(self):
+        self.profiler.clear()
+        assert_equal(len(self.profiler.report()), 0)
+        assert_equal(self.profiler.nevaluations, 0)
+
+    def test_report_without_timings_has_report_columns(self):
+        profiler = LikelihoodProfiler()
+        for by_period in [False, True]:
+            report = profiler.report(by_period=by_period)
+            assert_equal(len(report), 0)
+            assert_equal(list(report.columns),
+                         ['time', 'calls', 'time_per_call', 'share'])
+
+    def test_pickle(self):
+        profiler = pickle.loads(pickle.dumps(self.profiler))
+        aaae(profiler.report()['time'].values, [1.0, 5.0, 4.0])
+        profiler.stop('restore', 0.0)
+        assert np.isfinite(profiler.times[('restore', None)])
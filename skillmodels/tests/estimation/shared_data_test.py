@@ -0,0 +1,71 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_equal as aae
+from skillmodels import SkillModel as smo
+from skillmodels.estimation.shared_data import SharedArray, share_array, \
+    load_shared
+from skillmodels.estimation.workspaces import WorkspacePool
+from skillmodels.estimation.evaluation_cache import EvaluationCache
+from unittest.mock import Mock
+import pickle
+import tempfile
+
+
+class TestShareArray:
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.arr = np.arange(6).reshape(2, 3)
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def test_share_array(self):
+        handle = share_array(self.arr, self.directory.name, 'arr')
+        aae(handle.load(), self.arr)
+
+    def test_shared_array_is_read_only(self):
+        handle = share_array(self.arr, self.directory.name, 'arr')
+        assert_equal(handle.load().flags.writeable, False)
+
+    def test_share_list_of_arrays(self):
+        handle = share_array(
+            [self.arr, self.arr + 1], self.directory.name, 'arr')
+        loaded = load_shared(handle)
+        assert_equal(len(loaded), 2)
+        aae(loaded[1], self.arr + 1)
+
+    def test_pickled_handle_does_not_contain_the_data(self):
+        handle = share_array(np.zeros(100000), self.directory.name, 'large')
+        assert len(pickle.dumps(handle)) < 1000
+
+
+class TestGetAndSetState:
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.y_data = np.ones((3, 4))
+        self.shared_arrays = {
+            'y_data': share_array(self.y_data, self.directory.name, 'y')}
+        self.workspace_pool = WorkspacePool(Mock())
+        self._build_workspace = Mock()
+        self.evaluation_cache_size = 32
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def test_getstate_replaces_shared_arrays_by_handles(self):
+        state = smo.__getstate__(self)
+        assert isinstance(state['y_data'], SharedArray)
+
+    def test_setstate_loads_shared_arrays(self):
+        state = smo.__getstate__(self)
+        smo.__setstate__(self, state)
+        aae(self.y_data, np.ones((3, 4)))
+        assert isinstance(self.y_data, np.memmap)
+
+    def test_workspace_pool_is_not_pickled(self):
+        state = smo.__getstate__(self)
+        assert 'workspace_pool' not in state
+        assert 'evaluation_cache' not in state
+        smo.__setstate__(self, state)
+        assert isinstance(self.workspace_pool, WorkspacePool)
+        assert isinstance(self.evaluation_cache, EvaluationCache)
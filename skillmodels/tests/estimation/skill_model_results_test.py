@@ -0,0 +1,52 @@
+from nose.tools import assert_equal
+from unittest.mock import Mock
+import numpy as np
+from numpy.testing import assert_array_equal as aae
+from skillmodels.estimation.skill_model_results import SkillModelResults
+
+
+class FakeMleFit:
+    def __init__(self, params, normalized_cov_params=None):
+        self.params = params
+        self.normalized_cov_params = normalized_cov_params
+
+
+class TestLazyStandardErrors:
+    def setup(self):
+        self.model = Mock()
+        self.model.estimator = 'chs'
+        self.model.nobs = 10
+        self.model.df_model = 2
+        self.model.df_resid = 8
+        self.model.nperiods = 2
+        self.cov = np.eye(2)
+        self.model.cov_matrix = Mock(return_value=self.cov)
+        self.params = np.array([1.0, 2.0])
+
+    def test_cov_is_not_calculated_at_construction(self):
+        SkillModelResults(self.model, FakeMleFit(self.params))
+        assert_equal(self.model.cov_matrix.call_count, 0)
+
+    def test_cov_is_calculated_once_on_first_access(self):
+        res = SkillModelResults(self.model, FakeMleFit(self.params))
+        aae(res.normalized_cov_params, self.cov)
+        aae(res.normalized_cov_params, self.cov)
+        assert_equal(self.model.cov_matrix.call_count, 1)
+
+    def test_cov_from_mlefit_is_used(self):
+        res = SkillModelResults(
+            self.model, FakeMleFit(self.params, 2 * self.cov))
+        aae(res.normalized_cov_params, 2 * self.cov)
+        assert_equal(self.model.cov_matrix.call_count, 0)
+
+    def test_calculate_standard_errors(self):
+        res = SkillModelResults(self.model, FakeMleFit(self.params))
+        aae(res.calculate_standard_errors(), self.cov)
+        assert_equal(self.model.cov_matrix.call_count, 1)
+
+    def test_calculate_standard_errors_in_background(self):
+        res = SkillModelResults(self.model, FakeMleFit(self.params))
+        future = res.calculate_standard_errors(background=True)
+        aae(future.result(), self.cov)
+        aae(res.normalized_cov_params, self.cov)
+        assert_equal(self.model.cov_matrix.call_count, 1)
@@ -1,11 +1,20 @@
 from nose.tools import assert_equal, assert_raises, assert_almost_equal
 from unittest.mock import Mock, call, patch
 from skillmodels import SkillModel as smo
+from skillmodels.estimation.workspaces import WorkspacePool
+from skillmodels.estimation.evaluation_cache import EvaluationCache
+from scipy.optimize import OptimizeResult
 import numpy as np
 from pandas import DataFrame
 from numpy.testing import assert_array_equal as aae
 from numpy.testing import assert_array_almost_equal as aaae
 import json
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import time
+import skillmodels.model_functions.transition_functions as tf
 import pandas as pd
 from pandas.util.testing import assert_series_equal
 from pandas.util.testing import assert_frame_equal
@@ -384,6 +393,11 @@ class TestXZeroRelatedMethods:
         aae(res1, np.zeros((100, 3, 4)))
         aae(res2, np.zeros((300, 4)))
 
+    def test_initial_X_zero_with_other_number_of_individuals(self):
+        res1, res2 = smo._initial_X_zero(self, nind=20)
+        aae(res1, np.zeros((20, 3, 4)))
+        aae(res2, np.zeros((60, 4)))
+
     def test_that_initial_X_zeros_are_views_on_same_memory(self):
         res1, res2 = smo._initial_X_zero(self)
         res1[:] = 1
@@ -642,6 +656,33 @@ class TestTransCoeffsRelatedMethods:
                      expected)
 
 
+class TestTransCoeffsTransformations:
+    def setup(self):
+        self.stages = [0, 1, 2]
+        self.included_factors = [['f1'], ['f1', 'f2']]
+        self.initial_quantities = {
+            'trans_coeffs': [np.zeros((3, 1)), np.zeros((3, 3))]}
+        self.slices = {'trans_coeffs': [
+            [slice(0, 1), slice(1, 2), slice(2, 3)],
+            [slice(3, 5), slice(3, 5), slice(5, 7)]]}
+        self.transform_funcs = [None, 'transform_coeffs_log_ces']
+
+    def test_trans_coeffs_transformations(self):
+        calc = smo._trans_coeffs_transformations(
+            self, self.initial_quantities, self.slices, self.transform_funcs)
+        coeffs = self.initial_quantities['trans_coeffs'][1]
+        assert_equal(len(calc), 2)
+        assert_equal(calc[0][0], tf.transform_coeffs_log_ces)
+        assert_equal(calc[0][1], slice(3, 5))
+        assert_equal(calc[0][2], ['f1', 'f2'])
+        assert_equal(len(calc[0][3]), 2)
+        assert_equal(calc[1][1], slice(5, 7))
+        assert_equal(len(calc[1][3]), 1)
+        # the rows have to be views on trans_coeffs
+        calc[1][3][0][:] = 1
+        aae(coeffs[2], np.ones(3))
+
+
 class TestTransformTransitionParamsFuncs:
     def setup(self):
         self.factors = ['f1', 'f2']
@@ -664,6 +705,21 @@ class TestParamsSlices:
         assert_equal(smo.params_slices(self, params_type='short'),
                      {'a': slice(0, 3), 'b': slice(3, 5)})
 
+    def test_params_slices_is_thread_safe(self):
+        def slice_func(length):
+            def func(params_type):
+                time.sleep(0.001)
+                return smo._general_params_slice(self, length)
+            return func
+
+        self._params_slice_for_a = slice_func(3)
+        self._params_slice_for_b = slice_func(2)
+        with ThreadPoolExecutor(4) as ex:
+            results = list(ex.map(
+                lambda i: smo.params_slices(self, 'short'), range(8)))
+        for res in results:
+            assert_equal(res, {'a': slice(0, 3), 'b': slice(3, 5)})
+
 
 class TestLenParams:
     def setup(self):
@@ -710,6 +766,47 @@ class TestParamNames:
             AssertionError, smo.param_names, self, params_type='short')
 
 
+class TestParamsFirstPeriods:
+    def setup(self):
+        self.params_slices = Mock(return_value={
+            'deltas': [slice(0, 2), slice(2, 3), slice(3, 5)],
+            'H': slice(5, 7),
+            'R': slice(7, 12),
+            'Q': slice(12, 14),
+            'trans_coeffs': [[slice(14, 16), slice(14, 16)],
+                             [slice(16, 17), slice(17, 18)]],
+            'P_zero': slice(18, 21)})
+        self.len_params = Mock(return_value=21)
+        index = pd.MultiIndex.from_tuples(
+            [(0, 'm1'), (0, 'm2'), (1, 'm3'), (2, 'm4'), (2, 'm5')],
+            names=['period', 'name'])
+        self.update_info = DataFrame(index=index)
+        self.stagemap = np.array([0, 1, 1])
+        self.stages = [0, 1]
+        self.nfac = 2
+        H_bool = np.zeros((5, 2), dtype=bool)
+        H_bool[1, 0] = True
+        H_bool[3, 1] = True
+        self._H_bool = Mock(return_value=H_bool)
+        Q_bool = np.zeros((2, 2, 2), dtype=bool)
+        Q_bool[:, 0, 0] = True
+        self._Q_bool = Mock(return_value=Q_bool)
+        self.anchor_in_predict = False
+
+    def test_params_first_periods(self):
+        expected = np.array(
+            [0, 0, 1, 2, 2] + [0, 2] + [0, 0, 1, 2, 2] + [0, 1] +
+            [0, 0, 0, 1] + [0, 0, 0])
+        aae(smo._params_first_periods(self, 'short'), expected)
+
+    def test_params_first_periods_with_anchoring_in_predict(self):
+        self.anchor_in_predict = True
+        expected = np.array(
+            [0, 0, 1, 0, 0] + [0, 2] + [0, 0, 1, 2, 2] + [0, 1] +
+            [0, 0, 0, 1] + [0, 0, 0])
+        aae(smo._params_first_periods(self, 'short'), expected)
+
+
 class TestTransformParams:
     def setup(self):
         self.params_quants = [
@@ -784,6 +881,132 @@ class TestGenerateStartParams:
         aae(smo._generate_naive_start_params(self), expected)
 
 
+class TestBHHHCovMatrix:
+    def setup(self):
+        np.random.seed(5471)
+        self.res = OptimizeResult(
+            x=np.array([1.0, 2.0]), score_obs=np.random.normal(size=(30, 2)))
+        self.expandparams = lambda x: x
+        self.len_params = Mock(return_value=2)
+        self.evaluation_cache = EvaluationCache(0)
+        self._op_of_gradient_cov_matrix = Mock()
+        self.model_name = 'bhhh'
+        self.dataset_name = 'data'
+
+    def test_stored_matrix_is_used_without_evaluation_cache(self):
+        smo._store_bhhh_cov_matrix(self, self.res)
+        calculated = smo.op_of_gradient_cov_matrix(self, self.res.x)
+        scores = self.res.score_obs
+        aaae(calculated, np.linalg.inv(np.dot(scores.T, scores)))
+        self._op_of_gradient_cov_matrix.assert_not_called()
+
+    def test_matrix_is_not_stored_if_long_params_are_longer(self):
+        self.len_params = Mock(side_effect=lambda params_type: {
+            'short': 2, 'long': 3}[params_type])
+        smo._store_bhhh_cov_matrix(self, self.res)
+        assert not hasattr(self, 'stored_bhhh_cov_matrix')
+
+
+class TestMultistart:
+    def setup(self):
+        self.multistart_nstarts = 8
+        self.multistart_perturbation = 0.1
+        self.multistart_keep_share = 0.5
+        self.start = np.array([1.0, -2.0, 0.0])
+        self.bounds = [(None, None), (-2.05, None), (0.0, 0.01)]
+
+        @contextmanager
+        def fake_context():
+            yield self
+
+        @contextmanager
+        def fake_executor():
+            with ThreadPoolExecutor(2) as ex:
+                yield ex
+
+        self._shared_data_model = fake_context
+        self._executor = fake_executor
+        self._perturbed_start_params = partial(
+            smo._perturbed_start_params, self)
+
+        def fake_round(start_params, bounds, weights=None):
+            return start_params, - np.sum(start_params ** 2)
+
+        self._multistart_round = Mock(side_effect=fake_round)
+
+    def test_perturbed_start_params(self):
+        starts = smo._perturbed_start_params(self, self.start, self.bounds)
+        assert_equal(len(starts), 8)
+        aae(starts[0], self.start)
+        for start in starts[1:]:
+            assert start[1] >= -2.05
+            assert 0 <= start[2] <= 0.01
+
+    def test_multistart_culls_to_best_candidate(self):
+        params, history = smo._multistart_params(
+            self, self.start, self.bounds)
+        assert_equal([len(values) for values in history], [8, 4, 2])
+        assert_equal(self._multistart_round.call_count, 14)
+        assert_almost_equal(- np.sum(params ** 2), max(history[-1]))
+        assert_almost_equal(max(history[-1]), max(history[0]))
+
+    def test_multistart_drops_a_candidate_in_each_round(self):
+        self.multistart_keep_share = 0.9
+        self.multistart_nstarts = 3
+        params, history = smo._multistart_params(
+            self, self.start, self.bounds)
+        assert_equal([len(values) for values in history], [3, 2])
+
+
+class TestProgressiveSample:
+    def setup(self):
+        self.nobs = 10
+        self.model_name = 'model'
+        self.y_data = np.arange(30.0).reshape(3, 10)
+        self.c_data = [np.arange(20.0).reshape(10, 2)]
+        self.deduplicate_individuals = True
+        self.evaluation_cache_size = 32
+        self.progressive_sample_shares = [0.2, 0.5]
+        self._build_workspace = Mock()
+        self.sub_models = []
+
+        def fake_subsample_model(positions):
+            sub_mod = Mock()
+            sub_mod.positions = positions
+            sub_mod.estimate_params_chs.return_value = (
+                np.ones(2) * len(positions),
+                {'log_lh_value': -1.0, 'nfev': 3})
+            self.sub_models.append(sub_mod)
+            return sub_mod
+
+        self._subsample_model = fake_subsample_model
+
+    def test_subsample_model(self):
+        sub_mod = smo._subsample_model(self, np.array([1, 3, 4]))
+        assert_equal(sub_mod.nobs, 3)
+        aae(sub_mod.y_data, self.y_data[:, [1, 3, 4]])
+        aae(sub_mod.c_data[0], self.c_data[0][[1, 3, 4]])
+        aae(sub_mod.frequency_weights, np.ones(3))
+        assert_equal(sub_mod.progressive_sample_shares, None)
+        assert sub_mod.workspace_pool is not getattr(
+            self, 'workspace_pool', None)
+        assert_equal(self.nobs, 10)
+
+    def test_progressive_start_params(self):
+        params, history = smo._progressive_start_params(self, np.zeros(2))
+        aae(params, np.ones(2) * 5)
+        assert_equal([h['nobs'] for h in history], [2, 5])
+        small, large = self.sub_models
+        assert set(small.positions).issubset(set(large.positions))
+        aae(large.estimate_params_chs.call_args[0][0], np.ones(2) * 2)
+
+    def test_multistart_only_on_smallest_subsample(self):
+        smo._progressive_start_params(self, np.zeros(2))
+        flags = [mod.estimate_params_chs.call_args[1]['multistart']
+                 for mod in self.sub_models]
+        assert_equal(flags, [True, False])
+
+
 class TestSigmaWeightsAndScalingFactor:
     def setup(self):
         self.nemf = 2
@@ -1004,17 +1227,26 @@ class TestBSMethods:
         calc_samples = smo._generate_bs_samples(self)
         assert_equal(calc_samples, expected_samples)
 
-    def test_select_bootstrap_data(self):
-        expected_data = pd.DataFrame(
-            data=np.array([
-                [0.0, 1.0, 2.0, 0.0, 1.0, 2.0, 0.0, 1.0, 2.0],
-                [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 3.0, 4.0, 5.0]]).T,
-            columns=['period', 'arange'])
-        expected_data['id'] = [
-            'id_0', 'id_0', 'id_0', 'id_1', 'id_1', 'id_1',
-            'id_1', 'id_1', 'id_1']
-        calc_data = smo._select_bootstrap_data(self, 0)
-        assert_frame_equal(calc_data, expected_data)
+    def test_bootstrap_positions(self):
+        self.obs_to_keep = np.array([True, True, True])
+        aae(smo._bootstrap_positions(self, 2), np.array([1, 0, 0]))
+
+    def test_bootstrap_positions_skips_dropped_individuals(self):
+        self.obs_to_keep = np.array([False, True, True])
+        aae(smo._bootstrap_positions(self, 0), np.array([0, 0]))
+
+    def test_bootstrap_weights(self):
+        self.nobs = 4
+        self._bootstrap_positions = Mock(return_value=np.array([1, 2, 2]))
+        aae(smo._bootstrap_weights(self, 0), np.array([0.0, 1.0, 2.0, 0.0]))
+
+    def test_bootstrap_model_chs_shares_data(self):
+        self.estimator = 'chs'
+        self.save_path = None
+        self.y_data = np.arange(6).reshape(2, 3)
+        bs_mod = smo._bootstrap_model(self, 0)
+        assert_equal(bs_mod.model_name, 'test_check_bs_sample_0')
+        assert bs_mod.y_data is self.y_data
 
     # define some mock functions. Mock objects don't work because they
     # cannot be pickled, which is required for Multiprocessing to work.
@@ -1027,6 +1259,26 @@ class TestBSMethods:
     def len_params(self, params_type):
         return 3
 
+    @contextmanager
+    def _shared_data_model(self, bootstrap=False):
+        yield self
+
+    estimator = 'chs'
+    executor = 'process'
+    max_workers = None
+    threads_per_worker = 1
+    save_bootstrap_replications = False
+    bootstrap_mc_tolerance = None
+    bootstrap_method = 'resample'
+    _bootstrap_store = smo._bootstrap_store
+    _indexed_bs_fit = smo._indexed_bs_fit
+    _bootstrap_waves = smo._bootstrap_waves
+    _bootstrap_precision_reached = smo._bootstrap_precision_reached
+    _run_bootstrap_waves = smo._run_bootstrap_waves
+    _executor = smo._executor
+    _telemetry_phase = smo._telemetry_phase
+    telemetry = None
+
     def test_all_bootstrap_params(self):
         calc_params = smo.all_bootstrap_params(self, params=np.ones(3))
         expected_params = pd.DataFrame(
@@ -1035,6 +1287,111 @@ class TestBSMethods:
             columns=['p1', 'p2', 'p3'])
         assert_frame_equal(calc_params, expected_params)
 
+    def test_all_bootstrap_params_fits_wa_waves_at_once(self):
+        self.estimator = 'wa'
+        self._wa_bootstrap_params = Mock(side_effect=lambda reps: [
+            (rep, rep * np.ones(3)) for rep in reps])
+        calc_params = smo.all_bootstrap_params(self, params=np.ones(3))
+        self._wa_bootstrap_params.assert_called_once_with([0, 1, 2])
+        aae(calc_params.values, np.arange(3).repeat(3).reshape(3, 3))
+
+    def test_bootstrap_positions_wa(self):
+        self.estimator = 'wa'
+        self.y_data = [pd.DataFrame(index=['id_1', 'id_0', 'id_2'])]
+        aae(smo._bootstrap_positions(self, 2), np.array([0, 1, 1]))
+
+    def test_bootstrap_waves_without_tolerance(self):
+        assert_equal(smo._bootstrap_waves(self, [0, 2, 3]), [[0, 2, 3]])
+
+    def test_bootstrap_waves_with_tolerance(self):
+        self.bootstrap_mc_tolerance = 0.1
+        self.bootstrap_wave_size = 2
+        assert_equal(smo._bootstrap_waves(self, [0, 2, 3]), [[0, 2], [3]])
+
+    def test_bootstrap_mc_error_of_normal_distribution(self):
+        np.random.seed(5471)
+        bs_params = np.random.normal(size=(20000, 2)) * [1, 10]
+        bs_params[:, 1] += 3
+        calculated = smo._bootstrap_mc_error(self, bs_params)
+        # the quantile error dominates. For the 97.5 percent quantile of the
+        # standard normal it is sqrt(p * (1 - p) / n) / density(quantile)
+        expected = np.sqrt(0.025 * 0.975 / 20000) / 0.05844
+        assert_almost_equal(calculated, expected, places=2)
+
+    def test_bootstrap_mc_error_ignores_fixed_params(self):
+        bs_params = np.zeros((100, 2))
+        bs_params[:, 0] = np.arange(100)
+        assert np.isfinite(smo._bootstrap_mc_error(self, bs_params))
+
+    def test_bootstrap_precision_reached(self):
+        self.bootstrap_mc_tolerance = 0.1
+        self.bootstrap_wave_size = 10
+        self._bootstrap_mc_error = Mock(return_value=0.05)
+        bs_params = np.ones((12, 2))
+        bs_params[:3, 0] = np.nan
+        assert_equal(smo._bootstrap_precision_reached(self, bs_params), False)
+        bs_params[:2] = 1.0
+        assert_equal(smo._bootstrap_precision_reached(self, bs_params), True)
+
+    def test_bootstrap_store_is_reused_for_same_params(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.save_path = directory
+            self.save_bootstrap_replications = True
+            bs_params, completed = smo._bootstrap_store(self, np.ones(2))
+            bs_params[1] = [3.0, 4.0]
+            completed[1] = True
+            del bs_params, completed
+            bs_params, completed = smo._bootstrap_store(self, np.ones(2))
+            aae(completed, np.array([False, True, False]))
+            aae(bs_params[1], np.array([3.0, 4.0]))
+
+    def test_bootstrap_store_is_reset_for_other_params(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.save_path = directory
+            self.save_bootstrap_replications = True
+            bs_params, completed = smo._bootstrap_store(self, np.ones(2))
+            completed[1] = True
+            del bs_params, completed
+            bs_params, completed = smo._bootstrap_store(self, np.zeros(2))
+            aae(completed, np.zeros(3, dtype=bool))
+            assert np.isnan(bs_params).all()
+
+
+class TestMultiplierBootstrap:
+    def setup(self):
+        np.random.seed(9471)
+        self.params = np.array([1.0, 2.0])
+        self.scores = np.random.normal(size=(50, 2))
+        self.hess = np.array([[-60.0, 5.0], [5.0, -40.0]])
+        self.score_obs = Mock(return_value=self.scores)
+        self.hessian = Mock(return_value=self.hess)
+        self.bootstrap_nreps = 20000
+        self.telemetry = None
+        self._telemetry_phase = partial(smo._telemetry_phase, self)
+
+    def test_multiplier_bootstrap_params_mean(self):
+        draws = smo._multiplier_bootstrap_params(self, self.params)
+        aaae(draws.mean(axis=0), self.params, decimal=2)
+
+    def test_multiplier_bootstrap_params_cov(self):
+        draws = smo._multiplier_bootstrap_params(self, self.params)
+        hess_inv = np.linalg.inv(self.hess)
+        expected_cov = hess_inv.dot(self.scores.T.dot(self.scores)).dot(
+            hess_inv)
+        aaae(np.cov(draws, rowvar=False), expected_cov, decimal=3)
+
+    def test_all_bootstrap_params_uses_multiplier_draws(self):
+        self.bootstrap_method = 'multiplier'
+        self.bootstrap_nreps = 3
+        self.len_params = Mock(return_value=2)
+        self.param_names = Mock(return_value=['p1', 'p2'])
+        self.model_name = 'multiplier'
+        self.dataset_name = 'data'
+        self._multiplier_bootstrap_params = Mock(return_value=np.ones((3, 2)))
+        calculated = smo.all_bootstrap_params(self, self.params)
+        aae(calculated.values, np.ones((3, 2)))
+        assert_equal(list(calculated.index), ['rep_0', 'rep_1', 'rep_2'])
+
 
 class TestBootstrapParamsToConfInt:
     def setup(self):
@@ -1261,6 +1618,9 @@ class TestPredictFinalFactors:
         self.factors = ['f1', 'f2']
         self.me_params = None
         self.stagemap = [0, 1, 1]
+        self.workspace_pool = WorkspacePool(
+            partial(smo._build_workspace, self))
+        self.workspace = partial(smo.workspace, self)
 
     def test_predict_final_factors_raises_with_endog(self):
         self.endog_correction = True
@@ -1306,6 +1666,15 @@ class TestPredictFinalFactors:
         calc2 = smo._predict_final_factors(self, self.change)
         aaae(calc1, calc2)
 
+    @patch('skillmodels.estimation.skill_model.parse_params')
+    @patch('skillmodels.estimation.skill_model.transform_sigma_points')
+    def test_predict_ff_reuses_arguments(self, mock_tsp, mock_pp):
+        mock_tsp.side_effect = fake_tsp
+        self.likelihood_arguments_dict = Mock(return_value=self.lh_args)
+        smo._predict_final_factors(self, self.change)
+        smo._predict_final_factors(self, self.change)
+        assert_equal(self.likelihood_arguments_dict.call_count, 1)
+
 
 def select_first(arr):
     return arr[:, 0]
@@ -0,0 +1,29 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from skillmodels.estimation.svrg import svrg
+
+
+class TestSVRG:
+    def setup(self):
+        np.random.seed(5471)
+        self.data = np.random.normal(loc=[1, -2], size=(1000, 2))
+        self.batches = np.array_split(np.arange(1000), 10)
+        self.shares = np.array([len(b) for b in self.batches]) / 1000
+
+    def batch_gradient(self, b, params):
+        # gradient of the average of - 0.5 * (data - params) ** 2
+        return (self.data[self.batches[b]] - params).mean(axis=0)
+
+    def test_svrg_converges_to_mean(self):
+        x, norms = svrg(self.batch_gradient, np.zeros(2), self.shares,
+                        epochs=20, learning_rate=0.2)
+        aaae(x, self.data.mean(axis=0))
+        assert_equal(len(norms), 20)
+        assert norms[-1] < norms[0]
+
+    def test_svrg_respects_bounds(self):
+        x, norms = svrg(self.batch_gradient, np.zeros(2), self.shares,
+                        bounds=[(None, 0.5), (None, None)], epochs=20,
+                        learning_rate=0.2)
+        aaae(x[0], 0.5)
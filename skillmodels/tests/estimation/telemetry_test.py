@@ -0,0 +1,119 @@
+from nose.tools import assert_equal
+import numpy as np
+from numpy.testing import assert_array_almost_equal as aaae
+from scipy.optimize import minimize
+from skillmodels.estimation.telemetry import EstimationTelemetry, \
+    CSVSink, MetricsFileSink, finite_difference_gradient
+import csv
+import os
+import tempfile
+import time
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+        self.closed = False
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.closed = True
+
+
+def negative_loglike(x):
+    return (x[0] - 1) ** 2 + 2 * (x[1] + 1) ** 2
+
+
+class TestEstimationTelemetry:
+    def setup(self):
+        self.sink = ListSink()
+        self.telemetry = EstimationTelemetry(
+            [self.sink], labels={'job': 'test'})
+
+    def test_iterations_of_scipy_optimizer(self):
+        objective = self.telemetry.objective(negative_loglike, negative=True)
+        res = minimize(objective, np.array([3.0, 3.0]), method='L-BFGS-B',
+                       callback=self.telemetry.callback)
+        records = self.sink.records
+        assert_equal(len(records), res.nit)
+        assert_equal(records[-1]['iteration'], res.nit)
+        assert_equal(records[-1]['nfev'], res.nfev)
+        assert_equal(records[-1]['job'], 'test')
+        aaae(records[-1]['log_lh_value'], -res.fun)
+        assert records[-1]['gradient_norm'] < 1e-3
+        assert records[0]['gradient_norm'] > 1
+        assert records[0]['evaluations_per_second'] > 0
+
+    def test_iteration_end_with_gradient(self):
+        self.telemetry.iteration_end(np.zeros(2), -1.0, np.array([3.0, 4.0]))
+        record = self.sink.records[0]
+        assert_equal(record['event'], 'iteration')
+        assert_equal(record['gradient_norm'], 5.0)
+        assert_equal(record['log_lh_value'], -1.0)
+
+    def test_nested_phases_are_not_double_counted(self):
+        with self.telemetry.phase('standard_errors'):
+            time.sleep(0.02)
+            with self.telemetry.phase('bootstrap'):
+                time.sleep(0.1)
+        times = self.telemetry.phase_times
+        assert times['bootstrap'] >= 0.1
+        assert 0.02 <= times['standard_errors'] < 0.1
+        assert_equal([r['phase'] for r in self.sink.records],
+                     ['bootstrap', 'standard_errors'])
+        assert_equal(self.sink.records[-1]['event'], 'phase_end')
+
+    def test_close_closes_sinks(self):
+        with self.telemetry:
+            pass
+        assert self.sink.closed
+
+
+def test_finite_difference_gradient():
+    params = np.array([1.0, 2.0])
+    evaluations = [(np.array([1.1, 2.0]), 1.2),
+                   (np.array([1.0, 1.9]), 0.7),
+                   (np.array([1.1, 2.1]), 5.0)]
+    aaae(finite_difference_gradient(params, 1.0, evaluations), [2.0, 3.0])
+
+
+def test_finite_difference_gradient_with_missing_entries():
+    gradient = finite_difference_gradient(np.zeros(2), 1.0, [])
+    assert np.isnan(gradient).all()
+
+
+class TestSinks:
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.record = {'model': 'm', 'dataset': 'd', 'event': 'iteration',
+                       'iteration': 3, 'log_lh_value': -10.5,
+                       'gradient_norm': None}
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def test_csv_sink_appends_rows(self):
+        path = os.path.join(self.directory.name, 'telemetry.csv')
+        for _ in range(2):
+            sink = CSVSink(path)
+            sink.emit(self.record)
+            sink.close()
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        assert_equal(len(rows), 2)
+        assert_equal(rows[0]['model'], 'm')
+        assert_equal(rows[1]['iteration'], '3')
+
+    def test_metrics_file_sink(self):
+        path = os.path.join(self.directory.name, 'telemetry.prom')
+        sink = MetricsFileSink(path)
+        sink.emit(self.record)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert 'skillmodels_iteration{dataset="d",model="m"} 3.0' in lines
+        assert 'skillmodels_log_lh_value{dataset="d",model="m"} -10.5' in \
+            lines
+        assert not any(line.startswith('skillmodels_gradient_norm')
+                       for line in lines)
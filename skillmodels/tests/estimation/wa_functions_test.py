@@ -1,9 +1,9 @@
 from skillmodels.estimation import wa_functions as wf
-# from numpy.testing import assert_array_equal as aae
+from numpy.testing import assert_array_equal as aae
 from numpy.testing import assert_array_almost_equal as aaae
 import numpy as np
 import pandas as pd
-from nose.tools import assert_almost_equal, assert_equal
+from nose.tools import assert_almost_equal, assert_equal, assert_raises
 from pandas.util.testing import assert_series_equal, assert_frame_equal
 from statsmodels.sandbox.regression.gmm import LinearIVGMM
 from unittest.mock import patch
@@ -266,6 +266,80 @@ class TestIVGMMWeights:
         aaae(calculated_w, expected_w)
 
 
+class TestWeightedIVReg:
+    def setup(self):
+        np.random.seed(4872)
+        self.z = np.ones((50, 4))
+        self.z[:, 1:] = np.random.normal(size=(50, 3))
+        self.x = self.z[:, :3] + np.random.normal(scale=0.1, size=(50, 3))
+        self.y = self.x.dot([1, 2, 3]) + np.random.normal(size=50)
+        self.weights = np.random.randint(0, 3, size=(5, 50)).astype(float)
+
+    def test_weighted_iv_reg_equals_iv_reg_with_repeated_observations(self):
+        calculated = wf.weighted_iv_reg(
+            self.y, self.x, self.z, self.weights)
+        for w, beta in zip(self.weights.astype(int), calculated):
+            expected = wf.iv_reg(
+                self.y.repeat(w), self.x.repeat(w, axis=0),
+                self.z.repeat(w, axis=0))
+            aaae(beta, expected)
+
+
+class TestWeightedMoments:
+    def setup(self):
+        np.random.seed(9342)
+        self.data = np.random.normal(size=(40, 3)) + [1, 5, 10]
+        self.data[[0, 5, 7], 1] = np.nan
+        self.data[[5, 9], 2] = np.nan
+        self.weights = np.random.randint(0, 3, size=(4, 40)).astype(float)
+
+    def test_weighted_means_and_covs_with_repeated_observations(self):
+        means, covs = wf.weighted_means_and_covs(self.data, self.weights)
+        for w, mean, cov in zip(self.weights.astype(int), means, covs):
+            df = pd.DataFrame(self.data.repeat(w, axis=0))
+            aaae(mean, df.mean().values)
+            aaae(cov, df.cov().values)
+
+    def test_weighted_covs_skips_missings(self):
+        arr1 = np.random.normal(size=(4, 40))
+        calculated = wf.weighted_covs(arr1, self.data[:, 1], self.weights)
+        for w, a, cov in zip(self.weights.astype(int), arr1, calculated):
+            expected = pd.Series(a.repeat(w)).cov(
+                pd.Series(self.data[:, 1].repeat(w)))
+            assert_almost_equal(cov, expected)
+
+
+class TestAffineTransformationOfIVCoeffs:
+    def setup(self):
+        self.variables = ['a_resid', 'b_resid']
+        self.formula = 'a_resid + b_resid + a_resid:b_resid - 1 + constant'
+
+    def test_monomial_exponents(self):
+        calculated = wf.monomial_exponents(self.formula, self.variables)
+        expected = np.array([[1, 0], [0, 1], [1, 1], [0, 0]])
+        aae(calculated, expected)
+
+    def test_monomial_exponents_rejects_formula_without_lower_terms(self):
+        assert_raises(
+            AssertionError, wf.monomial_exponents,
+            'a_resid:b_resid - 1 + constant', self.variables)
+
+    def test_coeffs_after_affine_transformation(self):
+        exponents = np.array([[1, 0], [0, 1], [1, 1], [0, 0]])
+        coeffs = np.array([[1.0, 2.0, 3.0, 4.0], [0.5, -1.0, 2.0, 0.0]])
+        scale = np.array([[2.0, 3.0], [0.5, 1.5]])
+        shift = np.array([[1.0, -1.0], [0.2, 0.0]])
+        new_coeffs = wf.coeffs_after_affine_transformation(
+            coeffs, exponents, scale, shift)
+
+        x = np.random.normal(size=(10, 2))
+        for c, new_c, sc, sh in zip(coeffs, new_coeffs, scale, shift):
+            y = sc * x + sh
+            original = np.prod(y.reshape(10, 1, 2) ** exponents, axis=2)
+            transformed = np.prod(x.reshape(10, 1, 2) ** exponents, axis=2)
+            aaae(original.dot(c), transformed.dot(new_c))
+
+
 class TestLargeDFForIVEquations:
     def setup(self):
         self.dep = pd.DataFrame(
@@ -0,0 +1,71 @@
+from nose.tools import assert_equal
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
+from skillmodels.estimation.workspaces import WorkspacePool
+import threading
+import time
+
+
+class TestWorkspacePool:
+    def setup(self):
+        self.build = Mock(side_effect=lambda key: {'key': key})
+        self.pool = WorkspacePool(self.build)
+
+    def test_acquire_builds_new_workspace(self):
+        workspace = self.pool.acquire(('state', 'short'))
+        assert_equal(workspace, {'key': ('state', 'short')})
+        self.build.assert_called_once_with(('state', 'short'))
+
+    def test_released_workspace_is_reused(self):
+        with self.pool.workspace('a') as first:
+            pass
+        with self.pool.workspace('a') as second:
+            pass
+        assert first is second
+        assert_equal(self.build.call_count, 1)
+
+    def test_workspaces_are_not_shared_while_acquired(self):
+        with self.pool.workspace('a') as first:
+            with self.pool.workspace('a') as second:
+                assert first is not second
+        assert_equal(self.pool.nidle('a'), 2)
+
+    def test_different_keys_get_different_workspaces(self):
+        with self.pool.workspace('a'):
+            pass
+        with self.pool.workspace('b') as workspace:
+            assert_equal(workspace['key'], 'b')
+
+    def test_workspace_is_released_after_exception(self):
+        try:
+            with self.pool.workspace('a'):
+                raise ValueError
+        except ValueError:
+            pass
+        assert_equal(self.pool.nidle('a'), 1)
+
+    def test_clear(self):
+        with self.pool.workspace('a'):
+            pass
+        self.pool.clear()
+        assert_equal(self.pool.nidle('a'), 0)
+
+    def test_concurrent_users_get_distinct_workspaces(self):
+        in_use = set()
+        lock = threading.Lock()
+        errors = []
+
+        def use(i):
+            with self.pool.workspace('a') as workspace:
+                with lock:
+                    if id(workspace) in in_use:
+                        errors.append(i)
+                    in_use.add(id(workspace))
+                time.sleep(0.001)
+                with lock:
+                    in_use.remove(id(workspace))
+
+        with ThreadPoolExecutor(4) as ex:
+            list(ex.map(use, range(40)))
+        assert_equal(errors, [])
+        assert self.build.call_count <= 4
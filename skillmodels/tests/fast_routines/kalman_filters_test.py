@@ -40,6 +40,7 @@ class TestLinearUpdate:
         self.c = np.ones((nind, 2))
 
         self.delta = np.ones(2) / 2
+        self.y_net = self.y - np.dot(self.c, self.delta)
 
         self.h = np.array([1, 1, 0.5])
         self.positions = np.array([0, 1, 2])
@@ -117,54 +118,54 @@ class TestLinearUpdate:
 
     def test_sqrt_state_update_with_nans(self):
         kf.sqrt_linear_update(
-            self.states, self.mcovs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.sqrt_r, self.positions, self.weights)
+            self.states, self.mcovs, self.like_vec, self.y_net, self.h,
+            self.sqrt_r, self.positions, self.weights)
 
         aaae(self.states, self.exp_states)
 
     def test_sqrt_cov_update_with_nans(self):
         kf.sqrt_linear_update(
-            self.states, self.mcovs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.sqrt_r, self.positions, self.weights)
+            self.states, self.mcovs, self.like_vec, self.y_net, self.h,
+            self.sqrt_r, self.positions, self.weights)
         cholcovs = self.mcovs[:, :, 1:, 1:]
         make_unique(cholcovs.reshape(12, 3, 3))
         aaae(cholcovs, self.exp_cholcovs)
 
     def test_sqrt_like_vec_update_with_nans(self):
         kf.sqrt_linear_update(
-            self.states, self.mcovs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.sqrt_r, self.positions, self.weights)
+            self.states, self.mcovs, self.like_vec, self.y_net, self.h,
+            self.sqrt_r, self.positions, self.weights)
         aaae(self.like_vec, self.expected_like_vec)
 
     def test_sqrt_weight_update_with_nans(self):
         kf.sqrt_linear_update(
-            self.states, self.mcovs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.sqrt_r, self.positions, self.weights)
+            self.states, self.mcovs, self.like_vec, self.y_net, self.h,
+            self.sqrt_r, self.positions, self.weights)
         aaae(self.weights, self.exp_weights)
 
     def test_normal_state_update_with_nans(self):
         kf.normal_linear_update(
-            self.states, self.covs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.r, self.positions, self.weights, self.kf)
+            self.states, self.covs, self.like_vec, self.y_net, self.h,
+            self.r, self.positions, self.weights, self.kf)
 
         aaae(self.states, self.exp_states)
 
     def test_normal_cov_update_with_nans(self):
         kf.normal_linear_update(
-            self.states, self.covs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.r, self.positions, self.weights, self.kf)
+            self.states, self.covs, self.like_vec, self.y_net, self.h,
+            self.r, self.positions, self.weights, self.kf)
         aaae(self.covs, self.exp_covs)
 
     def test_normal_like_vec_update_with_nans(self):
         kf.normal_linear_update(
-            self.states, self.covs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.r, self.positions, self.weights, self.kf)
+            self.states, self.covs, self.like_vec, self.y_net, self.h,
+            self.r, self.positions, self.weights, self.kf)
         aaae(self.like_vec, self.expected_like_vec)
 
     def test_normal_weight_update_with_nans(self):
         kf.normal_linear_update(
-            self.states, self.covs, self.like_vec, self.y, self.c,
-            self.delta, self.h, self.r, self.positions, self.weights, self.kf)
+            self.states, self.covs, self.like_vec, self.y_net, self.h,
+            self.r, self.positions, self.weights, self.kf)
         aaae(self.weights, self.exp_weights)
 
 
@@ -1,4 +1,5 @@
 from skillmodels.pre_processing.data_processor import DataProcessor as dc
+from skillmodels.pre_processing.data_processor import unique_individuals
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
@@ -87,3 +88,38 @@ class TestYData:
              np.array([[8, 9, 11]] * 6), np.array([[12, 13, 15]] * 7)])
 
         aae(dc.y_data_chs(self), res)
+
+
+class TestUniqueIndividuals:
+    def setup(self):
+        self.y_data = np.array([
+            [1, 2, 1, np.nan, 1, np.nan],
+            [3, 4, 3, 5, 3, 5]])
+        self.c_data = [
+            np.array([[1, 0], [1, 1], [1, 0], [1, 1], [1, 1], [1, 1]]),
+            np.array([[1], [1], [1], [1], [1], [1]])]
+
+    def test_unique_individuals_reconstructs_data(self):
+        u_y, u_c, inverse, weights = unique_individuals(
+            self.y_data, self.c_data)
+        aae(u_y[:, inverse], self.y_data)
+        for u, c in zip(u_c, self.c_data):
+            aae(u[inverse], c)
+
+    def test_unique_individuals_treats_nans_as_equal(self):
+        u_y, u_c, inverse, weights = unique_individuals(
+            self.y_data, self.c_data)
+        assert inverse[3] == inverse[5]
+
+    def test_unique_individuals_distinguishes_controls(self):
+        u_y, u_c, inverse, weights = unique_individuals(
+            self.y_data, self.c_data)
+        assert inverse[0] == inverse[2]
+        assert inverse[0] != inverse[4]
+
+    def test_unique_individuals_frequency_weights(self):
+        u_y, u_c, inverse, weights = unique_individuals(
+            self.y_data, self.c_data)
+        assert u_y.shape == (2, 4)
+        aae(weights, np.bincount(inverse))
+        assert weights.sum() == 6